@@ -1,6 +1,9 @@
 # encoding:utf-8
 
+import concurrent.futures
 import datetime
+import decimal
+import itertools
 
 import numpy
 import pandas
@@ -8,7 +11,9 @@ import pytest
 import redis
 
 import ttseries
-from ttseries.serializers import DumpySerializer
+import ttseries.utils
+from ttseries.serializers import DumpySerializer, MsgPackSerializer, MsgPackExtSerializer, CompressedSerializer, \
+    StructSerializer
 
 
 class InitData(object):
@@ -62,6 +67,38 @@ init_data = InitData()
 key = "APPL:SECOND:10"
 
 
+def hash_add_multi_round_trips(series, name, timestamp, data):
+    """
+    RedisHashTimeSeries.add before the lua script:
+    ZCOUNT, INCR, ZCARD, an optional trim transaction and a WATCH/MULTI transaction
+    """
+    incr_key = series.incr_format.format(key=name)
+    hash_key = series.hash_format.format(key=name)
+
+    if not series.exist_timestamp(name, timestamp):
+        dumps_data = series._serializer.dumps(data)
+        key_id = series.client.incr(incr_key)
+
+        if series.length(name) >= series.max_length:
+            remove_key = key_id - series.max_length
+
+            def trim_func(_pipe):
+                _pipe.zrem(name, remove_key)
+                _pipe.hdel(hash_key, remove_key)
+
+            series.transaction_pipe(trim_func, (name, hash_key))
+
+        def pipe_func(_pipe):
+            _pipe.zadd(name, {key_id: timestamp})
+            _pipe.hset(hash_key, mapping={key_id: dumps_data})
+
+        return series.transaction_pipe(pipe_func, (name, hash_key))
+
+
+def hash_add_script(series, name, timestamp, data):
+    return series.add(name, timestamp, data)
+
+
 @pytest.fixture()
 def simple_timeseries_dumpy():
     redis_client = redis.StrictRedis()
@@ -290,6 +327,20 @@ def test_add_pandas_timeseries_serializer(pandas_timeseries,
         pandas_timeseries.flush()
 
 
+@pytest.mark.benchmark(group="pandas_columns", disable_gc=True)
+def test_add_pandas_columns_timeseries(benchmark):
+    length = 1000000
+    columns = ["value{0}".format(i) for i in range(10)]
+    series = ttseries.RedisPandasTimeSeries(redis.StrictRedis(), columns=columns, max_length=length)
+    data_frame = pandas.DataFrame(numpy.random.rand(length, len(columns)), columns=columns,
+                                  index=pandas.date_range(init_data.now, periods=length, freq="1s"))
+
+    @benchmark
+    def bench():
+        series.add_many(key, data_frame, chunks_size=10000)
+        series.flush()
+
+
 @pytest.mark.usefixtures("pandas_timeseries")
 @pytest.mark.benchmark(group="pandas", disable_gc=True)
 @pytest.mark.parametrize("length", [1000, 10000, 100000])
@@ -301,3 +352,356 @@ def test_get_pandas_timeseries_serializer(pandas_timeseries,
     @benchmark
     def bench():
         pandas_timeseries.get_slice(key)
+
+
+@pytest.mark.usefixtures("hash_timeseries")
+@pytest.mark.benchmark(group="hash_add", disable_gc=True)
+@pytest.mark.parametrize("add_func", [hash_add_multi_round_trips, hash_add_script],
+                         ids=["multi_round_trips", "script"])
+@pytest.mark.parametrize("max_length", [500, 100000])
+def test_add_one_hash_timeseries(hash_timeseries, benchmark, add_func, max_length):
+    hash_timeseries.max_length = max_length
+    data = init_data.prepare_data(1000)
+
+    @benchmark
+    def bench():
+        for timestamp, value in data:
+            add_func(hash_timeseries, key, timestamp, value)
+        hash_timeseries.flush()
+
+
+@pytest.mark.benchmark(group="add_many_parallel", disable_gc=True)
+@pytest.mark.parametrize("parallelism", [1, 4, 8])
+def test_add_many_parallel_simple_timeseries(benchmark, parallelism):
+    series = ttseries.RedisSampleTimeSeries(redis.StrictRedis(), max_length=1000000, transaction=False)
+    data = init_data.prepare_data_with_dict(100000)
+
+    @benchmark
+    def bench():
+        series.add_many(key, data, chunks_size=2000, assume_sorted=True, parallelism=parallelism)
+        series.flush()
+
+
+@pytest.mark.benchmark(group="add_many_threads", disable_gc=True)
+@pytest.mark.parametrize("threads", [1, 8, 32])
+def test_add_many_threads_hash_timeseries(benchmark, threads):
+    series = ttseries.RedisHashTimeSeries(redis.StrictRedis(), max_length=1000000)
+    data = init_data.prepare_data(1000)
+    keys = ["APPL:SECOND:" + str(i) for i in range(threads)]
+
+    @benchmark
+    def bench():
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(lambda name: series.add_many(name, data, chunks_size=100), keys))
+        series.flush()
+
+
+@pytest.mark.benchmark(group="numpy_binary_records", disable_gc=True)
+@pytest.mark.parametrize("binary_records", [False, True], ids=["serializer", "binary"])
+@pytest.mark.parametrize("length", [1000000])
+def test_add_get_numpy_binary_timeseries(benchmark, binary_records, length):
+    dtype = [("timestamp", "float64"), ("value", "int64"), ("price", "float64")]
+    series = ttseries.RedisNumpyTimeSeries(redis.StrictRedis(), max_length=length, dtype=dtype,
+                                           timestamp_column_name="timestamp",
+                                           binary_records=binary_records)
+    array = numpy.empty(length, dtype=dtype)
+    array["timestamp"] = init_data.timestamp + numpy.arange(length)
+    array["value"] = numpy.arange(length)
+    array["price"] = numpy.arange(length) / 3
+
+    @benchmark
+    def bench():
+        series.add_many(key, array, assume_sorted=True)
+        series.get_slice(key)
+        series.flush()
+
+
+def legacy_numpy_loads_slice(series, results):
+    """
+    the former RedisNumpyTimeSeries._loads_slice, inserts the timestamp into each decoded row
+    """
+    def apply_numpy_index(timestamp, data):
+        data.insert(column_index, timestamp)
+        return tuple(data)
+
+    values = map(apply_numpy_index, [timestamp for _, timestamp in results],
+                 series._serializer.loads_many([data for data, _ in results]))
+    if series.dtype is None:
+        column_index = series.timestamp_column_index
+        return numpy.array(list(values))
+    column_index = series.timestamp_name_index
+    return numpy.fromiter(values, dtype=series.dtype)
+
+
+@pytest.mark.benchmark(group="numpy_loads_slice", disable_gc=True)
+@pytest.mark.parametrize("loads", ["legacy", "preallocated"])
+@pytest.mark.parametrize("dtype", [None, [("timestamp", "float64"), ("value", "int64"), ("price", "float64")]],
+                         ids=["plain", "dtype"])
+def test_loads_slice_numpy_timeseries(benchmark, loads, dtype):
+    length = 1000000
+    series = ttseries.RedisNumpyTimeSeries(redis.StrictRedis(), max_length=length, dtype=dtype,
+                                           timestamp_column_name="timestamp" if dtype else None)
+    results = list(zip(series._serializer.dumps_many([[i, i / 3] for i in range(length)]),
+                       (init_data.timestamp + numpy.arange(length)).tolist()))
+    members = [data for data, _ in results]
+    timestamps = init_data.timestamp + numpy.arange(length)
+
+    @benchmark
+    def bench():
+        if loads == "legacy":
+            legacy_numpy_loads_slice(series, results)
+        else:
+            series._loads_slice(members, timestamps)
+
+
+@pytest.mark.benchmark(group="numpy_iter_batches", disable_gc=True)
+@pytest.mark.parametrize("method", ["iter", "iter_batches"])
+def test_iter_numpy_timeseries(benchmark, method):
+    length = 1000000
+    dtype = [("timestamp", "float64"), ("value", "int64"), ("price", "float64")]
+    series = ttseries.RedisNumpyTimeSeries(redis.StrictRedis(), max_length=length, dtype=dtype,
+                                           timestamp_column_name="timestamp")
+    array = numpy.empty(length, dtype=dtype)
+    array["timestamp"] = init_data.timestamp + numpy.arange(length)
+    array["value"] = numpy.arange(length)
+    array["price"] = numpy.arange(length) / 3
+    series.add_many(key, array, assume_sorted=True, chunks_size=10000)
+
+    @benchmark
+    def bench():
+        if method == "iter":
+            for _ in series.iter(key, count=10000):
+                pass
+        else:
+            for _ in series.iter_batches(key, batch_size=10000):
+                pass
+
+    series.flush()
+
+
+@pytest.mark.benchmark(group="chunked_get_slice", disable_gc=True)
+@pytest.mark.parametrize("series_cls", [ttseries.RedisSampleTimeSeries, ttseries.RedisChunkedTimeSeries],
+                         ids=["sample", "chunked"])
+@pytest.mark.parametrize("length", [100000])
+def test_get_slice_chunked_timeseries(benchmark, series_cls, length):
+    series = series_cls(redis.StrictRedis(), max_length=length)
+    series.add_many(key, [(init_data.timestamp + i, i / 4) for i in range(length)], assume_sorted=True)
+
+    @benchmark
+    def bench():
+        series.get_slice(key, init_data.timestamp + length / 2, init_data.timestamp + length / 2 + 3600)
+
+    series.flush()
+
+
+def prepare_order_books(length, levels=50):
+    return [(init_data.timestamp + i,
+             {"bids": [[100.0 - level / 100 + i, 10 + level] for level in range(levels)],
+              "asks": [[100.0 + level / 100 + i, 10 + level] for level in range(levels)]})
+            for i in range(length)]
+
+
+class BookSerializer(CompressedSerializer):
+    threshold = 256
+
+
+@pytest.mark.benchmark(group="compressed_serializer", disable_gc=True)
+@pytest.mark.parametrize("serializer_cls", [MsgPackSerializer, BookSerializer], ids=["msgpack", "compressed"])
+@pytest.mark.parametrize("length", [1000, 10000])
+def test_get_slice_compressed_serializer(benchmark, serializer_cls, length):
+    series = ttseries.RedisHashTimeSeries(redis.StrictRedis(), max_length=length, serializer_cls=serializer_cls)
+    series.add_many(key, prepare_order_books(length), assume_sorted=True)
+    # the stored bytes of the payloads
+    benchmark.extra_info["payload_bytes"] = sum(map(len, series.client.hvals(series._hash_key(key))))
+
+    @benchmark
+    def bench():
+        series.get_slice(key)
+
+    series.flush()
+
+
+def prepare_trades(length):
+    return [(init_data.timestamp + i,
+             {"price": decimal.Decimal("100.25") + i, "size": i, "side": "buy",
+              "time": init_data.now + datetime.timedelta(seconds=i),
+              "settle": init_data.now.date()})
+            for i in range(length)]
+
+
+@pytest.mark.benchmark(group="msgpack_ext_serializer", disable_gc=True)
+@pytest.mark.parametrize("serializer_cls", [MsgPackSerializer, MsgPackExtSerializer], ids=["msgpack", "ext"])
+@pytest.mark.parametrize("length", [1000, 10000])
+def test_get_slice_datetime_serializer(benchmark, serializer_cls, length):
+    series = ttseries.RedisSampleTimeSeries(redis.StrictRedis(), max_length=length, serializer_cls=serializer_cls)
+    series.add_many(key, prepare_trades(length), assume_sorted=True)
+
+    @benchmark
+    def bench():
+        series.get_slice(key)
+
+    series.flush()
+
+
+class QuoteSerializer(StructSerializer):
+    fields = [("bid", "d"), ("ask", "d"), ("side", "B")]
+
+
+def prepare_quotes(length):
+    return [(init_data.timestamp + i, {"bid": 100.0 + i, "ask": 100.5 + i, "side": i % 2})
+            for i in range(length)]
+
+
+@pytest.mark.benchmark(group="struct_serializer", disable_gc=True)
+@pytest.mark.parametrize("serializer_cls", [MsgPackSerializer, QuoteSerializer], ids=["msgpack", "struct"])
+@pytest.mark.parametrize("series_cls", [ttseries.RedisSampleTimeSeries, ttseries.RedisHashTimeSeries],
+                         ids=["sample", "hash"])
+def test_get_slice_struct_serializer(benchmark, serializer_cls, series_cls):
+    series = series_cls(redis.StrictRedis(), max_length=10000, serializer_cls=serializer_cls)
+    series.add_many(key, prepare_quotes(10000), assume_sorted=True)
+
+    @benchmark
+    def bench():
+        if serializer_cls is QuoteSerializer:
+            series.get_slice_columns(key)
+        else:
+            series.get_slice(key)
+
+    series.flush()
+
+
+@pytest.mark.benchmark(group="get_slice_raw", disable_gc=True)
+@pytest.mark.parametrize("method", ["get_slice", "get_slice_raw"])
+@pytest.mark.parametrize("series_cls", [ttseries.RedisSampleTimeSeries, ttseries.RedisHashTimeSeries],
+                         ids=["sample", "hash"])
+def test_get_slice_raw_timeseries(benchmark, method, series_cls):
+    length = 100000
+    series = series_cls(redis.StrictRedis(), max_length=length)
+    series.add_many(key, [(init_data.timestamp + i, {"value": i}) for i in range(length)], assume_sorted=True)
+
+    @benchmark
+    def bench():
+        getattr(series, method)(key)
+
+    series.flush()
+
+
+class PairsSliceMixin(object):
+    """
+    the former _get_slice_mixin, redis-py parses the reply into the (member, float) pairs
+    with the `withscores` option, the pairs are split into the members and the scores after.
+    """
+
+    def _get_slice_mixin(self, name, start_timestamp=None, end_timestamp=None, limit=None, asc=True,
+                         parser=None):
+        zrange_func = self.client.zrangebyscore if asc else self.client.zrevrangebyscore
+        results = zrange_func(name, min="-inf" if start_timestamp is None else start_timestamp,
+                              max="+inf" if end_timestamp is None else end_timestamp,
+                              withscores=True, start=0, num=-1 if limit is None else limit)
+        return ([data for data, _ in results],
+                numpy.fromiter((timestamp for _, timestamp in results), numpy.float64, count=len(results)))
+
+
+def prepare_slice_data(series_cls, length):
+    if issubclass(series_cls, ttseries.RedisPandasTimeSeries):
+        return init_data.prepare_pd_dataframe(length)
+    if issubclass(series_cls, ttseries.RedisNumpyTimeSeries):
+        return init_data.prepare_numpy_array(length)
+    return init_data.prepare_data_with_dict(length)
+
+
+@pytest.mark.benchmark(group="get_slice_parser", disable_gc=True)
+@pytest.mark.parametrize("parser", ["pairs", "raw"])
+@pytest.mark.parametrize("series_cls", [ttseries.RedisSampleTimeSeries, ttseries.RedisHashTimeSeries,
+                                        ttseries.RedisNumpyTimeSeries, ttseries.RedisPandasTimeSeries],
+                         ids=["sample", "hash", "numpy", "pandas"])
+def test_get_slice_parser_timeseries(benchmark, parser, series_cls):
+    length = 100000
+    if parser == "pairs":
+        series_cls = type("Pairs" + series_cls.__name__, (PairsSliceMixin, series_cls), {})
+    kwargs = {"columns": ["values"]} if issubclass(series_cls, ttseries.RedisPandasTimeSeries) else {}
+    series = series_cls(redis.StrictRedis(), max_length=length, **kwargs)
+    series.add_many(key, prepare_slice_data(series_cls, length), assume_sorted=True)
+
+    @benchmark
+    def bench():
+        series.get_slice(key)
+
+    series.flush()
+
+
+@pytest.mark.benchmark(group="parse_scores", disable_gc=True)
+@pytest.mark.parametrize("method", ["fromiter_float", "numpy_array"])
+def test_parse_scores(benchmark, method):
+    scores = [repr(init_data.timestamp + i / 7).encode() for i in range(100000)]
+    if method == "fromiter_float":
+        parse = lambda: numpy.fromiter(map(float, scores), numpy.float64, count=len(scores))
+    else:
+        parse = lambda: ttseries.ts.replies.parse_scores(scores)
+
+    benchmark(parse)
+
+
+@pytest.mark.benchmark(group="iter_slice", disable_gc=True)
+@pytest.mark.parametrize("method", ["get_slice", "iter_slice"])
+@pytest.mark.parametrize("series_cls", [ttseries.RedisSampleTimeSeries, ttseries.RedisNumpyTimeSeries],
+                         ids=["sample", "numpy"])
+def test_iter_slice_timeseries(benchmark, method, series_cls):
+    length = 100000
+    series = series_cls(redis.StrictRedis(), max_length=length)
+    series.add_many(key, prepare_slice_data(series_cls, length), assume_sorted=True)
+
+    @benchmark
+    def bench():
+        if method == "iter_slice":
+            for _ in series.iter_slice(key, page_size=10000):
+                pass
+        else:
+            series.get_slice(key)
+
+    series.flush()
+
+
+def legacy_hash_iter(series, name):
+    """
+    the former RedisHashTimeSeries.iter, zips ZSCAN with HSCAN and assumes the same order
+    """
+    hash_key = series._hash_key(name)
+    pairs = itertools.zip_longest(series.client.zscan_iter(name=name), series.client.hscan_iter(name=hash_key))
+    for batch in ttseries.utils.chunks(pairs, series.iter_batch_size):
+        timestamps = [timestamp_pairs[1] for timestamp_pairs, _ in batch]
+        yield from zip(timestamps, series._serializer.loads_many([hash_pairs[1] for _, hash_pairs in batch]))
+
+
+@pytest.mark.benchmark(group="hash_iter", disable_gc=True)
+@pytest.mark.parametrize("method", ["scan", "ordered"])
+def test_iter_hash_timeseries(benchmark, method):
+    length = 10000
+    series = ttseries.RedisHashTimeSeries(redis.StrictRedis(), max_length=length)
+    series.add_many(key, init_data.prepare_data_with_dict(length), assume_sorted=True)
+
+    @benchmark
+    def bench():
+        if method == "scan":
+            for _ in legacy_hash_iter(series, key):
+                pass
+        else:
+            for _ in series.iter(key, count=1000):
+                pass
+
+    series.flush()
+
+
+@pytest.mark.benchmark(group="hash_scripted_get_slice", disable_gc=True)
+@pytest.mark.parametrize("method", ["two_round_trips", "scripted"])
+@pytest.mark.parametrize("limit", [1, 10, 1000])
+def test_get_slice_scripted_hash_timeseries(benchmark, method, limit):
+    series = ttseries.RedisHashTimeSeries(redis.StrictRedis(), max_length=1000)
+    series.add_many(key, init_data.prepare_data_with_dict(1000), assume_sorted=True)
+    series.scripted_reads = method == "scripted"
+
+    @benchmark
+    def bench():
+        series.get_slice(key, limit=limit)
+
+    series.flush()
@@ -1,4 +1,11 @@
+import threading
+
 from ttseries.exceptions import RedisTimeSeriesError
+from ttseries.serializers import StructSerializer
+
+
+class ValueSerializer(StructSerializer):
+    fields = [("value", "q")]
 
 
 class Mixin(object):
@@ -503,6 +510,84 @@ class Mixin(object):
             self.assertListEqual(results, data_list)
             self.time_series.add_many(key, data_list)
 
+    def test_add_many_duplicated_timestamp_in_overlap(self):
+        data_list = self.generate_data(10)
+        key = self.add_data_list(data_list)
+
+        # fewer stored scores in the overlapping range than the new timestamps
+        with self.assertRaises(RedisTimeSeriesError):
+            self.time_series.add_many(key, [(self.timestamp + 8.5, {"value": 100}),
+                                            (self.timestamp + 9, {"value": 101})])
+        # more stored scores in the overlapping range than the new timestamps
+        with self.assertRaises(RedisTimeSeriesError):
+            self.time_series.add_many(key, [(self.timestamp + 2.5, {"value": 100}),
+                                            (self.timestamp + 9, {"value": 101})])
+
+    def test_add_many_assume_sorted(self):
+        data_list = self.generate_data(10)
+        key = "APPL:HOUR:2"
+        self.time_series.add_many(key, data_list, assume_sorted=True)
+
+        result_data = self.time_series.get_slice(key)
+        self.assertListEqual(data_list, result_data)
+
+    def test_add_many_unsorted(self):
+        data_list = self.generate_data(10)
+        key = "APPL:HOUR:3"
+        self.time_series.add_many(key, list(reversed(data_list)))
+
+        result_data = self.time_series.get_slice(key)
+        self.assertListEqual(data_list, result_data)
+
+    def test_add_on_conflict_error(self):
+        key = "APPL:SECOND:3"
+        self.time_series.add(key, self.timestamp, {"value": 21})
+        with self.assertRaises(RedisTimeSeriesError):
+            self.time_series.add(key, self.timestamp, {"value": 33}, on_conflict="error")
+
+    def test_add_on_conflict_replace(self):
+        key = "APPL:SECOND:3"
+        self.time_series.add(key, self.timestamp, {"value": 21})
+        result = self.time_series.add(key, self.timestamp, {"value": 33}, on_conflict="replace")
+        self.assertTrue(result)
+        self.assertEqual(self.time_series.length(key), 1)
+        self.assertEqual(self.time_series.get(key, self.timestamp), {"value": 33})
+
+    def test_add_many_on_conflict_skip(self):
+        key = "APPL:MINS:1"
+        data_list = self.generate_data(8)
+        self.time_series.add_many(key, data_list[:5])
+
+        replay_list = [(timestamp, {"value": -data["value"]}) for timestamp, data in data_list[3:]]
+        self.time_series.add_many(key, replay_list, on_conflict="skip")
+
+        result_data = self.time_series.get_slice(key)
+        self.assertListEqual(data_list[:5] + replay_list[2:], result_data)
+
+    def test_add_many_on_conflict_replace(self):
+        key = "APPL:MINS:2"
+        data_list = self.generate_data(8)
+        self.time_series.add_many(key, data_list[:5])
+
+        replay_list = [(timestamp, {"value": -data["value"]}) for timestamp, data in data_list[3:]]
+        self.time_series.add_many(key, replay_list, on_conflict="replace")
+
+        result_data = self.time_series.get_slice(key)
+        self.assertListEqual(data_list[:3] + replay_list, result_data)
+
+    def test_add_many_on_conflict_skip_max_length(self):
+        key = "APPL:MINS:3"
+        data_list = self.generate_data(15)
+        self.time_series.add_many(key, data_list[:10])
+        self.time_series.add_many(key, data_list[8:], on_conflict="skip")
+
+        self.assertEqual(self.time_series.length(key), 10)
+        self.assertListEqual(data_list[5:], self.time_series.get_slice(key))
+
+    def test_add_many_on_conflict_invalid(self):
+        with self.assertRaises(RedisTimeSeriesError):
+            self.time_series.add_many("APPL:MINS:4", self.generate_data(2), on_conflict="ignore")
+
     def test_add_many_data_twice(self):
 
         key = "APPL:HOUR:1"
@@ -524,6 +609,136 @@ class Mixin(object):
         result_data = self.time_series.get_slice(key)
         self.assertListEqual(data_list, result_data)
 
+    def test_add_many_parallelism(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(50)
+        time_series = type(self.time_series)(self.time_series.client, max_length=40, transaction=False)
+
+        time_series.add_many(key, data_list[:20], chunks_size=7, parallelism=4)
+        time_series.add_many(key, data_list[20:], chunks_size=7, parallelism=4)
+
+        self.assertListEqual(data_list[10:], time_series.get_slice(key))
+
+    def test_add_many_parallelism_transaction(self):
+        with self.assertRaises(RedisTimeSeriesError):
+            self.time_series.add_many("APPL:SECOND:1", self.generate_data(10), parallelism=4)
+
+    def test_transaction_pipe_watch_conflict(self):
+        key = "APPL:SECOND:1"
+        calls = []
+
+        def pipe_func(pipe):
+            calls.append(pipe)
+            if len(calls) == 1:
+                # another connection changes the watched key before EXEC
+                self.time_series.client.zadd(key, {"conflict": self.timestamp})
+            pipe.zadd(key, {"value": self.timestamp + 1})
+
+        self.time_series.transaction_pipe(pipe_func, key)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.time_series.length(key), 2)
+        self.assertEqual(self.time_series.watch_stats,
+                         {"transactions": 1, "conflicts": 1, "max_retries": 1})
+
+    def test_add_many_threads(self):
+        keys = ["APPL:SECOND:" + str(i) for i in range(8)]
+        data_list = self.generate_data(10)
+
+        threads = [threading.Thread(target=self.time_series.add_many, args=(key, data_list),
+                                    kwargs={"chunks_size": 3})
+                   for key in keys]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for key in keys:
+            self.assertListEqual(data_list, self.time_series.get_slice(key))
+
+    def test_add_many_keys(self):
+        data_list = self.generate_data(10)
+        mapping = {"APPL:DAY:" + str(key): list(reversed(data_list)) for key in range(5)}
+
+        self.time_series.add_many_keys(mapping, chunks_size=3, pipeline_bytes=64)
+
+        for key in mapping:
+            self.assertListEqual(data_list, self.time_series.get_slice(key))
+
+    def test_add_many_keys_max_length(self):
+        data_list = self.generate_data(15)
+        keys = self.prepare_many_data(data_list[:10])
+
+        self.time_series.add_many_keys({key: data_list[10:] for key in keys})
+
+        for key in keys:
+            self.assertEqual(self.time_series.length(key), 10)
+            self.assertListEqual(data_list[5:], self.time_series.get_slice(key))
+
+    def test_add_many_keys_duplicated_timestamp(self):
+        data_list = self.generate_data(10)
+        keys = self.prepare_many_data(data_list[:5])
+        mapping = {key: data_list[5:] for key in keys}
+        mapping[keys[-1]] = data_list[4:]
+
+        with self.assertRaises(RedisTimeSeriesError):
+            self.time_series.add_many_keys(mapping)
+
+    def test_add_many_keys_on_conflict_skip(self):
+        data_list = self.generate_data(10)
+        keys = self.prepare_many_data(data_list[:5])
+
+        self.time_series.add_many_keys({key: data_list[3:] for key in keys}, on_conflict="skip")
+
+        for key in keys:
+            self.assertListEqual(data_list, self.time_series.get_slice(key))
+
+    def test_get_slice_columns(self):
+        data_list = self.generate_data(10)
+        self.time_series = type(self.time_series)(self.time_series.client, max_length=10,
+                                                  serializer_cls=ValueSerializer)
+        self.time_series.add_many("APPL:SECOND:1", data_list)
+
+        self.assertListEqual(self.time_series.get_slice("APPL:SECOND:1"), data_list)
+        timestamps, columns = self.time_series.get_slice_columns("APPL:SECOND:1", limit=5, asc=False)
+        self.assertListEqual(timestamps.tolist(), [timestamp for timestamp, _ in data_list[::-1][:5]])
+        self.assertListEqual(columns["value"].tolist(), [9, 8, 7, 6, 5])
+        self.assertIsNone(self.time_series.get_slice_columns("APPL:SECOND:2"))
+
+    def test_get_slice_raw(self):
+        data_list = self.generate_data(10)
+        key = self.add_data_list(data_list)
+
+        timestamps, buffer, offsets = self.time_series.get_slice_raw(key, data_list[2][0], data_list[7][0])
+        self.assertListEqual(timestamps.tolist(), [timestamp for timestamp, _ in data_list[2:8]])
+        self.assertEqual(len(offsets), 7)
+        self.assertEqual(offsets[-1], len(buffer))
+        self.assertListEqual(self.time_series._serializer.loads_many(
+            [buffer[begin:end] for begin, end in zip(offsets[:-1], offsets[1:])]),
+            [data for _, data in data_list[2:8]])
+
+        timestamps, buffer, offsets = self.time_series.get_slice_raw(key, limit=2, asc=False)
+        self.assertListEqual(timestamps.tolist(), [data_list[9][0], data_list[8][0]])
+
+        timestamps, buffer, offsets = self.time_series.get_slice_raw("APPL:SECOND:2")
+        self.assertEqual((len(timestamps), buffer, offsets.tolist()), (0, b"", [0]))
+
+    def test_iter_slice(self):
+        data_list = self.generate_data(10)
+        key = self.add_data_list(data_list)
+
+        pages = list(self.time_series.iter_slice(key, page_size=3))
+        self.assertListEqual([len(page) for page in pages], [3, 3, 3, 1])
+        self.assertListEqual([item for page in pages for item in page], data_list)
+
+        pages = list(self.time_series.iter_slice(key, data_list[1][0], data_list[8][0], page_size=4, asc=False))
+        self.assertListEqual([item for page in pages for item in page], data_list[1:9][::-1])
+        self.assertListEqual(list(self.time_series.iter_slice(key, page_size=10)), [data_list])
+        self.assertListEqual(list(self.time_series.iter_slice("APPL:SECOND:2")), [])
+
+        with self.assertRaises(RedisTimeSeriesError):
+            list(self.time_series.iter_slice(key, page_size=0))
+
     def test_iter_keys(self):
         data_list = self.generate_data(10)
         keys = self.prepare_many_data(data_list)
@@ -537,3 +752,7 @@ class Mixin(object):
 
         for item in self.time_series.iter(key):
             self.assertTrue(item in data_list)
+
+        # deserialized in batches
+        self.time_series.iter_batch_size = 3
+        self.assertEqual(len(list(self.time_series.iter(key))), len(data_list))
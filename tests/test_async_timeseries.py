@@ -0,0 +1,273 @@
+# encoding:utf-8
+import asyncio
+import datetime
+import unittest
+
+import numpy as np
+import pandas as pd
+import redis.asyncio
+
+from ttseries import AsyncRedisHashTimeSeries
+from ttseries import AsyncRedisNumpyTimeSeries
+from ttseries import AsyncRedisPandasTimeSeries
+from ttseries import AsyncRedisSampleTimeSeries
+from ttseries.exceptions import RedisTimeSeriesError
+from ttseries.utils import key_slot
+
+
+class AsyncMixin(object):
+    time_series_cls = None
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.time_series = self.time_series_cls(redis.asyncio.StrictRedis(), max_length=10)
+        self.timestamp = datetime.datetime.now().timestamp()
+
+    def tearDown(self):
+        self.run_async(self.time_series.flush())
+        self.loop.close()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def generate_data(self, length):
+        return [(self.timestamp + i, {"value": i}) for i in range(length)]
+
+    async def collect(self, async_iter):
+        return [item async for item in async_iter]
+
+    def test_add_get(self):
+        key = "APPL:SECOND:1"
+        self.assertTrue(self.run_async(self.time_series.add(key, self.timestamp, {"value": 1})))
+        self.assertFalse(self.run_async(self.time_series.add(key, self.timestamp, {"value": 2})))
+
+        self.assertEqual(self.run_async(self.time_series.get(key, self.timestamp)), {"value": 1})
+        self.assertEqual(self.run_async(self.time_series.length(key)), 1)
+
+        with self.assertRaises(RedisTimeSeriesError):
+            self.run_async(self.time_series.add(key, self.timestamp, {"value": 2}, on_conflict="error"))
+
+    def test_add_many_get_slice(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(10)
+        self.run_async(self.time_series.add_many(key, data_list[::-1]))
+
+        self.assertEqual(self.run_async(self.time_series.get_slice(key)), data_list)
+        self.assertEqual(self.run_async(self.time_series.get_slice(key, limit=3, asc=False)),
+                         data_list[::-1][:3])
+
+        with self.assertRaises(RedisTimeSeriesError):
+            self.run_async(self.time_series.add_many(key, data_list[5:6]))
+
+    def test_get_slice_raw(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(10)
+        self.run_async(self.time_series.add_many(key, data_list))
+
+        timestamps, buffer, offsets = self.run_async(self.time_series.get_slice_raw(key, limit=4, asc=False))
+        self.assertListEqual(timestamps.tolist(), [timestamp for timestamp, _ in data_list[::-1][:4]])
+        self.assertListEqual([self.time_series._serializer.loads(buffer[begin:end])
+                              for begin, end in zip(offsets[:-1], offsets[1:])],
+                             [data for _, data in data_list[::-1][:4]])
+
+    def test_iter_slice(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(10)
+        self.run_async(self.time_series.add_many(key, data_list))
+
+        pages = self.run_async(self.collect(self.time_series.iter_slice(key, page_size=4)))
+        self.assertListEqual([len(page) for page in pages], [4, 4, 2])
+        self.assertListEqual([item for page in pages for item in page], data_list)
+
+    def test_add_many_max_length(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(15)
+        self.run_async(self.time_series.add_many(key, data_list[:8]))
+        self.run_async(self.time_series.add_many(key, data_list[8:]))
+
+        self.assertEqual(self.run_async(self.time_series.get_slice(key)), data_list[5:])
+
+    def test_add_many_skip(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(5)
+        self.run_async(self.time_series.add_many(key, data_list[:3]))
+        replay_list = [(timestamp, {"value": -data["value"]}) for timestamp, data in data_list]
+        self.run_async(self.time_series.add_many(key, replay_list, on_conflict="skip"))
+
+        self.assertEqual(self.run_async(self.time_series.get_slice(key)),
+                         data_list[:3] + replay_list[3:])
+
+    def test_add_many_keys(self):
+        data_list = self.generate_data(5)
+        mapping = {"APPL:DAY:" + str(key): data_list for key in range(5)}
+        self.run_async(self.time_series.add_many_keys(mapping, pipeline_bytes=64))
+
+        results = self.run_async(self.time_series.get_slice_many(list(mapping)))
+        self.assertEqual(results, {key: data_list for key in mapping})
+
+    def test_delete_and_trim(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(10)
+        self.run_async(self.time_series.add_many(key, data_list))
+
+        self.run_async(self.time_series.delete(key, start_timestamp=data_list[8][0]))
+        self.assertEqual(self.run_async(self.time_series.count(key)), 8)
+
+        self.run_async(self.time_series.trim(key, 3))
+        self.assertEqual(self.run_async(self.time_series.get_slice(key)), data_list[3:8])
+
+        self.run_async(self.time_series.delete(key))
+        self.assertFalse(self.run_async(self.time_series.exists(key)))
+
+    def test_remove_many(self):
+        data_list = self.generate_data(5)
+        keys = ["APPL:DAY:" + str(key) for key in range(5)]
+        for key in keys:
+            self.run_async(self.time_series.add_many(key, data_list))
+
+        self.run_async(self.time_series.remove_many(keys[:2], start_timestamp=data_list[3][0]))
+        self.run_async(self.time_series.remove_many(keys[2:]))
+
+        self.assertEqual(self.run_async(self.time_series.count(keys[0])), 3)
+        for key in keys[2:]:
+            self.assertFalse(self.run_async(self.time_series.exists(key)))
+
+    def test_remove_many_cluster(self):
+        self.time_series = self.time_series_cls(self.time_series.client, max_length=10, cluster=True)
+        data_list = self.generate_data(5)
+        keys = ["APPL:DAY:" + str(key) for key in range(5)]
+        for key in keys:
+            self.run_async(self.time_series.add_many(key, data_list))
+
+        async def delete(*names):
+            # a cluster rejects a multi-key command across the hash slots
+            if len({key_slot(name) for name in names}) > 1:
+                raise redis.ResponseError("CROSSSLOT Keys in request don't hash to the same slot")
+            return await delete_one_slot(*names)
+
+        delete_one_slot = self.time_series.client.delete
+        self.time_series.client.delete = delete
+        self.run_async(self.time_series.remove_many(keys))
+        for key in keys:
+            self.assertFalse(self.run_async(self.time_series.exists(key)))
+        self.assertEqual(self.run_async(self.time_series.client.dbsize()), 0)
+
+    def test_iter(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(10)
+        self.run_async(self.time_series.add_many(key, data_list))
+
+        results = self.run_async(self.collect(self.time_series.iter(key, count=3)))
+        self.assertEqual(sorted(results, key=lambda item: item[0]), data_list)
+
+        keys = self.run_async(self.collect(self.time_series.iter_keys()))
+        self.assertEqual(keys, [key])
+
+
+class AsyncRedisSampleTSTest(AsyncMixin, unittest.TestCase):
+    time_series_cls = AsyncRedisSampleTimeSeries
+
+
+class AsyncRedisHashTSTest(AsyncMixin, unittest.TestCase):
+    time_series_cls = AsyncRedisHashTimeSeries
+
+    def test_iter_ordered(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(10)
+        self.run_async(self.time_series.add_many(key, data_list[5:]))
+        self.run_async(self.time_series.add_many(key, data_list[:5]))
+
+        results = self.run_async(self.collect(self.time_series.iter(key, count=3)))
+        self.assertEqual(results, data_list)
+
+    def test_iter_trim_between_pages(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(10)
+        self.run_async(self.time_series.add_many(key, data_list))
+
+        async def iter_with_trim():
+            results = []
+            async for pairs in self.time_series.iter(key, count=3):
+                results.append(pairs)
+                if len(results) == 3:
+                    await self.time_series.trim(key, 3)
+            return results
+
+        self.assertEqual(self.run_async(iter_with_trim()), data_list)
+
+    def test_get_slice_raw_missing(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(10)
+        self.run_async(self.time_series.add_many(key, data_list))
+        key_id = self.run_async(self.time_series.client.zrange(key, 4, 4))[0]
+        self.run_async(self.time_series.client.hdel(key + ":HASH", key_id))
+
+        timestamps, buffer, offsets = self.run_async(self.time_series.get_slice_raw(key))
+        self.assertListEqual(timestamps.tolist(), [timestamp for timestamp, _ in data_list[:4] + data_list[5:]])
+        self.assertEqual(len(offsets), 10)
+
+
+class AsyncRedisNumpyTSTest(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.dtype = [("timestamp", "float64"), ("value", "int64")]
+        self.time_series = AsyncRedisNumpyTimeSeries(redis.asyncio.StrictRedis(), max_length=10,
+                                                     dtype=self.dtype, timestamp_column_name="timestamp")
+        self.timestamp = datetime.datetime.now().timestamp()
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.time_series.flush())
+        self.loop.close()
+
+    def test_add_many_get_slice(self):
+        key = "APPL:SECOND:1"
+        array = np.array([(self.timestamp + i, i) for i in range(10)], dtype=self.dtype)
+
+        self.loop.run_until_complete(self.time_series.add_many(key, array[::-1]))
+        result = self.loop.run_until_complete(self.time_series.get_slice(key))
+        np.testing.assert_array_equal(result, array)
+
+        item = self.loop.run_until_complete(self.time_series.get(key, array[1]["timestamp"]))
+        np.testing.assert_array_equal(item, array[1])
+
+    def test_iter_batches(self):
+        key = "APPL:SECOND:1"
+        array = np.array([(self.timestamp + i, i) for i in range(10)], dtype=self.dtype)
+        self.loop.run_until_complete(self.time_series.add_many(key, array[3:]))
+
+        async def collect():
+            batches = self.time_series.iter_batches(key, batch_size=3)
+            result = [await batches.__anext__()]
+            # the rows inserted before the cursor are neither repeated nor read
+            await self.time_series.add_many(key, array[:3])
+            return result + [batch async for batch in batches]
+
+        batches = self.loop.run_until_complete(collect())
+        self.assertListEqual([len(batch) for batch in batches], [3, 3, 1])
+        np.testing.assert_array_equal(np.concatenate(batches), array[3:])
+
+
+class AsyncRedisPandasTSTest(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.time_series = AsyncRedisPandasTimeSeries(redis.asyncio.StrictRedis(), columns=["value"],
+                                                      dtypes={"value": "int64"}, max_length=10)
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.time_series.flush())
+        self.loop.close()
+
+    def test_add_many_get_slice(self):
+        key = "APPL:SECOND:1"
+        date_index = pd.date_range(start=datetime.datetime.now().replace(microsecond=0),
+                                   periods=10, freq="S", name="timestamp")
+        data_frame = pd.DataFrame({"value": range(10)}, index=date_index)
+
+        self.loop.run_until_complete(self.time_series.add_many(key, data_frame=data_frame))
+        result = self.loop.run_until_complete(self.time_series.get_slice(key))
+        pd.testing.assert_frame_equal(result, data_frame, check_freq=False)
+
+        series = data_frame.iloc[0]
+        self.assertFalse(self.loop.run_until_complete(self.time_series.add(key, series)))
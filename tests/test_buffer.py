@@ -0,0 +1,259 @@
+# encoding:utf-8
+import datetime
+import os
+import queue
+import shutil
+import tempfile
+import time
+import unittest
+import unittest.mock
+
+import numpy as np
+import numpy.testing
+import redis
+
+from ttseries import BufferedWriter, RedisHashTimeSeries, RedisNumpyTimeSeries
+from ttseries.exceptions import FlushError, RedisTimeSeriesError
+
+
+class BufferedWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.time_series = RedisHashTimeSeries(redis.StrictRedis(), max_length=1000)
+        self.timestamp = datetime.datetime.now().timestamp()
+        self.journal_dir = tempfile.mkdtemp()
+        self.journal_path = os.path.join(self.journal_dir, "journal")
+
+    def tearDown(self):
+        self.time_series.flush()
+        shutil.rmtree(self.journal_dir)
+
+    def generate_data(self, length):
+        return [(self.timestamp + i, {"value": i}) for i in range(length)]
+
+    def test_flush_on_max_points(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(10)
+
+        with BufferedWriter(self.time_series, max_points=5, max_age=60) as writer:
+            for timestamp, data in data_list:
+                writer.add(key, timestamp, data)
+            writer.flush()
+
+            self.assertEqual(self.time_series.get_slice(key), data_list)
+            metrics = writer.metrics
+            self.assertEqual(metrics["flushes"], 2)
+            self.assertEqual(metrics["flushed_points"], 10)
+            self.assertEqual(metrics["max_batch_size"], 5)
+            self.assertEqual(metrics["queue_depth"], 0)
+            self.assertEqual(metrics["buffered_points"], 0)
+
+    def test_flush_on_max_age(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(3)
+
+        writer = BufferedWriter(self.time_series, max_points=1000, max_age=0.05)
+        for timestamp, data in data_list:
+            writer.add(key, timestamp, data)
+
+        for _ in range(100):
+            if writer.metrics["flushed_points"] == 3:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.time_series.get_slice(key), data_list)
+        writer.close()
+
+        with self.assertRaises(RedisTimeSeriesError):
+            writer.add(key, self.timestamp, {"value": 1})
+
+    def test_reorder_window(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(10)
+        order = [0, 1, 3, 2, 4, 6, 5, 7, 9, 8]
+
+        with BufferedWriter(self.time_series, max_points=4, max_age=60, reorder_window=2) as writer:
+            for index in order:
+                writer.add(key, *data_list[index])
+            # repeated timestamp in the buffer keeps the last point
+            writer.add(key, data_list[9][0], {"value": -9})
+            writer.flush()
+
+            self.assertEqual(writer.metrics["late_points"], 0)
+            self.assertEqual(writer.metrics["dropped_points"], 1)
+
+        self.assertEqual(self.time_series.get_slice(key), data_list[:9] + [(data_list[9][0], {"value": -9})])
+
+    def test_reorder_window_idle_key(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(3)
+
+        # the held back points keep their age, the idle key is flushed after max_age + reorder_window
+        writer = BufferedWriter(self.time_series, max_points=1000, max_age=0.1, reorder_window=1.0)
+        for timestamp, data in data_list:
+            writer.add(key, timestamp, data)
+
+        time.sleep(0.3)
+        self.assertEqual(self.time_series.get_slice(key), data_list[:2])
+        for _ in range(150):
+            if writer.metrics["flushed_points"] == 3:
+                break
+            time.sleep(0.01)
+        self.assertEqual(writer.metrics["buffered_points"], 0)
+        self.assertEqual(self.time_series.get_slice(key), data_list)
+        writer.close()
+
+    def test_flush_not_started(self):
+        writer = BufferedWriter(self.time_series, start=False)
+        writer.add("APPL:SECOND:1", self.timestamp, {"value": 1})
+
+        with self.assertRaises(RedisTimeSeriesError):
+            writer.flush()
+        writer.start()
+        self.assertTrue(writer.flush())
+        writer.close()
+        self.assertEqual(self.time_series.get_slice("APPL:SECOND:1"), [(self.timestamp, {"value": 1})])
+
+    def test_backpressure(self):
+        writer = BufferedWriter(self.time_series, max_queue_size=2, start=False)
+        writer.add("APPL:SECOND:1", self.timestamp, {"value": 1})
+        writer.add("APPL:SECOND:1", self.timestamp + 1, {"value": 2})
+
+        with self.assertRaises(queue.Full):
+            writer.add("APPL:SECOND:1", self.timestamp + 2, {"value": 3}, timeout=0.01)
+        self.assertEqual(writer.metrics["queue_depth"], 2)
+
+    def test_flush_retry(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(10)
+        add_many = self.time_series.add_many
+        failures = [redis.ConnectionError("connection lost")] * 2
+
+        def failing_add_many(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return add_many(*args, **kwargs)
+
+        with unittest.mock.patch.object(self.time_series, "add_many", side_effect=failing_add_many):
+            with BufferedWriter(self.time_series, max_points=5, max_age=60, retry_backoff=0.01) as writer:
+                for timestamp, data in data_list:
+                    writer.add(key, timestamp, data)
+                writer.flush()
+
+                # the failed points went back into the buffer and were retried
+                self.assertEqual(self.time_series.get_slice(key), data_list)
+                self.assertEqual(writer.metrics["errors"], 2)
+                self.assertEqual(writer.metrics["flushed_points"], 10)
+
+    def test_flush_retry_limit(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(5)
+
+        with unittest.mock.patch.object(self.time_series, "add_many",
+                                        side_effect=redis.ConnectionError("connection lost")):
+            writer = BufferedWriter(self.time_series, max_retries=2, retry_backoff=0.01,
+                                    journal_path=self.journal_path)
+            for timestamp, data in data_list:
+                writer.add(key, timestamp, data)
+            with self.assertRaises(FlushError) as context:
+                writer.flush()
+            self.assertEqual(context.exception.points, 5)
+            self.assertEqual(writer.metrics["errors"], 3)
+            self.assertEqual(writer.metrics["failed_points"], 5)
+            writer.close()
+
+        # the failures of all the keys are raised together
+        with unittest.mock.patch.object(self.time_series, "add_many",
+                                        side_effect=redis.ConnectionError("connection lost")):
+            writer = BufferedWriter(self.time_series, max_retries=0)
+            writer.add(key, self.timestamp, {"value": 1})
+            writer.add("APPL:SECOND:2", self.timestamp, {"value": 1})
+            with self.assertRaises(FlushError) as context:
+                writer.flush()
+            self.assertEqual(sorted(error.name for error in context.exception.errors),
+                             [key, "APPL:SECOND:2"])
+            writer.close()
+
+        # the journal keeps the failed points for the next start
+        with BufferedWriter(self.time_series, journal_path=self.journal_path):
+            self.assertEqual(self.time_series.get_slice(key), data_list)
+
+    def test_journal_recover(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(10)
+
+        with BufferedWriter(self.time_series, max_points=5, journal_path=self.journal_path) as writer:
+            for timestamp, data in data_list[:5]:
+                writer.add(key, timestamp, data)
+            writer.flush()
+            # flushed segments are removed except the writing one
+            self.assertEqual(len(os.listdir(self.journal_dir)), 1)
+        self.assertEqual(os.listdir(self.journal_dir), [])
+
+        # the flush thread never runs, as if the process crashed
+        crashed = BufferedWriter(self.time_series, journal_path=self.journal_path, start=False)
+        for timestamp, data in data_list[3:]:
+            crashed.add(key, timestamp, data)
+        crashed.close()
+        self.assertEqual(self.time_series.length(key), 5)
+
+        writer = BufferedWriter(self.time_series, journal_path=self.journal_path)
+        self.assertEqual(self.time_series.get_slice(key), data_list)
+        writer.close()
+        self.assertEqual(os.listdir(self.journal_dir), [])
+
+    def test_journal_segments(self):
+        key = "APPL:SECOND:1"
+        data_list = self.generate_data(20)
+
+        writer = BufferedWriter(self.time_series, journal_path=self.journal_path,
+                                journal_segment_bytes=64, start=False)
+        for timestamp, data in data_list:
+            writer.add(key, timestamp, data)
+        self.assertGreater(len(os.listdir(self.journal_dir)), 1)
+        writer.close()
+
+        with BufferedWriter(self.time_series, journal_path=self.journal_path):
+            self.assertEqual(self.time_series.get_slice(key), data_list)
+        self.assertEqual(os.listdir(self.journal_dir), [])
+
+
+class BufferedNumpyWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dtype = [("timestamp", "float64"), ("value", "int64")]
+        self.time_series = RedisNumpyTimeSeries(redis.StrictRedis(), dtype=self.dtype,
+                                                timestamp_column_name="timestamp")
+        self.timestamp = datetime.datetime.now().timestamp()
+
+    def tearDown(self):
+        self.time_series.flush()
+
+    def test_add(self):
+        key = "APPL:SECOND:1"
+        array = np.array([(self.timestamp + i, i) for i in range(10)], dtype=self.dtype)
+
+        with BufferedWriter(self.time_series, max_points=4) as writer:
+            for row in array[::-1]:
+                writer.add(key, row["timestamp"], row)
+
+        numpy.testing.assert_array_equal(self.time_series.get_slice(key), array)
+
+    def test_journal_recover(self):
+        key = "APPL:SECOND:1"
+        array = np.array([(self.timestamp + i, i) for i in range(10)], dtype=self.dtype)
+        journal_dir = tempfile.mkdtemp()
+        journal_path = os.path.join(journal_dir, "journal")
+        self.addCleanup(shutil.rmtree, journal_dir)
+
+        crashed = BufferedWriter(self.time_series, journal_path=journal_path, start=False)
+        for row in array:
+            crashed.add(key, row["timestamp"], row)
+        crashed.close()
+        # a record truncated by the crash
+        segment, = os.listdir(journal_dir)
+        with open(os.path.join(journal_dir, segment), "ab") as f:
+            f.write(b"\x93\xadAPPL")
+
+        BufferedWriter(self.time_series, journal_path=journal_path).close()
+        numpy.testing.assert_array_equal(self.time_series.get_slice(key), array)
+        self.assertEqual(os.listdir(journal_dir), [])
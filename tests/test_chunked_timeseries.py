@@ -0,0 +1,294 @@
+# encoding:utf-8
+import datetime
+import time
+import unittest
+import unittest.mock
+
+import numpy as np
+import redis
+
+from ttseries import RedisChunkedTimeSeries
+from ttseries.exceptions import RedisTimeSeriesError
+from ttseries.ts import gorilla
+from ttseries.ts.gorilla import encode_block, decode_block
+
+
+class GorillaTest(unittest.TestCase):
+
+    def assert_round_trip(self, timestamps, values):
+        result_timestamps, result_values = decode_block(encode_block(timestamps, values))
+        self.assertListEqual(result_timestamps.tolist(), timestamps)
+        np.testing.assert_array_equal(result_values.view(np.uint64),
+                                      np.asarray(values, dtype=np.float64).view(np.uint64))
+
+    def test_regular_series(self):
+        timestamps = [1537112691000000 + i * 1000000 for i in range(1000)]
+        values = np.round(100 + np.cumsum(np.random.normal(size=1000)) * 0.01, 2)
+        self.assert_round_trip(timestamps, values)
+
+        # one bit of the timestamp and a few bits of the value of each point
+        self.assertLess(len(encode_block(timestamps, values)), 8 * 1000)
+        self.assertLess(len(encode_block(timestamps, [1.0] * 1000)), 300)
+
+    def test_irregular_series(self):
+        deltas = [1, 2, 1000, 1 << 20, 1 << 40, 3, 1, 1 << 62]
+        timestamps = np.cumsum([1537112691000000] + deltas).tolist()
+        values = [0.0, -0.0, 1.5, float("nan"), float("inf"), 1e308, -3.25, 5e-324, 7.0]
+        self.assert_round_trip(timestamps, values)
+
+    def test_one_point(self):
+        self.assert_round_trip([1537112691000000], [42.0])
+
+
+class RedisChunkedTSTest(unittest.TestCase):
+
+    def setUp(self):
+        self.time_series = RedisChunkedTimeSeries(redis.StrictRedis(), max_length=1000, block_span=10)
+        self.timestamp = float(int(datetime.datetime.now().timestamp()) // 10 * 10) + 0.5
+        self.key = "APPL:SECOND"
+
+    def tearDown(self):
+        self.time_series.stop_compaction()
+        self.time_series.flush()
+
+    def generate_data(self, length, start=0):
+        return [(self.timestamp + i, float(i) / 4) for i in range(start, start + length)]
+
+    def test_add_compact(self):
+        data_list = self.generate_data(25)
+        for timestamp, value in data_list:
+            self.time_series.add(self.key, timestamp, value)
+
+        self.assertEqual(self.time_series.get_slice(self.key), data_list)
+        # the head points of the latest window stay uncompressed
+        self.assertEqual(self.time_series.compact(self.key), 20)
+        self.assertEqual(self.time_series.client.zcard(self.key), 2)
+        self.assertEqual(self.time_series.client.zcard(self.time_series._head_key(self.key)), 5)
+
+        self.assertEqual(self.time_series.compact(self.key, force=True), 5)
+        self.assertEqual(self.time_series.client.zcard(self.key), 3)
+        self.assertFalse(self.time_series.client.exists(self.time_series._head_key(self.key)))
+
+        self.assertEqual(self.time_series.get_slice(self.key), data_list)
+        self.assertEqual(self.time_series.length(self.key), 25)
+        self.assertEqual(self.time_series.get(self.key, data_list[12][0]), data_list[12][1])
+        self.assertEqual(self.time_series.max_timestamp(self.key), data_list[-1])
+        self.assertEqual(self.time_series.min_timestamp(self.key), data_list[0])
+
+    def test_get_slice_range(self):
+        data_list = self.generate_data(50)
+        self.time_series.add_many(self.key, data_list)
+
+        self.assertEqual(self.time_series.get_slice(self.key, data_list[12][0], data_list[27][0]),
+                         data_list[12:28])
+        self.assertEqual(self.time_series.get_slice(self.key, "(" + repr(data_list[12][0]),
+                                                    "(" + repr(data_list[27][0])),
+                         data_list[13:27])
+        self.assertEqual(self.time_series.get_slice(self.key, limit=5, asc=False), data_list[::-1][:5])
+        self.assertEqual(self.time_series.count(self.key, data_list[5][0], data_list[9][0]), 5)
+        self.assertIsNone(self.time_series.get_slice(self.key, self.timestamp - 100, self.timestamp - 50))
+
+    def test_get_slice_raw(self):
+        data_list = self.generate_data(25)
+        self.time_series.add_many(self.key, data_list[:20])
+        for timestamp, value in data_list[20:]:
+            self.time_series.add(self.key, timestamp, value)
+
+        timestamps, buffer, offsets = self.time_series.get_slice_raw(self.key, data_list[5][0], limit=18)
+        self.assertListEqual(timestamps.tolist(), [timestamp for timestamp, _ in data_list[5:23]])
+        self.assertListEqual(np.frombuffer(buffer, dtype="<f8").tolist(), [value for _, value in data_list[5:23]])
+        self.assertListEqual(offsets.tolist(), list(range(0, 19 * 8, 8)))
+
+    def test_iter_slice(self):
+        data_list = self.generate_data(45)
+        self.time_series.add_many(self.key, data_list[:40])
+        for timestamp, value in data_list[40:]:
+            self.time_series.add(self.key, timestamp, value)
+
+        pages = list(self.time_series.iter_slice(self.key, page_size=7))
+        self.assertListEqual([len(page) for page in pages], [7] * 6 + [3])
+        self.assertListEqual([point for page in pages for point in page], data_list)
+
+        pages = list(self.time_series.iter_slice(self.key, "(" + repr(data_list[3][0]), data_list[42][0],
+                                                 page_size=12, asc=False))
+        self.assertListEqual([point for page in pages for point in page], data_list[4:43][::-1])
+
+    def test_add_many_merge(self):
+        data_list = self.generate_data(30)
+        self.time_series.add_many(self.key, data_list[:10] + data_list[20:])
+        for timestamp, value in data_list[10:15]:
+            self.time_series.add(self.key, timestamp, value)
+
+        # merged with the head points of the same windows
+        self.time_series.add_many(self.key, data_list[15:20][::-1])
+        self.assertEqual(self.time_series.get_slice(self.key), data_list)
+        self.assertFalse(self.time_series.client.exists(self.time_series._head_key(self.key)))
+        self.assertEqual(self.time_series.client.zcard(self.key), 3)
+
+    def test_add_many_on_conflict(self):
+        data_list = self.generate_data(20)
+        self.time_series.add_many(self.key, data_list[:10])
+
+        with self.assertRaises(RedisTimeSeriesError):
+            self.time_series.add_many(self.key, data_list[5:])
+        self.assertEqual(self.time_series.length(self.key), 10)
+
+        self.time_series.add_many(self.key, [(timestamp, -1.0) for timestamp, _ in data_list[5:]],
+                                  on_conflict="skip")
+        self.assertEqual(self.time_series.get_slice(self.key),
+                         data_list[:10] + [(timestamp, -1.0) for timestamp, _ in data_list[10:]])
+
+        self.time_series.add_many(self.key, data_list[5:], on_conflict="replace")
+        self.assertEqual(self.time_series.get_slice(self.key), data_list)
+
+    def test_add_on_conflict(self):
+        self.time_series.add(self.key, self.timestamp, 1.0)
+        self.assertEqual(self.time_series.add(self.key, self.timestamp, 2.0), 0)
+        with self.assertRaises(RedisTimeSeriesError):
+            self.time_series.add(self.key, self.timestamp, 2.0, on_conflict="error")
+        with self.assertRaises(RedisTimeSeriesError):
+            self.time_series.add(self.key, self.timestamp + 1, "a")
+
+        # the conflict is checked with the sealed blocks too
+        self.time_series.compact(self.key, force=True)
+        self.assertEqual(self.time_series.add(self.key, self.timestamp, 3.0), 0)
+        self.assertEqual(self.time_series.get(self.key, self.timestamp), 1.0)
+        with self.assertRaises(RedisTimeSeriesError):
+            self.time_series.add(self.key, self.timestamp, 3.0, on_conflict="error")
+        self.assertEqual(self.time_series.add(self.key, self.timestamp, 3.0, on_conflict="replace"), 1)
+        self.assertEqual(self.time_series.get_slice(self.key), [(self.timestamp, 3.0)])
+        self.assertFalse(self.time_series.client.exists(self.time_series._head_key(self.key)))
+        self.assertEqual(self.time_series.length(self.key), 1)
+
+    def test_add_after_compact(self):
+        data_list = self.generate_data(30)
+        for timestamp, value in data_list:
+            self.time_series.add(self.key, timestamp, value)
+        self.time_series.compact(self.key)
+
+        for timestamp, _ in data_list[::3]:
+            self.assertEqual(self.time_series.add(self.key, timestamp, 99.0), 0)
+        self.assertEqual(self.time_series.get_slice(self.key), data_list)
+
+        # a new point of a sealed window is merged into the block
+        self.time_series.delete(self.key, data_list[5][0], data_list[5][0])
+        self.assertEqual(self.time_series.add(self.key, data_list[5][0], data_list[5][1], on_conflict="error"), 1)
+        self.assertEqual(self.time_series.client.zcard(self.time_series._head_key(self.key)), 10)
+        self.assertEqual(self.time_series.get_slice(self.key), data_list)
+        self.assertEqual(self.time_series.length(self.key), 30)
+        self.assertEqual(self.time_series.count(self.key), 30)
+
+    def test_trim_after_compact(self):
+        data_list = self.generate_data(30)
+        for timestamp, value in data_list:
+            self.time_series.add(self.key, timestamp, value)
+        self.time_series.compact(self.key)
+        for timestamp, _ in data_list[:20]:
+            self.time_series.add(self.key, timestamp, -1.0, on_conflict="replace")
+
+        self.assertEqual(self.time_series.length(self.key), 30)
+        self.time_series.trim(self.key, 12)
+        self.assertEqual(self.time_series.length(self.key), 18)
+        self.assertEqual(self.time_series.get_slice(self.key),
+                         [(timestamp, -1.0) for timestamp, _ in data_list[12:20]] + data_list[20:])
+
+    def test_trim_boundary_block(self):
+        data_list = self.generate_data(40)
+        self.time_series.add_many(self.key, data_list[10:])
+        # the head points of a time window without block are older than the blocks
+        for timestamp, value in data_list[:10]:
+            self.time_series.add(self.key, timestamp, value)
+        self.assertEqual(self.time_series.client.get(self.key + ":COUNT"), b"30")
+
+        with unittest.mock.patch.object(gorilla, "decode_block", wraps=gorilla.decode_block) as decode:
+            # the head points and a whole block, nothing decoded
+            self.time_series.trim(self.key, 20)
+            self.assertEqual(decode.call_count, 0)
+            # only the boundary block is decoded
+            self.time_series.trim(self.key, 5)
+            self.assertEqual(decode.call_count, 1)
+
+        self.assertEqual(self.time_series.length(self.key), 15)
+        self.assertEqual(self.time_series.client.get(self.key + ":COUNT"), b"15")
+        self.assertEqual(self.time_series.get_slice(self.key), data_list[25:])
+
+        self.time_series.delete(self.key, end_timestamp=data_list[-1][0])
+        self.assertIsNone(self.time_series.client.get(self.key + ":COUNT"))
+        self.assertEqual(list(self.time_series.iter_keys()), [])
+
+    def test_add_max_length(self):
+        self.time_series.max_length = 25
+        data_list = self.generate_data(40)
+        for timestamp, value in data_list[:20]:
+            self.time_series.add(self.key, timestamp, value)
+        self.time_series.compact(self.key, force=True)
+
+        # the head points are trimmed with the blocks as a whole series
+        for timestamp, value in data_list[20:]:
+            self.time_series.add(self.key, timestamp, value)
+        self.assertEqual(self.time_series.length(self.key), 30)
+        self.assertEqual(self.time_series.get_slice(self.key), data_list[10:])
+
+        self.time_series.delete(self.key)
+        for timestamp, value in data_list:
+            self.time_series.add(self.key, timestamp, value)
+        self.assertEqual(self.time_series.length(self.key), 25)
+        self.assertEqual(self.time_series.get_slice(self.key), data_list[15:])
+
+    def test_delete_trim(self):
+        data_list = self.generate_data(30)
+        self.time_series.add_many(self.key, data_list[:25])
+        for timestamp, value in data_list[25:]:
+            self.time_series.add(self.key, timestamp, value)
+
+        self.time_series.delete(self.key, data_list[8][0], data_list[26][0])
+        self.assertEqual(self.time_series.get_slice(self.key), data_list[:8] + data_list[27:])
+
+        self.time_series.trim(self.key, 5)
+        self.assertEqual(self.time_series.get_slice(self.key), data_list[5:8] + data_list[27:])
+
+        self.time_series.delete(self.key)
+        self.assertFalse(self.time_series.exists(self.key))
+
+    def test_max_length(self):
+        self.time_series.max_length = 25
+        data_list = self.generate_data(50)
+        self.time_series.add_many(self.key, data_list[:30])
+        self.time_series.add_many(self.key, data_list[30:])
+
+        # trimmed by whole blocks
+        self.assertEqual(self.time_series.length(self.key), 30)
+        self.assertEqual(self.time_series.get_slice(self.key), self.generate_data(30, 20))
+
+    def test_iter_keys_iter(self):
+        keys = ["APPL:SECOND:" + str(i) for i in range(5)]
+        data_list = self.generate_data(35)
+        for key in keys:
+            self.time_series.add_many(key, data_list[:10] + data_list[20:30])
+            for timestamp, value in data_list[10:20] + data_list[30:]:
+                self.time_series.add(key, timestamp, value)
+
+        self.assertEqual(sorted(self.time_series.iter_keys()), keys)
+        self.assertEqual(list(self.time_series.iter(keys[0], count=1)), data_list)
+
+        self.time_series.remove_many(keys)
+        self.assertEqual(list(self.time_series.iter_keys()), [])
+
+    def test_background_compaction(self):
+        data_list = self.generate_data(25)
+        for timestamp, value in data_list:
+            self.time_series.add(self.key, timestamp, value)
+
+        self.time_series.start_compaction(interval=0.01)
+        for _ in range(100):
+            if self.time_series.compaction_stats["sealed_points"] == 20:
+                break
+            time.sleep(0.01)
+        self.time_series.stop_compaction()
+
+        self.assertEqual(self.time_series.compaction_stats["sealed_points"], 20)
+        self.assertEqual(self.time_series.get_slice(self.key), data_list)
+
+    def test_validate_key(self):
+        with self.assertRaises(RedisTimeSeriesError):
+            self.time_series.add("APPL:HEAD", self.timestamp, 1.0)
@@ -0,0 +1,94 @@
+# encoding:utf-8
+"""
+redis cluster tests, start a local cluster with `make cluster-start`,
+the startup node can be changed with the `TTSERIES_CLUSTER_URL` environment variable.
+"""
+import datetime
+import os
+import unittest
+
+import redis
+import redis.cluster
+
+from ttseries import RedisHashTimeSeries, RedisSampleTimeSeries
+from ttseries.utils import key_slot
+
+CLUSTER_URL = os.environ.get("TTSERIES_CLUSTER_URL", "redis://127.0.0.1:7000/0")
+
+
+def cluster_client():
+    try:
+        client = redis.cluster.RedisCluster.from_url(CLUSTER_URL, socket_connect_timeout=0.5)
+        client.ping()
+        return client
+    except (redis.exceptions.RedisError, redis.exceptions.RedisClusterException, OSError):
+        return None
+
+
+CLUSTER_CLIENT = cluster_client()
+
+
+@unittest.skipIf(CLUSTER_CLIENT is None, "redis cluster is not available")
+class RedisClusterMixin(object):
+    time_series_cls = None
+
+    def setUp(self):
+        self.time_series = self.time_series_cls(CLUSTER_CLIENT, max_length=10)
+        self.timestamp = datetime.datetime.now().timestamp()
+        self.keys = ["APPL:CLUSTER:" + str(i) for i in range(20)]
+
+    def tearDown(self):
+        self.time_series.remove_many(self.keys)
+
+    def generate_data(self, length):
+        return [(self.timestamp + i, {"value": i}) for i in range(length)]
+
+    def test_cluster_detected(self):
+        self.assertTrue(self.time_series.cluster)
+
+    def test_add_many_get_slice(self):
+        data_list = self.generate_data(10)
+        for key in self.keys:
+            self.time_series.add_many(key, data_list)
+            self.time_series.add(key, self.timestamp + 10, {"value": 10})
+            self.assertListEqual(self.time_series.get_slice(key), data_list[1:] + [(self.timestamp + 10, {"value": 10})])
+
+        # the keys spread over many hash slots
+        self.assertGreater(len({key_slot(key) for key in self.keys}), 1)
+
+    def test_add_many_keys(self):
+        data_list = self.generate_data(5)
+        self.time_series.add_many_keys({key: data_list for key in self.keys}, pipeline_bytes=128)
+        for key in self.keys:
+            self.assertListEqual(self.time_series.get_slice(key), data_list)
+
+    def test_iter_keys_remove_many(self):
+        data_list = self.generate_data(5)
+        for key in self.keys:
+            self.time_series.add_many(key, data_list)
+
+        self.assertTrue(set(self.keys).issubset(self.time_series.iter_keys()))
+
+        self.time_series.remove_many(self.keys[:10], start_timestamp=data_list[3][0])
+        self.time_series.remove_many(self.keys[10:])
+        for key in self.keys[:10]:
+            self.assertEqual(self.time_series.length(key), 3)
+        for key in self.keys[10:]:
+            self.assertFalse(self.time_series.exists(key))
+
+
+class RedisClusterSampleTest(RedisClusterMixin, unittest.TestCase):
+    time_series_cls = RedisSampleTimeSeries
+
+
+class RedisClusterHashTest(RedisClusterMixin, unittest.TestCase):
+    time_series_cls = RedisHashTimeSeries
+
+    def test_trim_delete(self):
+        key = self.keys[0]
+        self.time_series.add_many(key, self.generate_data(10))
+        self.time_series.trim(key, 5)
+        self.time_series.delete(key, start_timestamp=self.timestamp + 8)
+
+        self.assertEqual(self.time_series.length(key), 3)
+        self.assertEqual(CLUSTER_CLIENT.hlen(self.time_series._hash_key(key)), 3)
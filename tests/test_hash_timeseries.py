@@ -1,10 +1,12 @@
 # encoding:utf-8
 import datetime
+import itertools
 import unittest
 
 import redis
 
 from ttseries import RedisHashTimeSeries
+from ttseries.exceptions import RedisTimeSeriesError
 from .mixin import Mixin
 
 
@@ -79,3 +81,122 @@ class RedisHashTSTest(unittest.TestCase, Mixin):
             self.assertListEqual(data_list, result)
 
     # ****************  end remove many ********************
+
+    def test_add_trim_hash_keys(self):
+        key = "APPL:SECOND:7"
+        hash_key = key + ":HASH"
+        data_list = self.generate_data(15)
+        for timestamp, data in data_list:
+            self.time_series.add(key, timestamp, data)
+
+        self.assertEqual(self.time_series.length(key), 10)
+        self.assertEqual(self.time_series.client.hlen(hash_key), 10)
+        self.assertListEqual(self.time_series.get_slice(key), data_list[5:])
+
+    def test_add_then_add_many(self):
+        key = "APPL:SECOND:8"
+        data_list = self.generate_data(6)
+        self.time_series.add(key, data_list[0][0], data_list[0][1])
+        self.time_series.add_many(key, data_list[1:])
+
+        self.assertListEqual(self.time_series.get_slice(key), data_list)
+
+    def test_iter_ordered(self):
+        key = "APPL:SECOND:9"
+        data_list = self.generate_data(10)
+        # the ids are not in the order of the timestamps
+        self.time_series.add_many(key, data_list[5:])
+        self.time_series.add_many(key, data_list[:5])
+
+        self.assertListEqual(list(self.time_series.iter(key, count=3)), data_list)
+
+        # the data removed between the reads is skipped
+        key_id = self.time_series.client.zrange(key, 4, 4)[0]
+        self.time_series.client.hdel(key + ":HASH", key_id)
+        self.assertListEqual(list(self.time_series.iter(key, count=4)), data_list[:4] + data_list[5:])
+
+    def test_iter_trim_between_pages(self):
+        key = "APPL:SECOND:12"
+        data_list = self.generate_data(10)
+        self.time_series.add_many(key, data_list)
+
+        results = self.time_series.iter(key, count=3)
+        first_page = list(itertools.islice(results, 3))
+        # the ranks shift after the trim, the score cursor doesn't
+        self.time_series.trim(key, 3)
+        self.assertListEqual(first_page + list(results), data_list)
+
+
+    def test_get_slice_batches(self):
+        key = "APPL:SECOND:10"
+        self.time_series.max_length = 1100
+        data_list = self.generate_data(1100)
+        self.time_series.add_many(key, data_list)
+
+        # the data is read by batches of HMGET in one script call
+        self.assertListEqual(self.time_series.get_slice(key), data_list)
+        self.assertListEqual(self.time_series.get_slice(key, end_timestamp=data_list[1050][0], limit=1001,
+                                                        asc=False), data_list[50:1051][::-1])
+
+        key_id = self.time_series.client.zrange(key, 1020, 1020)[0]
+        self.time_series.client.hdel(key + ":HASH", key_id)
+        self.assertListEqual(self.time_series.get_slice(key), data_list[:1020] + data_list[1021:])
+        self.assertIsNone(self.time_series.get(key, data_list[1020][0]))
+
+        self.time_series.scripted_reads = False
+        self.assertListEqual(self.time_series.get_slice(key), data_list[:1020] + data_list[1021:])
+        self.assertListEqual(self.time_series.get_slice(key, limit=3, asc=False), data_list[::-1][:3])
+        self.assertIsNone(self.time_series.get(key, data_list[1020][0]))
+
+    def test_get_slice_raw_missing(self):
+        key = "APPL:SECOND:11"
+        data_list = self.generate_data(10)
+        self.time_series.add_many(key, data_list)
+        key_id = self.time_series.client.zrange(key, 4, 4)[0]
+        self.time_series.client.hdel(key + ":HASH", key_id)
+        expected = data_list[:4] + data_list[5:]
+
+        for scripted_reads in (True, False):
+            self.time_series.scripted_reads = scripted_reads
+            timestamps, buffer, offsets = self.time_series.get_slice_raw(key)
+            self.assertListEqual(timestamps.tolist(), [timestamp for timestamp, _ in expected])
+            self.assertListEqual(self.time_series._serializer.loads_many(
+                [buffer[begin:end] for begin, end in zip(offsets[:-1], offsets[1:])]),
+                [data for _, data in expected])
+
+
+class RedisHashClusterKeysTest(unittest.TestCase):
+    """
+    cluster key layout works with a standalone redis server as well
+    """
+
+    def setUp(self):
+        self.time_series = RedisHashTimeSeries(redis.StrictRedis(), max_length=10, cluster=True)
+        self.timestamp = datetime.datetime.now().timestamp()
+
+    def tearDown(self):
+        self.time_series.flush()
+
+    def test_hash_tag_keys(self):
+        self.assertEqual(self.time_series._hash_key("APPL:SECOND"), "{APPL:SECOND}:HASH")
+        self.assertEqual(self.time_series._incr_key("APPL:SECOND"), "{APPL:SECOND}:ID")
+        # the key already has a hash tag
+        self.assertEqual(self.time_series._hash_key("{APPL}:SECOND"), "{APPL}:SECOND:HASH")
+        self.assertEqual(self.time_series._incr_key("{APPL}:SECOND"), "{APPL}:SECOND:ID")
+
+    def test_add_iter_keys_remove_many(self):
+        keys = ["APPL:SECOND", "{APPL}:MINUTE"]
+        data_list = [(self.timestamp + i, {"value": i}) for i in range(5)]
+        for key in keys:
+            self.time_series.add_many(key, data_list)
+            self.assertListEqual(self.time_series.get_slice(key), data_list)
+
+        self.assertTrue(self.time_series.client.exists("{APPL:SECOND}:HASH"))
+        self.assertEqual(sorted(self.time_series.iter_keys()), sorted(keys))
+
+        self.time_series.remove_many(keys)
+        self.assertEqual(self.time_series.client.dbsize(), 0)
+
+    def test_whole_hash_tag_key(self):
+        with self.assertRaises(RedisTimeSeriesError):
+            self.time_series.add("{APPL}", self.timestamp, {"value": 1})
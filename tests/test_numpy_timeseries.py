@@ -30,6 +30,23 @@ class RedisNumpyTSTestMixin(object):
         with self.assertRaises(RedisTimeSeriesError):
             self.time_series.add_many(key, data_array)
 
+    def test_add_many_on_conflict_skip(self):
+        key = "AAPL:SECOND"
+        array = self.prepare_numpy_data(10)
+        self.time_series.add_many(key, array[:6])
+        self.time_series.add_many(key, array[4:], on_conflict="skip")
+
+        results = self.time_series.get_slice(key)
+        numpy.testing.assert_array_equal(results, array)
+
+    def test_add_many_unsorted(self):
+        key = "AAPL:SECOND"
+        array = self.prepare_numpy_data(10)
+        self.time_series.add_many(key, array[::-1])
+
+        results = self.time_series.get_slice(key)
+        numpy.testing.assert_array_equal(results, array)
+
     def test_iter(self):
         key = "AAPL:SECOND"
         data_array = self.prepare_numpy_data(10)
@@ -38,6 +55,45 @@ class RedisNumpyTSTestMixin(object):
         for array in self.time_series.iter(key):
             self.assertTrue(array in data_array)
 
+    def test_iter_batches(self):
+        key = "AAPL:SECOND"
+        data_array = self.prepare_numpy_data(10)
+        self.time_series.add_many(key, data_array)
+
+        batches = list(self.time_series.iter_batches(key, batch_size=3))
+        self.assertListEqual([len(batch) for batch in batches], [3, 3, 3, 1])
+        numpy.testing.assert_array_equal(np.concatenate(batches), data_array)
+        self.assertListEqual(list(self.time_series.iter_batches("AAPL:MINUTE")), [])
+
+    def test_iter_batches_modified(self):
+        key = "AAPL:SECOND"
+        data_array = self.prepare_numpy_data(10)
+        self.time_series.add_many(key, data_array[3:])
+
+        # the rows inserted before the cursor are neither repeated nor read
+        batches = self.time_series.iter_batches(key, batch_size=3)
+        first = next(batches)
+        self.time_series.add_many(key, data_array[:3])
+        numpy.testing.assert_array_equal(np.concatenate([first] + list(batches)), data_array[3:])
+
+        # the trimmed rows are skipped, the kept rows are read in order
+        batches = self.time_series.iter_batches(key, batch_size=3)
+        first = next(batches)
+        self.time_series.trim(key, 5)
+        result = np.concatenate([first] + list(batches))
+        numpy.testing.assert_array_equal(result[:3], data_array[:3])
+        numpy.testing.assert_array_equal(result[-5:], data_array[5:])
+        self.assertEqual(len(result), len(np.unique(result, axis=0)))
+
+    def test_iter_slice(self):
+        key = "AAPL:SECOND"
+        data_array = self.prepare_numpy_data(10)
+        self.time_series.add_many(key, data_array)
+
+        pages = list(self.time_series.iter_slice(key, page_size=4, asc=False))
+        self.assertListEqual([len(page) for page in pages], [4, 4, 2])
+        numpy.testing.assert_array_equal(np.concatenate(pages), data_array[::-1])
+
 
 class RedisNumpyTSTest(unittest.TestCase, RedisNumpyTSTestMixin):
     def setUp(self):
@@ -97,3 +153,54 @@ class RedisNumpyDtypeTSTest(unittest.TestCase, RedisNumpyTSTestMixin):
         result = self.time_series.get(key, array["timestamp"][0])
 
         numpy.testing.assert_array_equal(result, array[0])
+
+
+class RedisNumpyBinaryTSTest(unittest.TestCase, RedisNumpyTSTestMixin):
+
+    def setUp(self):
+        redis_client = redis.StrictRedis()
+        self.dtype = [("value", ">i8"), ("timestamp", "float64"), ("price", "float32"), ("symbol", "U4")]
+        self.time_series = RedisNumpyTimeSeries(redis_client=redis_client,
+                                                max_length=20, dtype=self.dtype,
+                                                timestamp_column_name="timestamp",
+                                                binary_records=True)
+        self.timestamp = datetime.now().timestamp()
+
+    def tearDown(self):
+        self.time_series.flush()
+
+    def prepare_numpy_data(self, length):
+        data_list = [(i, self.timestamp + i, i / 2, "AP" + str(i)) for i in range(length)]
+        return np.array(data_list, dtype=self.dtype)
+
+    def test_binary_records(self):
+        key = "AAPL:SECOND"
+        array = self.prepare_numpy_data(10)
+        self.time_series.add_many(key, array)
+
+        member = self.time_series.client.zrange(key, 0, 0)[0]
+        # value, price and symbol without the timestamp
+        self.assertEqual(len(member), 8 + 4 + 16)
+        self.assertEqual(member[:8], (0).to_bytes(8, "little"))
+
+    def test_add_many_not_modify_array(self):
+        key = "AAPL:SECOND"
+        array = self.prepare_numpy_data(10)[::-1]
+        copied = array.copy()
+        self.time_series.add_many(key, array)
+
+        numpy.testing.assert_array_equal(array, copied)
+        numpy.testing.assert_array_equal(self.time_series.get_slice(key), copied[::-1])
+
+    def test_add_get(self):
+        key = "AAPL:SECOND"
+        array = self.prepare_numpy_data(3)
+        self.time_series.add(key, array["timestamp"][0], array[0])
+        self.time_series.add(key, array["timestamp"][1], (1, 0.5, "AP1"))
+
+        numpy.testing.assert_array_equal(self.time_series.get(key, array["timestamp"][1]), array[1])
+        numpy.testing.assert_array_equal(self.time_series.get_slice(key), array[:2])
+
+    def test_binary_records_without_dtype(self):
+        with self.assertRaises(RedisTimeSeriesError):
+            RedisNumpyTimeSeries(redis.StrictRedis(), binary_records=True)
@@ -1,6 +1,7 @@
 import datetime
 import unittest
 
+import numpy
 import pandas
 import redis
 
@@ -46,6 +47,15 @@ class RedisPandasMixin(object):
 
         self.assertTrue(data_frame.equals(new_data_frame))
 
+    def test_iter_slice(self):
+        key = "AAPL:SECOND"
+        data_frame = self.prepare_dataframe(10)
+        self.time_series.add_many(key, data_frame)
+
+        pages = list(self.time_series.iter_slice(key, page_size=4))
+        self.assertListEqual([len(page) for page in pages], [4, 4, 2])
+        self.assertTrue(data_frame.equals(pandas.concat(pages)))
+
     def test_add_exists_timestamp_assert_error(self):
         key = "AAPL:SECOND"
         data_frame = self.prepare_dataframe(10)
@@ -53,6 +63,15 @@ class RedisPandasMixin(object):
         with self.assertRaises(RedisTimeSeriesError):
             self.time_series.add_many(key, data_frame)
 
+    def test_add_many_on_conflict_skip(self):
+        key = "AAPL:SECOND"
+        data_frame = self.prepare_dataframe(10)
+        self.time_series.add_many(key, data_frame.iloc[:6])
+        self.time_series.add_many(key, data_frame.iloc[4:], on_conflict="skip")
+
+        results_frame = self.time_series.get_slice(key)
+        self.assertTrue(data_frame.equals(results_frame))
+
     def test_add_many_trim_data(self):
         key = "AAPL:SECOND"
         data_frame = self.prepare_dataframe(20)
@@ -64,6 +83,41 @@ class RedisPandasMixin(object):
 
         self.assertTrue(results_frame.equals(data_frame2.iloc[10:]))
 
+    def test_add_many_trim_rows(self):
+        key = "AAPL:SECOND"
+        time_series = RedisPandasTimeSeries(self.time_series.client, columns=["value", "value2"],
+                                            dtypes={"value": "int64", "value2": "float64"}, max_length=20)
+        data_frame = pandas.DataFrame({"value": range(15), "value2": [i / 2 for i in range(15)]},
+                                      index=pandas.date_range(datetime.datetime.now(), periods=15, freq="1min"))
+        data_frame.index.name = "timestamp"
+
+        # trimmed with the number of the rows, not the cells
+        time_series.add_many(key, data_frame)
+        self.assertTrue(time_series.get_slice(key).equals(data_frame))
+
+    def test_get_slice_timezone(self):
+        key = "AAPL:SECOND"
+        time_series = RedisPandasTimeSeries(self.time_series.client, columns=["value", "side", "price"],
+                                            dtypes={"value": "int64", "side": "string", "price": "float64"},
+                                            timezone="Asia/Shanghai", max_length=20)
+        date_index = pandas.date_range(datetime.datetime(2018, 9, 16, 12), periods=10, freq="1min",
+                                       tz="Asia/Shanghai", name="timestamp")
+        data_frame = pandas.DataFrame({"value": range(10), "side": ["buy", "sell"] * 5,
+                                       "price": [100.0 + i / 4 for i in range(10)]}, index=date_index)
+        data_frame = data_frame.astype({"side": "string"})
+
+        time_series.add_many(key, data_frame)
+        results_frame = time_series.get_slice(key)
+        pandas.testing.assert_frame_equal(results_frame, data_frame, check_freq=False)
+        self.assertEqual(time_series.get(key, date_index[3].timestamp()).name, date_index[3])
+
+    def test_index_timestamps(self):
+        date_index = pandas.date_range(datetime.datetime(2018, 3, 10), periods=2000, freq="37min") + \
+            pandas.to_timedelta(numpy.arange(2000) * 997, unit="us")
+        for index in (date_index, date_index.tz_localize("UTC").tz_convert("America/New_York")):
+            expected = [date.timestamp() for date in index.to_pydatetime()]
+            self.assertListEqual(self.time_series._index_timestamps(index).tolist(), expected)
+
 
 class RedisPandasTimeSeriesTest(unittest.TestCase, RedisPandasMixin):
     """
@@ -0,0 +1,29 @@
+# encoding:utf-8
+import unittest
+
+from ttseries.ts import replies
+
+
+class RepliesTest(unittest.TestCase):
+
+    def test_parse_resp2_reply(self):
+        response = [b"\x81\xa5value\x01", b"1526008483.5", b"ab", b"1526008484", b"", b"inf"]
+        scores, buffer, offsets = replies.parse_raw_slice(response)
+        self.assertListEqual(scores.tolist(), [1526008483.5, 1526008484.0, float("inf")])
+        self.assertEqual(buffer, b"\x81\xa5value\x01ab")
+        self.assertListEqual(offsets.tolist(), [0, 8, 10, 10])
+
+        members, scores = replies.parse_slice(response)
+        self.assertListEqual(members, [b"\x81\xa5value\x01", b"ab", b""])
+        self.assertListEqual(scores.tolist(), [1526008483.5, 1526008484.0, float("inf")])
+
+    def test_parse_resp3_reply(self):
+        response = [[b"a", 1526008483.5], [b"bc", 1526008484.0]]
+        scores, buffer, offsets = replies.parse_raw_slice(response)
+        self.assertListEqual(scores.tolist(), [1526008483.5, 1526008484.0])
+        self.assertEqual(buffer, b"abc")
+        self.assertListEqual(offsets.tolist(), [0, 1, 3])
+
+    def test_parse_empty_reply(self):
+        scores, buffer, offsets = replies.parse_raw_slice([])
+        self.assertEqual((scores.tolist(), buffer, offsets.tolist()), ([], b"", [0]))
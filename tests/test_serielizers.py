@@ -1,8 +1,10 @@
 # encoding:utf-8
 import datetime
 import decimal
+import gc
 import unittest
 
+import numpy as np
 import pytz
 
 from ttseries import serializers
@@ -66,3 +68,194 @@ class MsgPackSerializersTests(unittest.TestCase):
         encode_data = self.msgpack_serializer.dumps(obj)
         decode_data = self.msgpack_serializer.loads(encode_data)
         self.assertDictEqual(obj, decode_data)
+
+    def test_loads_many_and_dumps_many(self):
+        objs = [{"data": i, "time": datetime.datetime(2018, 9, 16, 12, 0, i), "value": decimal.Decimal(i) / 4}
+                for i in range(50)] + [[1, "a"], 3.5, "text", None]
+        encode_data = self.msgpack_serializer.dumps_many(objs)
+        self.assertListEqual(encode_data, [self.msgpack_serializer.dumps(obj) for obj in objs])
+        self.assertListEqual(self.msgpack_serializer.loads_many(encode_data), objs)
+        self.assertListEqual(self.msgpack_serializer.loads_many([]), [])
+        self.assertTrue(gc.isenabled())
+
+        with self.assertRaises(serializers.SerializerError):
+            self.msgpack_serializer.loads_many([encode_data[0] + encode_data[1]])
+
+
+class LzmaSerializer(serializers.CompressedSerializer):
+    algorithm = "lzma"
+    threshold = 64
+
+
+class CompressedSerializerTests(unittest.TestCase):
+    def setUp(self):
+        self.book = {"bids": [[100.0 - i / 100, 10 + i] for i in range(50)],
+                     "asks": [[100.0 + i / 100, 10 + i] for i in range(50)],
+                     "time": datetime.datetime(2018, 9, 16, 12, 0, 0)}
+        self.serializer = serializers.CompressedSerializer()
+
+    def test_loads_and_dumps(self):
+        encode_data = self.serializer.dumps(self.book)
+        self.assertTrue(encode_data.startswith(serializers.CompressedSerializer.HEADER))
+        self.assertDictEqual(self.serializer.loads(encode_data), self.book)
+
+        small = {"value": 1}
+        self.assertEqual(self.serializer.dumps(small), serializers.MsgPackSerializer().dumps(small))
+        self.assertDictEqual(self.serializer.loads(self.serializer.dumps(small)), small)
+
+        stats = self.serializer.stats
+        self.assertEqual(stats["dumps"], 3)
+        self.assertEqual(stats["compressed"], 1)
+        self.assertEqual(stats["loads"], 2)
+        self.assertGreater(stats["ratio"], 1)
+
+    def test_loads_many_and_dumps_many(self):
+        objs = [self.book, {"value": 1}, self.book]
+        encode_data = self.serializer.dumps_many(objs)
+        self.assertListEqual([data[:1] == serializers.CompressedSerializer.HEADER for data in encode_data],
+                             [True, False, True])
+        self.assertListEqual(self.serializer.loads_many(encode_data), objs)
+
+        stats = self.serializer.stats
+        self.assertEqual(stats["dumps"], 3)
+        self.assertEqual(stats["compressed"], 2)
+        self.assertEqual(stats["loads"], 3)
+
+    def test_read_mixed_data(self):
+        plain = serializers.MsgPackSerializer().dumps(self.book)
+        self.assertDictEqual(self.serializer.loads(plain), self.book)
+        # lzma data is readable by the zlib configured serializer
+        self.assertDictEqual(self.serializer.loads(LzmaSerializer().dumps(self.book)), self.book)
+
+    def test_zdict(self):
+        samples = [{"bid": 100.0 + i, "ask": 100.5 + i, "bid_size": i, "ask_size": i + 1} for i in range(100)]
+
+        class DictSerializer(serializers.CompressedSerializer):
+            threshold = 0
+            zdict = serializers.CompressedSerializer.train_zdict(samples)
+
+        serializer = DictSerializer()
+        record = {"bid": 250.0, "ask": 250.5, "bid_size": 7, "ask_size": 9}
+        encode_data = serializer.dumps(record)
+        self.assertLess(len(encode_data), len(self.serializer._compress(serializers.MsgPackSerializer().dumps(record))))
+        self.assertDictEqual(serializer.loads(encode_data), record)
+
+        with self.assertRaises(serializers.SerializerError):
+            self.serializer.loads(encode_data)
+
+    def test_algorithm(self):
+        class WrongSerializer(serializers.CompressedSerializer):
+            algorithm = "zip"
+
+        with self.assertRaises(serializers.SerializerError):
+            WrongSerializer()
+
+
+class MsgPackExtSerializerTests(MsgPackSerializersTests):
+    def setUp(self):
+        self.msgpack_serializer = serializers.MsgPackExtSerializer()
+
+    def test_ext_type_values(self):
+        values = [decimal.Decimal("-0.00"), decimal.Decimal("1E+5"), decimal.Decimal("-Infinity"),
+                  decimal.Decimal("-123456789012345678901234567890.5"),
+                  datetime.datetime(1900, 1, 1, 0, 0, 0, 1), datetime.datetime.max, datetime.date(1, 1, 1),
+                  datetime.time(23, 59, 59, 999999),
+                  datetime.time(1, 2, 3, tzinfo=datetime.timezone(datetime.timedelta(hours=-5)))]
+        decode_data = self.msgpack_serializer.loads(self.msgpack_serializer.dumps(values))
+
+        self.assertEqual(list(map(str, decode_data)), list(map(str, values)))
+
+    def test_decimal_large_exponent(self):
+        values = [decimal.Decimal("1E+3000000"), decimal.Decimal("-1.5E-3000000"),
+                  decimal.Decimal("1" + "2" * 10000 + "E-5")]
+        decode_data = self.msgpack_serializer.loads(self.msgpack_serializer.dumps(values))
+
+        self.assertEqual([value.as_tuple() for value in decode_data], [value.as_tuple() for value in values])
+
+    def test_loads_decimal_written_before(self):
+        data = [b"\xc7\x07\x04\x01\xfe\xff\xff\xff90", b"\xc7\x06\x04\x00\x05\x00\x00\x00\x01",
+                b"\xc7\x05\x04\x01\xfe\xff\xff\xff"]
+        values = [decimal.Decimal("-123.45"), decimal.Decimal("1E+5"), decimal.Decimal("-0.00")]
+
+        self.assertEqual([self.msgpack_serializer.loads(item) for item in data], values)
+        self.assertEqual([self.msgpack_serializer.dumps(value) for value in values], data)
+
+    def test_datetime_timezone_offset(self):
+        value = datetime.datetime.now(tz=pytz.timezone("Asia/Shanghai"))
+        decode_data = self.msgpack_serializer.loads(self.msgpack_serializer.dumps(value))
+        self.assertEqual(decode_data.utcoffset(), value.utcoffset())
+        self.assertEqual(decode_data.isoformat(), value.isoformat())
+
+    def test_loads_legacy_data(self):
+        obj = {"price": decimal.Decimal("1.25"), "time": datetime.datetime.now(),
+               "date": datetime.date.today(), "values": [1, "a"]}
+        encode_data = serializers.MsgPackSerializer().dumps(obj)
+        self.assertDictEqual(self.msgpack_serializer.loads(encode_data), obj)
+
+
+class QuoteSerializer(serializers.StructSerializer):
+    fields = [("bid", "d"), ("ask", "d"), ("side", "B"), ("venue", "4s")]
+    version = 1
+    schemas = {0: [("bid", "f"), ("ask", "f")]}
+    defaults = {"side": 2}
+
+
+class QuoteV0Serializer(serializers.StructSerializer):
+    fields = [("bid", "f"), ("ask", "f")]
+
+
+class StructSerializerTests(unittest.TestCase):
+    def setUp(self):
+        self.serializer = QuoteSerializer()
+        self.quotes = [{"bid": 100.0 + i, "ask": 100.5 + i, "side": i % 2, "venue": b"NYSE"} for i in range(20)]
+
+    def test_loads_and_dumps(self):
+        encode_data = self.serializer.dumps(self.quotes[0])
+        self.assertEqual(len(encode_data), 1 + 8 + 8 + 1 + 4)
+        self.assertDictEqual(self.serializer.loads(encode_data), self.quotes[0])
+        self.assertEqual(self.serializer.dumps([100.0, 100.5, 0, b"NYSE"]), encode_data)
+
+        self.assertListEqual(self.serializer.loads_many(self.serializer.dumps_many(self.quotes)), self.quotes)
+
+        with self.assertRaises(serializers.SerializerError):
+            self.serializer.dumps({"bid": 1.0})
+        with self.assertRaises(serializers.SerializerError):
+            self.serializer.loads(b"\x05" + encode_data[1:])
+
+    def test_loads_columns(self):
+        columns = self.serializer.loads_columns(self.serializer.dumps_many(self.quotes))
+        self.assertListEqual(columns["bid"].tolist(), [quote["bid"] for quote in self.quotes])
+        self.assertEqual(columns["side"].dtype, np.uint8)
+        self.assertListEqual(columns["venue"].tolist(), [b"NYSE"] * 20)
+
+    def test_versioned_schemas(self):
+        old_data = QuoteV0Serializer().dumps_many([{"bid": 1.5, "ask": 2.5}, {"bid": 3.5, "ask": 4.5}])
+        self.assertDictEqual(self.serializer.loads(old_data[0]), {"bid": 1.5, "ask": 2.5})
+
+        mixed = [old_data[0], self.serializer.dumps(self.quotes[0]), old_data[1]]
+        self.assertListEqual(self.serializer.loads_many(mixed),
+                             [{"bid": 1.5, "ask": 2.5}, self.quotes[0], {"bid": 3.5, "ask": 4.5}])
+
+        columns = self.serializer.loads_columns(mixed)
+        self.assertListEqual(columns["bid"].tolist(), [1.5, 100.0, 3.5])
+        self.assertListEqual(columns["side"].tolist(), [2, 0, 2])
+        self.assertListEqual(columns["venue"].tolist(), [b"", b"NYSE", b""])
+
+    def test_record_type(self):
+        class TupleSerializer(QuoteSerializer):
+            record_type = tuple
+
+        serializer = TupleSerializer()
+        self.assertEqual(serializer.loads(serializer.dumps(self.quotes[1])), (101.0, 101.5, 1, b"NYSE"))
+
+    def test_fields(self):
+        class WrongSerializer(serializers.StructSerializer):
+            fields = [("bid", "d"), ("bid", "d")]
+
+        class WrongFormatSerializer(serializers.StructSerializer):
+            fields = [("bid", "2d")]
+
+        with self.assertRaises(serializers.SerializerError):
+            WrongSerializer()
+        with self.assertRaises(serializers.SerializerError):
+            WrongFormatSerializer()
@@ -0,0 +1,154 @@
+# encoding:utf-8
+import datetime
+import threading
+import time
+import unittest
+
+import redis
+
+from ttseries import RedisHashTimeSeries, ShardedTimeSeries
+from ttseries.sharding import HashRing
+
+
+class HashRingTest(unittest.TestCase):
+
+    def test_get_node(self):
+        ring = HashRing(["node1", "node2", "node3"])
+        keys = ["APPL:SECOND:" + str(i) for i in range(1000)]
+        nodes = [ring.get_node(key) for key in keys]
+
+        self.assertEqual(set(nodes), {"node1", "node2", "node3"})
+        self.assertEqual(nodes, [HashRing(["node3", "node1", "node2"]).get_node(key) for key in keys])
+
+    def test_add_node_remaps_only_new_node_keys(self):
+        ring = HashRing(["node1", "node2", "node3"])
+        keys = ["APPL:SECOND:" + str(i) for i in range(1000)]
+        before = {key: ring.get_node(key) for key in keys}
+
+        ring.add_node("node4")
+        moved = [key for key in keys if ring.get_node(key) != before[key]]
+
+        self.assertTrue(moved)
+        self.assertTrue(all(ring.get_node(key) == "node4" for key in moved))
+        self.assertLess(len(moved), len(keys) / 2)
+
+        ring.remove_node("node4")
+        self.assertEqual({key: ring.get_node(key) for key in keys}, before)
+
+
+class ShardedTimeSeriesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clients = {"node" + str(db): redis.StrictRedis(db=db) for db in (1, 2, 3)}
+        self.sharded = ShardedTimeSeries({"node1": self.clients["node1"], "node2": self.clients["node2"]},
+                                         series_cls=RedisHashTimeSeries, max_length=10)
+        self.timestamp = datetime.datetime.now().timestamp()
+        self.keys = ["APPL:SECOND:" + str(i) for i in range(20)]
+        self.data_list = [(self.timestamp + i, {"value": i}) for i in range(5)]
+
+    def tearDown(self):
+        for client in self.clients.values():
+            client.flushdb()
+        self.sharded.close()
+
+    def test_add_many_keys_get_slice_many(self):
+        self.sharded.add_many_keys({key: self.data_list for key in self.keys})
+
+        self.assertEqual(self.sharded.get_slice_many(self.keys), {key: self.data_list for key in self.keys})
+        self.assertEqual(sorted(self.sharded.iter_keys()), sorted(self.keys))
+        # the keys spread over the nodes
+        self.assertTrue(self.clients["node1"].dbsize())
+        self.assertTrue(self.clients["node2"].dbsize())
+
+    def test_single_key(self):
+        key = self.keys[0]
+        self.sharded.add_many(key, self.data_list)
+        self.sharded.add(key, self.timestamp + 5, {"value": 5})
+
+        self.assertEqual(self.sharded.length(key), 6)
+        self.assertEqual(self.sharded.get(key, self.timestamp + 5), {"value": 5})
+        self.assertTrue(self.sharded.get_series(key).client.exists(key))
+
+    def test_remove_many(self):
+        for key in self.keys:
+            self.sharded.add_many(key, self.data_list)
+
+        self.sharded.remove_many(self.keys[:10], start_timestamp=self.data_list[3][0])
+        self.sharded.remove_many(self.keys[10:])
+
+        for key in self.keys[:10]:
+            self.assertEqual(self.sharded.length(key), 3)
+        self.assertEqual(sorted(self.sharded.iter_keys()), sorted(self.keys[:10]))
+
+    def test_add_remove_node(self):
+        for key in self.keys:
+            self.sharded.add_many(key, self.data_list)
+
+        moved = self.sharded.add_node("node3", self.clients["node3"])
+        self.assertEqual(moved, len([key for key in self.keys if self.sharded.ring.get_node(key) == "node3"]))
+        self.assertGreater(moved, 0)
+
+        for key in self.keys:
+            self.assertEqual(self.sharded.get_slice(key), self.data_list)
+            # the hashes and id keys moved together
+            self.sharded.add(key, self.timestamp + 5, {"value": 5})
+        self.assertEqual(sorted(self.sharded.iter_keys()), sorted(self.keys))
+
+        self.assertEqual(self.sharded.remove_node("node3"), moved)
+        self.assertEqual(self.clients["node3"].dbsize(), 0)
+        for key in self.keys:
+            self.assertEqual(self.sharded.get_slice(key), self.data_list + [(self.timestamp + 5, {"value": 5})])
+
+    def test_write_during_rebalance(self):
+        for key in self.keys:
+            self.sharded.add_many(key, self.data_list)
+        self.sharded.move_chunk_size = 2
+        point = (self.timestamp + 5, {"value": 5})
+
+        def write():
+            for key in self.keys:
+                self.sharded.add(key, *point)
+
+        writer = threading.Thread(target=write)
+        first_move = threading.Lock()
+        move_keys = self.sharded._move_keys
+
+        def move_keys_writing(source, target, names):
+            if first_move.acquire(blocking=False):
+                writer.start()
+                time.sleep(0.05)  # the writer reaches the keys being moved
+            move_keys(source, target, names)
+
+        self.sharded._move_keys = move_keys_writing
+        self.assertGreater(self.sharded.add_node("node3", self.clients["node3"]), 0)
+        writer.join()
+
+        for key in self.keys:
+            self.assertEqual(self.sharded.get_slice(key), self.data_list + [point])
+        self.assertEqual(sorted(self.sharded.iter_keys()), sorted(self.keys))
+
+    def test_read_during_add_remove_node(self):
+        for key in self.keys:
+            self.sharded.add_many(key, self.data_list)
+        stop = threading.Event()
+        errors = []
+
+        def read():
+            while not stop.is_set():
+                try:
+                    self.assertEqual(self.sharded.get_slice_many(self.keys),
+                                     {key: self.data_list for key in self.keys})
+                except Exception as e:
+                    errors.append(e)
+                    return
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        try:
+            # the fan out threads are resized while the reads run on them
+            self.sharded.add_node("node3", self.clients["node3"])
+            self.sharded.remove_node("node1")
+        finally:
+            stop.set()
+            reader.join()
+        self.assertEqual(errors, [])
@@ -5,6 +5,7 @@ import unittest
 import redis
 
 from ttseries import RedisSampleTimeSeries
+from ttseries.exceptions import ChunkWriteError
 from .mixin import Mixin
 
 
@@ -59,3 +60,49 @@ class RedisSimpleTSTest(unittest.TestCase, Mixin):
         # data_list.append((timestamp, {"value": i}))
         min_value = min(data_list, key=lambda x: x[1]["value"])
         self.assertEqual(min_value, self.time_series.min_timestamp(key))
+
+    def test_add_keep_max_length(self):
+        key = "APPL:SECOND:7"
+        data_list = self.generate_data(15)
+        for timestamp, data in data_list:
+            self.time_series.add(key, timestamp, data)
+
+        self.assertEqual(self.time_series.length(key), 10)
+        self.assertListEqual(self.time_series.get_slice(key), data_list[5:])
+
+    def test_add_after_script_flush(self):
+        key = "APPL:SECOND:8"
+        self.time_series.add(key, self.timestamp, {"value": 1})
+        self.time_series.client.script_flush()
+        self.assertTrue(self.time_series.add(key, self.timestamp + 1, {"value": 2}))
+        self.assertEqual(self.time_series.length(key), 2)
+
+
+class FailedChunkTimeSeries(RedisSampleTimeSeries):
+
+    def _pipe_add_chunk(self, pipe, name, data_pairs, on_conflict="error"):
+        super(FailedChunkTimeSeries, self)._pipe_add_chunk(pipe, name, data_pairs, on_conflict)
+        if {"value": 3} in map(self._serializer.loads, data_pairs):
+            pipe.incr(name)  # WRONGTYPE error of the chunk
+
+
+class RedisSimpleTSParallelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.time_series = FailedChunkTimeSeries(redis.StrictRedis(), max_length=100, transaction=False)
+        self.timestamp = datetime.datetime.now().timestamp()
+
+    def tearDown(self):
+        self.time_series.flush()
+
+    def test_chunk_write_error(self):
+        key = "APPL:SECOND:1"
+        data_list = [(self.timestamp + i, {"value": i}) for i in range(10)]
+
+        with self.assertRaises(ChunkWriteError) as context:
+            self.time_series.add_many(key, data_list, chunks_size=2, parallelism=3)
+
+        self.assertEqual(context.exception.chunks, 5)
+        self.assertEqual([index for index, _ in context.exception.errors], [1])
+        # the other chunks are written
+        self.assertListEqual(data_list, self.time_series.get_slice(key))
@@ -4,8 +4,9 @@ import unittest
 
 import numpy as np
 
-from ttseries.exceptions import RepeatedValueError
-from ttseries.utils import chunks, chunks_np_or_pd_array, check_array_repeated
+from ttseries.exceptions import RepeatedValueError, RedisTimeSeriesError
+from ttseries.utils import chunks, chunks_np_or_pd_array, check_array_repeated, \
+    check_timestamps_repeated, sort_timestamp_pairs, has_hash_tag, key_slot, StripedLock
 
 
 class ChunksTest(unittest.TestCase):
@@ -54,3 +55,52 @@ class ChunksTest(unittest.TestCase):
 
         with self.assertRaises(RepeatedValueError):
             check_array_repeated(test_data)
+
+    def test_check_sorted_timestamps_repeat(self):
+        check_timestamps_repeated(np.array([1.0, 2.0, 3.0]))
+
+        with self.assertRaises(RepeatedValueError):
+            check_timestamps_repeated(np.array([1.0, 2.0, 2.0, 3.0]))
+
+
+class SortTimestampPairsTest(unittest.TestCase):
+    def test_sort_pairs(self):
+        array, timestamps = sort_timestamp_pairs([(3.0, "c"), (1.0, "a"), (2.0, "b")])
+        self.assertListEqual(array, [(1.0, "a"), (2.0, "b"), (3.0, "c")])
+        np.testing.assert_array_equal(timestamps, [1.0, 2.0, 3.0])
+
+    def test_assume_sorted(self):
+        data = [(3.0, "c"), (1.0, "a")]
+        array, timestamps = sort_timestamp_pairs(data, assume_sorted=True)
+        self.assertIs(array, data)
+        np.testing.assert_array_equal(timestamps, [3.0, 1.0])
+
+
+class HashTagTest(unittest.TestCase):
+
+    def test_has_hash_tag(self):
+        self.assertTrue(has_hash_tag("{APPL}:SECOND"))
+        self.assertTrue(has_hash_tag("APPL:{SECOND}"))
+        self.assertFalse(has_hash_tag("APPL:SECOND"))
+        self.assertFalse(has_hash_tag("{}APPL"))
+        self.assertFalse(has_hash_tag("APPL{"))
+
+    def test_key_slot(self):
+        self.assertEqual(key_slot("{APPL:SECOND}:HASH"), key_slot("APPL:SECOND"))
+        self.assertEqual(key_slot("{APPL}:SECOND:ID"), key_slot(b"APPL"))
+
+
+class StripedLockTest(unittest.TestCase):
+
+    def test_get(self):
+        locks = StripedLock(16)
+        self.assertEqual(len(locks), 16)
+        self.assertIs(locks.get("APPL:SECOND"), locks.get("APPL:SECOND"))
+        self.assertGreater(len({id(locks.get("APPL:SECOND:" + str(i))) for i in range(100)}), 1)
+
+        with locks.get("APPL:SECOND"), locks.get("APPL:SECOND"):
+            pass
+
+    def test_stripes(self):
+        with self.assertRaises(RedisTimeSeriesError):
+            StripedLock(0)
@@ -1,8 +1,15 @@
 # encoding:utf-8
+from .ts import RedisChunkedTimeSeries
 from .ts import RedisHashTimeSeries
 from .ts import RedisNumpyTimeSeries
 from .ts import RedisSampleTimeSeries
 from .ts import RedisPandasTimeSeries
+from .aio import AsyncRedisHashTimeSeries
+from .aio import AsyncRedisNumpyTimeSeries
+from .aio import AsyncRedisSampleTimeSeries
+from .aio import AsyncRedisPandasTimeSeries
+from .buffer import BufferedWriter
+from .sharding import ShardedTimeSeries
 from .serializers import BaseSerializer
 
 __version__ = "0.2.2"
@@ -0,0 +1,5 @@
+# encoding:utf-8
+from .hash import AsyncRedisHashTimeSeries
+from .numpy import AsyncRedisNumpyTimeSeries
+from .pandas import AsyncRedisPandasTimeSeries
+from .sample import AsyncRedisSampleTimeSeries
@@ -0,0 +1,372 @@
+# encoding:utf-8
+import asyncio
+import inspect
+
+import numpy
+import redis
+
+import ttseries.utils
+from ttseries.exceptions import RedisTimeSeriesError
+from ttseries.ts import replies, scripts
+from ttseries.ts.base import RedisTSBase
+
+
+async def _await_result(result):
+    """
+    await the result of the pipeline function if it's awaitable,
+    redis.asyncio lua scripts return coroutines even if queued in a pipeline.
+    :param result: obj
+    :return: obj
+    """
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+class AsyncRedisTSBase(RedisTSBase):
+    """
+    asyncio Redis Time-series base class, work with the redis.asyncio client.
+
+    share the validation, serialization and the pipeline commands with
+    RedisTSBase, only the methods talk to the redis server are coroutines.
+    """
+
+    async def flush(self):
+        """
+        flush database
+        :return:
+        """
+        await self.client.flushdb()
+
+    async def length(self, name):
+        """
+        Time complexity: O(1)
+        get the time-series length from a key
+        :param name: redis key
+        :return: int
+        """
+        return await self.client.zcard(name)
+
+    async def count(self, name, start_timestamp: float = None, end_timestamp: float = None):
+        """
+        Time complexity: O(log(N)) with N being
+        the number of elements in the sorted sets.
+        :param name: redis key
+        :param start_timestamp: float, start timestamp
+        :param end_timestamp: float, end timestamp
+        :return: int
+        """
+        if start_timestamp is None:
+            start_timestamp = "-inf"
+        if end_timestamp is None:
+            end_timestamp = "+inf"
+        return await self.client.zcount(name, min=start_timestamp, max=end_timestamp)
+
+    async def exists(self, name):
+        """
+        exist key in name
+        :param name: redis key
+        :return: bool
+        """
+        return await self.client.exists(name)
+
+    async def max_timestamp(self, name):
+        """
+        get the max timestamp value with data
+        :param name: key name
+        :return: tuple, (timestamp, data)
+        """
+        value = await self.client.zrevrangebyscore(name=name, min="-inf", max="+inf",
+                                                   withscores=True, start=0, num=1)
+        if value:
+            data, timestamp = value[0]
+            return timestamp, self._serializer.loads(data)
+
+    async def min_timestamp(self, name):
+        """
+        get the min timestamp value with data
+        :param name: key name
+        :return: tuple, (timestamp, data)
+        """
+        value = await self.client.zrangebyscore(name=name, min="-inf", max="+inf",
+                                                withscores=True, start=0, num=1)
+        if value:
+            data, timestamp = value[0]
+            return timestamp, self._serializer.loads(data)
+
+    async def exist_timestamp(self, name, timestamp) -> bool:
+        """
+        Time complexity: O(log(N))
+        check a timestamp exist in redis sorted sets
+        :param name:
+        :param timestamp:
+        :return:
+        """
+        return bool(await self.client.zcount(name, min=timestamp, max=timestamp))
+
+    async def transaction_pipe(self, pipe_func, watch_keys=None, *args, **kwargs):
+        """
+        Convenience callable `func` as executable in a
+        transaction while watching all keys specified in `watches`.
+        The 'func' callable should expect a Pipeline object as its first argument,
+        the result of the callable is awaited if it's awaitable.
+        :param pipe_func: function
+        :param watch_keys: redis watch keys
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        if isinstance(watch_keys, str):
+            watch_keys = (watch_keys,)
+
+        async with self.client.pipeline(transaction=self.transaction) as pipe:
+            retries = 0
+            while True:
+                try:
+                    if watch_keys:
+                        await pipe.watch(*watch_keys)
+                    pipe.multi()
+
+                    if callable(pipe_func):
+                        await _await_result(pipe_func(pipe, *args, **kwargs))
+
+                    results = await pipe.execute()
+                    self._record_transaction(retries)
+                    return results
+
+                except redis.exceptions.WatchError:
+                    retries += 1
+                    continue
+                finally:
+                    await pipe.reset()
+
+    async def _timestamp_exist(self, name, timestamps):
+        """
+        check the timestamps exist in redis sorted sets,
+        the same as RedisTSBase._timestamp_exist
+        :param name: redis key
+        :param timestamps: numpy.ndarray, already sorted float64 timestamps
+        :raise RedisTimeSeriesError
+        """
+        if timestamps.size == 0:
+            return
+
+        start_timestamp = float(timestamps[0])  # min
+        end_timestamp = float(timestamps[-1])  # max
+
+        exist_length = await self.count(name, start_timestamp, end_timestamp)
+
+        if exist_length == 0:
+            return
+
+        if exist_length <= timestamps.size:
+            scores = await self._script(scripts.RANGE_SCORES)(keys=[name],
+                                                              args=[start_timestamp, end_timestamp])
+            duplicated = numpy.intersect1d(timestamps, numpy.array(scores, dtype=numpy.float64))
+            if duplicated.size > 0:
+                raise RedisTimeSeriesError("add duplicated timestamp into redis -> "
+                                           "timestamp: {0}".format(duplicated[0]))
+        else:
+            async with self.client.pipeline(transaction=False) as pipe:
+                await self._pipe_timestamps_exist(pipe, name, timestamps)
+                self._check_timestamps_exist(await pipe.execute())
+
+    async def _pipe_timestamps_exist(self, pipe, name, timestamps):
+        """
+        queue the lua script calls to check each timestamp exist in redis server
+        :param pipe: redis pipeline
+        :param name: redis key
+        :param timestamps: numpy.ndarray, float64 timestamps
+        """
+        script = self._script(scripts.TIMESTAMPS_EXIST)
+        for chunk_timestamps in ttseries.utils.chunks(timestamps.tolist(), 10000):
+            await script(keys=[name], args=chunk_timestamps, client=pipe)
+
+    async def _auto_trim_array(self, name, array_data):
+        """
+        before to insert the data into redis,
+        auto to trim the data exists in redis with the limitation of max length
+        :param name: redis key
+        :param array_data: array data
+        :return: trim array
+        """
+        array_length = len(array_data)
+        current_length = await self.length(name)
+        # auto trim array
+        if array_length + current_length >= self.max_length:
+            await self.trim(name, array_length + current_length - self.max_length)
+
+        return self._trim_array(array_data)
+
+    async def _add_many_validate_mixin(self, name, timestamp_pairs, assume_sorted=False, on_conflict="error"):
+        """
+        validate keys
+        check array timestamp repeated
+        trim the array with max length
+        check timestamp exist in redis
+        :param assume_sorted: bool, the timestamp pairs already sorted as the asc
+        :param on_conflict: str, "error", "skip" or "replace"
+        :return:
+        """
+        self._validate_key(name)
+        self._validate_on_conflict(on_conflict)
+
+        # sort and check timestamp repeated
+        timestamp_pairs, timestamps = self._sort_array(timestamp_pairs, assume_sorted)
+
+        if on_conflict != "error":
+            return self._trim_array(timestamp_pairs)
+
+        # auto trim timestamps
+        timestamp_pairs = await self._auto_trim_array(name, timestamp_pairs)
+        timestamps = timestamps[timestamps.size - len(timestamp_pairs):]
+        # validate timestamp exist
+        await self._timestamp_exist(name, timestamps)
+
+        return timestamp_pairs
+
+    async def _add_many_keys_validate_mixin(self, mapping, assume_sorted=False, on_conflict="error"):
+        """
+        the same as RedisTSBase._add_many_keys_validate_mixin
+        :param mapping: dict, {name: [(timestamp, data),...],...}
+        :param assume_sorted: bool, the timestamp pairs already sorted as the asc
+        :param on_conflict: str, "error", "skip" or "replace"
+        :return: list, [(name, timestamp_pairs, trim_length),...]
+        """
+        self._validate_on_conflict(on_conflict)
+
+        prepared = []
+        for name, array in mapping.items():
+            self._validate_key(name)
+            timestamp_pairs, timestamps = self._sort_array(array, assume_sorted)
+            timestamp_pairs = self._trim_array(timestamp_pairs)
+            if len(timestamp_pairs):
+                prepared.append((name, timestamp_pairs, timestamps[timestamps.size - len(timestamp_pairs):]))
+
+        if on_conflict != "error":
+            # exist timestamps and max length are handled in redis server
+            return [(name, timestamp_pairs, 0) for name, timestamp_pairs, _ in prepared]
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            for name, _, timestamps in prepared:
+                pipe.zcard(name)
+                pipe.zcount(name, min=float(timestamps[0]), max=float(timestamps[-1]))
+            results = await pipe.execute()
+            lengths, exist_lengths = results[0::2], results[1::2]
+
+            for (name, _, timestamps), exist_length in zip(prepared, exist_lengths):
+                if exist_length > 0:
+                    await self._pipe_timestamps_exist(pipe, name, timestamps)
+            self._check_timestamps_exist(await pipe.execute())
+
+        return [(name, timestamp_pairs, max(len(timestamp_pairs) + length - self.max_length, 0))
+                for (name, timestamp_pairs, _), length in zip(prepared, lengths)]
+
+    async def _execute_sized_pipe(self, pipe_funcs, pipeline_bytes):
+        """
+        queue the commands of many keys into shared pipelines,
+        execute the pipeline each time the queued payload reaches the pipeline bytes.
+        :param pipe_funcs: iterable, [(payload bytes, func(pipe)),...]
+        :param pipeline_bytes: int, the payload bytes of each pipeline
+        """
+        async with self.client.pipeline(transaction=self.transaction) as pipe:
+            queued_bytes = 0
+            for payload_bytes, pipe_func in pipe_funcs:
+                await _await_result(pipe_func(pipe))
+                queued_bytes += payload_bytes
+                if queued_bytes >= pipeline_bytes:
+                    await pipe.execute()
+                    queued_bytes = 0
+            if len(pipe):
+                await pipe.execute()
+
+    async def _delete_keys(self, keys):
+        """
+        delete the keys, the same as RedisTSBase._delete_keys,
+        in cluster mode send one DEL command of each hash slot in one pipeline.
+        :param keys: list, redis keys
+        """
+        if not self.cluster:
+            return await self.client.delete(*keys)
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            for group_keys in self._group_slots(keys):
+                pipe.delete(*group_keys)
+            return sum(await pipe.execute())
+
+    async def _get_slice_mixin(self, name, start_timestamp=None,
+                               end_timestamp=None, limit=None, asc=True, parser=replies.parse_slice):
+        """
+        :param name:
+        :param start_timestamp:
+        :param end_timestamp:
+        :param limit:
+        :param asc:
+        :param parser: function, parse the raw reply, see `ttseries.ts.replies`
+        :return: the parsed reply, (members list, numpy.ndarray float64 timestamps) by default
+        """
+        return parser(await self.client.execute_command(*self._slice_command(name, start_timestamp,
+                                                                             end_timestamp, limit, asc),
+                                                        **{redis.client.NEVER_DECODE: True}))
+
+    async def get_slice_raw(self, name, start_timestamp=None,
+                            end_timestamp=None, limit=None, asc=True):
+        """
+        return a slice without deserialization, the same as RedisTSBase.get_slice_raw
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param limit: int, limit the length of the result data.
+        :param asc: bool, sorted as the timestamp values
+        :return: tuple, (numpy.ndarray float64 timestamps, bytes buffer, numpy.ndarray int64 offsets)
+        """
+        return await self._get_slice_mixin(name, start_timestamp, end_timestamp, limit, asc,
+                                           parser=replies.parse_raw_slice)
+
+    async def iter_slice(self, name, start_timestamp=None, end_timestamp=None, page_size=10000, asc=True):
+        """
+        async iterator a slice by the pages in order, the same as RedisTSBase.iter_slice,
+        the next page is fetched by a task while the current page is processed.
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param page_size: int, the number of the items of each page
+        :param asc: bool, sorted as the timestamp values
+        :return: async iter, the pages as the result of `get_slice`
+        """
+        self._validate_page_size(page_size)
+        task = asyncio.ensure_future(self._slice_page(name, start_timestamp, end_timestamp, page_size, asc))
+        try:
+            while task is not None:
+                members, timestamps = await task
+                bounds = self._next_page_bounds(start_timestamp, end_timestamp, timestamps, page_size, asc)
+                task = None
+                if bounds:
+                    task = asyncio.ensure_future(self._slice_page(name, *bounds, page_size, asc))
+                if len(timestamps):
+                    yield self._loads_slice(members, timestamps)
+        finally:
+            if task is not None:
+                task.cancel()
+
+    async def _slice_page(self, name, start_timestamp, end_timestamp, limit, asc):
+        """
+        read one page of `iter_slice`
+        :return: tuple, (serialized data list, numpy.ndarray float64 timestamps)
+        """
+        return await self._get_slice_mixin(name, start_timestamp, end_timestamp, limit, asc)
+
+    async def get_slice_many(self, names, start_timestamp=None,
+                             end_timestamp=None, limit=None, asc=True):
+        """
+        return the slices of many keys, the keys are read concurrently
+        :param names: tuple, redis keys
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param limit: int, limit the length of the result data of each key.
+        :param asc: bool, sorted as the timestamp values
+        :return: dict, {name: slice,...}
+        """
+        results = await asyncio.gather(*(self.get_slice(name, start_timestamp, end_timestamp, limit, asc)
+                                         for name in names))
+        return dict(zip(names, results))
@@ -0,0 +1,293 @@
+# encoding:utf-8
+import asyncio
+import functools
+import itertools
+
+import redis
+
+import ttseries.utils
+from ttseries.exceptions import RedisTimeSeriesError
+from ttseries.ts import replies, scripts
+from ttseries.ts.hash import RedisHashTimeSeries
+from .base import AsyncRedisTSBase
+
+
+class AsyncRedisHashTimeSeries(AsyncRedisTSBase, RedisHashTimeSeries):
+    """
+    asyncio Redis Time-series storage based on sorted sets and hashes,
+    the same as RedisHashTimeSeries with the redis.asyncio client.
+    """
+
+    async def get(self, name, timestamp):
+        """
+        get one item by timestamp
+        :param name: redis key
+        :param timestamp: float, timestamp
+        :return: obj
+        """
+        values, _ = await self._read_slice(name, timestamp, timestamp, 1)
+        if values:
+            return self._serializer.loads(values[0])
+
+    async def _read_slice(self, name, start_timestamp=None, end_timestamp=None, limit=None, asc=True):
+        """
+        read the data of a slice, the same as RedisHashTimeSeries._read_slice
+        :return: tuple, (serialized data list, numpy.ndarray float64 timestamps)
+        """
+        if not self.scripted_reads:
+            ids, timestamps = await self._get_slice_mixin(name, start_timestamp, end_timestamp, limit, asc)
+            if ids:
+                return self._skip_missing(await self.client.hmget(self._hash_key(name), ids), timestamps)
+            return [], timestamps
+
+        return replies.parse_slice(await self._script(scripts.HASH_GET_SLICE)(
+            keys=[name, self._hash_key(name)], args=self._scripted_slice_args(start_timestamp, end_timestamp,
+                                                                             limit, asc)))
+
+    async def add(self, name: str, timestamp: float, data, on_conflict="skip") -> bool:
+        """
+        add one times-series data into redis in one lua script call.
+        :param name: key name
+        :param timestamp: timestamp: float
+        :param data: object
+        :param on_conflict: str, the policy of an exist timestamp, "error", "skip" or "replace"
+        :return: bool
+        """
+        self._validate_key(name)
+        self._validate_on_conflict(on_conflict)
+
+        incr_key = self._incr_key(name)
+        hash_key = self._hash_key(name)
+
+        dumps_data = self._serializer.dumps(data)
+
+        result = await self._script(scripts.HASH_ADD)(keys=[name, hash_key, incr_key],
+                                                      args=[timestamp, dumps_data,
+                                                            self.max_length, on_conflict])
+        if result < 0 and on_conflict == "error":
+            raise RedisTimeSeriesError("add duplicated timestamp into redis -> "
+                                       "timestamp: {0}".format(timestamp))
+        return result > 0
+
+    async def delete(self, name, start_timestamp=None, end_timestamp=None):
+        """
+        Removes all elements in the sorted sets stored at key
+        between start timestamp and end timestamp (inclusive).
+        if parameter only contains `name`, will delete all data stored in redis key.
+        :param name: redis key
+        :param start_timestamp: timestamp
+        :param end_timestamp: timestamp
+        """
+        incr_key = self._incr_key(name)
+        hash_key = self._hash_key(name)
+
+        if start_timestamp or end_timestamp:
+
+            if await self.count(name, start_timestamp, end_timestamp) > 0:
+                if not start_timestamp:
+                    start_timestamp = "-inf"
+                if not end_timestamp:
+                    end_timestamp = "+inf"
+                result_data = await self.client.zrangebyscore(name,
+                                                              min=start_timestamp,
+                                                              max=end_timestamp,
+                                                              withscores=False)
+
+                def pipe_func(_pipe):
+                    _pipe.zremrangebyscore(name, min=start_timestamp, max=end_timestamp)
+                    _pipe.hdel(hash_key, *result_data)
+
+                await self.transaction_pipe(pipe_func, (name, hash_key))
+        else:
+            await self.client.delete(name, incr_key, hash_key)
+
+    async def remove_many(self, names, start_timestamp=None, end_timestamp=None):
+        """
+        remove many keys with timestamp, the keys are removed concurrently.
+        ! if only parameter contains names, will directly delete redis key.
+        :param names: tuple, redis keys
+        :param start_timestamp: float, start timestamp
+        :param end_timestamp: float, end timestamp
+        """
+        chunks_data = ttseries.utils.chunks(names, 1000)
+
+        if start_timestamp or end_timestamp:
+            for chunk_keys in chunks_data:
+                await asyncio.gather(*(self.delete(name, start_timestamp, end_timestamp)
+                                       for name in chunk_keys))
+        else:
+            for chunk_keys in chunks_data:
+                incr_chunks = map(self._incr_key, chunk_keys)
+                hash_chunks = map(self._hash_key, chunk_keys)
+                await self._delete_keys(list(itertools.chain(chunk_keys, incr_chunks, hash_chunks)))
+
+    async def trim(self, name, length: int):
+        """
+        trim redis sorted sets key as the number of length,
+        trim the data with timestamp as the asc
+        :param name: redis key
+        :param length: int, length
+        """
+        current_length = await self.length(name)
+
+        if current_length > length > 0:
+            await self._pipe_trim(self.client, name, length)
+        elif length >= current_length:
+            await self.delete(name)
+
+    async def get_slice(self, name, start_timestamp=None, end_timestamp=None,
+                        limit=None, asc=True):
+        """
+        return a slice from redis sorted sets with timestamp pairs
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param limit: int, limit the length of the result data.
+        :param asc: bool, sorted as the timestamp values
+        :return: [(timestamp,data),...]
+        """
+        values, timestamps = await self._read_slice(name, start_timestamp, end_timestamp, limit, asc)
+        if values:
+            return self._loads_slice(values, timestamps)
+
+    async def _slice_page(self, name, start_timestamp, end_timestamp, limit, asc):
+        """
+        read one page of `iter_slice`, the same as RedisHashTimeSeries._slice_page
+        :return: tuple, (serialized data list, numpy.ndarray float64 timestamps)
+        """
+        return await self._read_slice(name, start_timestamp, end_timestamp, limit, asc)
+
+    async def get_slice_columns(self, name, start_timestamp=None, end_timestamp=None,
+                                limit=None, asc=True):
+        """
+        return a slice as the numpy columns, the same as RedisHashTimeSeries.get_slice_columns
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param limit: int, limit the length of the result data.
+        :param asc: bool, sorted as the timestamp values
+        :return: tuple, (numpy.ndarray float64 timestamps, {name: numpy.ndarray,...})
+        """
+        values, timestamps = await self._read_slice(name, start_timestamp, end_timestamp, limit, asc)
+        if values:
+            return self._loads_columns(timestamps, values)
+
+    async def get_slice_raw(self, name, start_timestamp=None, end_timestamp=None,
+                            limit=None, asc=True):
+        """
+        return a slice without deserialization, the same as RedisHashTimeSeries.get_slice_raw
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param limit: int, limit the length of the result data.
+        :param asc: bool, sorted as the timestamp values
+        :return: tuple, (numpy.ndarray float64 timestamps, bytes buffer, numpy.ndarray int64 offsets)
+        """
+        values, timestamps = await self._read_slice(name, start_timestamp, end_timestamp, limit, asc)
+        buffer, offsets = replies.pack_members(values)
+        return timestamps, buffer, offsets
+
+    async def add_many(self, name, array, chunks_size=2000, assume_sorted=False, on_conflict="error"):
+        """
+        add large amount of data into redis sorted sets
+        :param name: redis key
+        :param array: data pairs, [("timestamp",data)...]
+        :param chunks_size: split data into chunk, optimize for redis pipeline
+        :param assume_sorted: bool, the array already sorted as the timestamp asc, skip to sort it
+        :param on_conflict: str, the policy of the exist timestamps, "error", "skip" or "replace"
+        """
+        incr_key = self._incr_key(name)
+        hash_key = self._hash_key(name)
+
+        timestamp_pairs = await self._add_many_validate_mixin(name, array, assume_sorted, on_conflict)
+
+        for chunks in ttseries.utils.chunks(timestamp_pairs, chunks_size):
+
+            dumps_results = self._dumps_pairs(chunks)
+
+            if on_conflict != "error":
+                await self._pipe_add_chunk(self.client, name, dumps_results, None, on_conflict)
+                continue
+
+            end_id = await self.client.incrby(incr_key, amount=len(chunks))
+            ids_range = range(end_id - len(chunks) + 1, end_id + 1)
+
+            await self.transaction_pipe(self._pipe_add_chunk, (name, hash_key),
+                                        name, dumps_results, ids_range, on_conflict)
+
+    async def add_many_keys(self, mapping, chunks_size=2000, pipeline_bytes=1048576,
+                            assume_sorted=False, on_conflict="error"):
+        """
+        add large amount of data of many keys into redis,
+        the same as RedisHashTimeSeries.add_many_keys
+        :param mapping: dict, {name: [(timestamp, data),...],...}
+        :param chunks_size: split data of each key into chunk
+        :param pipeline_bytes: int, execute the pipeline when the queued payload reaches the bytes
+        :param assume_sorted: bool, the arrays already sorted as the timestamp asc, skip to sort them
+        :param on_conflict: str, the policy of the exist timestamps, "error", "skip" or "replace"
+        """
+        prepared = await self._add_many_keys_validate_mixin(mapping, assume_sorted, on_conflict)
+
+        if on_conflict == "error":
+            async with self.client.pipeline(transaction=False) as pipe:
+                for name, timestamp_pairs, _ in prepared:
+                    pipe.incrby(self._incr_key(name), amount=len(timestamp_pairs))
+                end_ids = await pipe.execute()
+        else:
+            end_ids = [None] * len(prepared)
+
+        def iter_pipe_funcs():
+            for (name, timestamp_pairs, trim_length), end_id in zip(prepared, end_ids):
+                if trim_length > 0:
+                    yield 0, functools.partial(self._pipe_trim, name=name, length=trim_length)
+
+                start_id = end_id - len(timestamp_pairs) + 1 if end_id else None
+
+                for index, item in enumerate(ttseries.utils.chunks(timestamp_pairs, chunks_size)):
+                    dumps_results = self._dumps_pairs(item)
+                    ids_range = None
+                    if start_id:
+                        chunk_start_id = start_id + index * chunks_size
+                        ids_range = range(chunk_start_id, chunk_start_id + len(item))
+
+                    payload_bytes = sum(ttseries.utils.sizeof_payload(data)
+                                        for _, data in dumps_results) + 16 * len(item)
+                    yield payload_bytes, functools.partial(self._pipe_add_chunk, name=name,
+                                                           dumps_results=dumps_results,
+                                                           ids_range=ids_range,
+                                                           on_conflict=on_conflict)
+
+        await self._execute_sized_pipe(iter_pipe_funcs(), pipeline_bytes)
+
+    async def iter_keys(self, count=None):
+        """
+        async generator iterator all time-series keys
+        :return: async iter,
+        """
+        async for item in self.client.scan_iter(match="*:ID", count=count):
+            yield self._series_name(item.decode("utf-8"))
+
+    async def iter(self, name, count=None):
+        """
+        async iterator all the time-series data with redis key as the timestamp asc,
+        the same as RedisHashTimeSeries.iter
+        :param name: redis key
+        :param count: int, the number of the items of each page, default with `iter_batch_size`
+        :return: async iter, [(timestamp, data),...]
+        """
+        hash_key = self._hash_key(name)
+        count = count or self.iter_batch_size
+
+        ids, timestamps = await self._get_slice_mixin(name, limit=count)
+        while ids:
+            bounds = self._next_page_bounds(None, None, timestamps, count, True)
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.hmget(hash_key, ids)
+                if bounds:
+                    pipe.execute_command(*self._slice_command(name, *bounds, limit=count),
+                                         **{redis.client.NEVER_DECODE: True})
+                results = await pipe.execute()
+
+            for pairs in self._loads_slice(*self._skip_missing(results[0], timestamps)):
+                yield pairs
+            ids, timestamps = replies.parse_slice(results[1]) if bounds else ([], timestamps)
@@ -0,0 +1,21 @@
+# encoding:utf-8
+from ttseries.ts.numpy import RedisNumpyTimeSeries
+from .sample import AsyncRedisSampleTimeSeries
+
+
+class AsyncRedisNumpyTimeSeries(AsyncRedisSampleTimeSeries, RedisNumpyTimeSeries):
+    """
+    asyncio Numpy TimeSeries, the same as RedisNumpyTimeSeries
+    with the redis.asyncio client.
+    """
+
+    async def iter_batches(self, name, batch_size=10000):
+        """
+        async iterator all the time-series data with redis key as the timestamp asc,
+        the same as RedisNumpyTimeSeries.iter_batches
+        :param name: redis key
+        :param batch_size: int, the number of the rows of each array
+        :return: async iter, numpy.ndarray
+        """
+        async for batch in self.iter_slice(name, page_size=batch_size):
+            yield batch
@@ -0,0 +1,35 @@
+# encoding:utf-8
+from ttseries.ts.pandas import RedisPandasTimeSeries
+from .sample import AsyncRedisSampleTimeSeries
+
+
+class AsyncRedisPandasTimeSeries(AsyncRedisSampleTimeSeries, RedisPandasTimeSeries):
+    """
+    asyncio Pandas TimeSeries, the same as RedisPandasTimeSeries
+    with the redis.asyncio client.
+    """
+
+    async def add_many(self, name, data_frame, chunks_size=2000, assume_sorted=False, on_conflict="error"):
+        """
+        add large amount of pandas.DataFrame, the dataframe index type should be the pandas.DateTimeIndex.
+        :param name: redis key
+        :param data_frame: pandas.DataFrame
+        :param chunks_size: int, split data into chunk, optimize for redis pipeline
+        :param assume_sorted: bool, the DataFrame index already sorted, skip to sort it
+        :param on_conflict: str, the policy of the exist timestamps, "error", "skip" or "replace"
+        """
+        await super(AsyncRedisPandasTimeSeries, self).add_many(name, data_frame, chunks_size,
+                                                               assume_sorted, on_conflict)
+
+    async def add(self, name, series, on_conflict="skip"):
+        """
+        :param name: redis key
+        :param series: pandas.Series
+        :param on_conflict: str, the policy of an exist timestamp, "error", "skip" or "replace"
+        :return: bool
+        """
+        self._validate_key(name)
+        self._validate_on_conflict(on_conflict)
+
+        timestamp, data = self._dumps_series(series)
+        return await self._add_script(name, timestamp, data, on_conflict)
@@ -0,0 +1,227 @@
+# encoding:utf-8
+import asyncio
+import functools
+
+import ttseries.utils
+from ttseries.exceptions import RedisTimeSeriesError
+from ttseries.ts import scripts
+from ttseries.ts.sample import RedisSampleTimeSeries
+from .base import AsyncRedisTSBase
+
+
+class AsyncRedisSampleTimeSeries(AsyncRedisTSBase, RedisSampleTimeSeries):
+    """
+    asyncio Redis Time-series storage based on Sorted set,
+    the same as RedisSampleTimeSeries with the redis.asyncio client.
+
+    >>> client = redis.asyncio.StrictRedis()
+    >>> time_series = AsyncRedisSampleTimeSeries(client)
+    >>> await time_series.add("APPL", 1526611599.240008, {"value": 10})
+    """
+
+    async def add(self, name: str, timestamp: float, data, on_conflict="skip"):
+        """
+        add one times-series data into redis in one lua script call.
+        :param name: redis key
+        :param timestamp: float
+        :param data: obj
+        :param on_conflict: str, the policy of an exist timestamp, "error", "skip" or "replace"
+        :return: int
+        """
+        self._validate_key(name)
+        self._validate_on_conflict(on_conflict)
+        data = self._dumps_item(data)
+        return await self._add_script(name, timestamp, data, on_conflict)
+
+    async def _add_script(self, name, timestamp, dumps_data, on_conflict="skip"):
+        """
+        :param name: redis key
+        :param timestamp: float
+        :param dumps_data: serialized data
+        :param on_conflict: str, "error", "skip" or "replace"
+        :return: int, 0 if the timestamp already exists
+        """
+        result = await self._script(scripts.SAMPLE_ADD)(keys=[name],
+                                                        args=[timestamp, dumps_data,
+                                                              self.max_length, on_conflict])
+        if result < 0:
+            if on_conflict == "error":
+                raise RedisTimeSeriesError("add duplicated timestamp into redis -> "
+                                           "timestamp: {0}".format(timestamp))
+            return 0
+        return result
+
+    async def _add_chunk(self, name, data_pairs, on_conflict="error"):
+        """
+        insert one chunk of the serialized data into redis sorted sets
+        :param name: redis key
+        :param data_pairs: dict, {serialized data: timestamp,...}
+        :param on_conflict: str, "error", "skip" or "replace"
+        """
+        if on_conflict == "error":
+            await self.transaction_pipe(self._pipe_add_chunk, name, name, data_pairs, on_conflict)
+        else:
+            await self._pipe_add_chunk(self.client, name, data_pairs, on_conflict)
+
+    async def add_many(self, name, array, chunks_size=2000, assume_sorted=False, on_conflict="error"):
+        """
+        add large amount of data into redis sorted sets
+        :param name: redis key
+        :param array: data pairs, [("timestamp",data)...]
+        :param chunks_size: split data into chunk, optimize for redis pipeline
+        :param assume_sorted: bool, the array already sorted as the timestamp asc, skip to sort it
+        :param on_conflict: str, the policy of the exist timestamps, "error", "skip" or "replace"
+        """
+        array = await self._add_many_validate_mixin(name, array, assume_sorted, on_conflict)
+
+        for result_data in self._dumps_chunks(array, chunks_size):
+            await self._add_chunk(name, result_data, on_conflict)
+
+    async def add_many_keys(self, mapping, chunks_size=2000, pipeline_bytes=1048576,
+                            assume_sorted=False, on_conflict="error"):
+        """
+        add large amount of data of many keys into redis sorted sets,
+        the same as RedisSampleTimeSeries.add_many_keys
+        :param mapping: dict, {name: [(timestamp, data),...],...}
+        :param chunks_size: split data of each key into chunk
+        :param pipeline_bytes: int, execute the pipeline when the queued payload reaches the bytes
+        :param assume_sorted: bool, the arrays already sorted as the timestamp asc, skip to sort them
+        :param on_conflict: str, the policy of the exist timestamps, "error", "skip" or "replace"
+        """
+        prepared = await self._add_many_keys_validate_mixin(mapping, assume_sorted, on_conflict)
+
+        def iter_pipe_funcs():
+            for name, timestamp_pairs, trim_length in prepared:
+                if trim_length > 0:
+                    yield 0, functools.partial(self._pipe_trim, name=name, length=trim_length)
+
+                for result_data in self._dumps_chunks(timestamp_pairs, chunks_size):
+                    payload_bytes = sum(map(ttseries.utils.sizeof_payload, result_data)) + 16 * len(result_data)
+                    yield payload_bytes, functools.partial(self._pipe_add_chunk, name=name,
+                                                           data_pairs=result_data,
+                                                           on_conflict=on_conflict)
+
+        await self._execute_sized_pipe(iter_pipe_funcs(), pipeline_bytes)
+
+    async def get(self, name: str, timestamp: float):
+        """
+        get one item by timestamp
+        :param name: redis key
+        :param timestamp: float, timestamp
+        :return: obj
+        """
+        result = await self.client.zrangebyscore(name, min=timestamp, max=timestamp)
+        if result:
+            return self._loads_item(timestamp, result[0])
+
+    async def delete(self, name: str, start_timestamp=None, end_timestamp=None):
+        """
+        Removes all elements in the sorted sets stored at key
+        between start timestamp and end timestamp (inclusive).
+        if parameter only contains `name`, will delete all data stored in redis key.
+        :param name: redis key,
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :return: int, the result of the elements removed
+        """
+        if start_timestamp or end_timestamp:
+            if start_timestamp is None:
+                start_timestamp = "-inf"
+            if end_timestamp is None:
+                end_timestamp = "+inf"
+            return await self.client.zremrangebyscore(name, min=start_timestamp, max=end_timestamp)
+        else:
+            return await self.client.delete(name)
+
+    async def remove_many(self, names, start_timestamp=None, end_timestamp=None):
+        """
+        remove many keys with timestamp, the keys are removed concurrently.
+        ! if only parameter contains names, will directly delete redis key.
+        :param names: tuple, redis keys
+        :param start_timestamp: float, start timestamp
+        :param end_timestamp: float, end timestamp
+        """
+        chunks_data = ttseries.utils.chunks(names, 1000)
+
+        if start_timestamp or end_timestamp:
+            for chunk_keys in chunks_data:
+                await asyncio.gather(*(self.delete(name, start_timestamp, end_timestamp)
+                                       for name in chunk_keys))
+        else:
+            for chunk_keys in chunks_data:
+                await self._delete_keys(list(chunk_keys))
+
+    async def trim(self, name: str, length: int):
+        """
+        trim the redis sorted sets as the length of the data.
+        trim the data with timestamp as the asc
+        :param name: redis key
+        :param length: int, length
+        """
+        current_length = await self.length(name)
+
+        if current_length > length > 0:
+            await self.client.zremrangebyrank(name, min=0, max=length - 1)
+        elif length >= current_length:
+            await self.delete(name)
+
+    async def get_slice(self, name, start_timestamp=None,
+                        end_timestamp=None, limit=None, asc=True):
+        """
+        return a slice from redis sorted sets with timestamp pairs
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param limit: int, limit the length of the result data.
+        :param asc: bool, sorted as the timestamp values
+        :return: [(timestamp,data),...]
+        """
+        members, timestamps = await self._get_slice_mixin(name, start_timestamp,
+                                                          end_timestamp, limit, asc)
+        if members:
+            return self._loads_slice(members, timestamps)
+
+    async def get_slice_columns(self, name, start_timestamp=None,
+                                end_timestamp=None, limit=None, asc=True):
+        """
+        return a slice as the numpy columns, the same as RedisSampleTimeSeries.get_slice_columns
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param limit: int, limit the length of the result data.
+        :param asc: bool, sorted as the timestamp values
+        :return: tuple, (numpy.ndarray float64 timestamps, {name: numpy.ndarray,...})
+        """
+        members, timestamps = await self._get_slice_mixin(name, start_timestamp,
+                                                          end_timestamp, limit, asc)
+        if members:
+            return self._loads_columns(timestamps, members)
+
+    async def iter_keys(self, count=None):
+        """
+        async generator iterator all time-series keys
+        :param count: the number of the keys
+        :return: async iter,
+        """
+        async for item in self.client.scan_iter(count=count):
+            yield item.decode("utf-8")
+
+    async def iter(self, name, count=None):
+        """
+        async iterator all the time-series data with redis key,
+        the scanned items are deserialized in batches.
+        :param name: redis key
+        :param count:
+        :return: async iter, [(timestamp, data),...]
+        """
+        batch = []
+        async for item in self.client.zscan_iter(name, count=count):
+            # (array_data, timestamp)
+            batch.append(item)
+            if len(batch) >= self.iter_batch_size:
+                for value in self._loads_iter_items(batch):
+                    yield value
+                batch = []
+        if batch:
+            for value in self._loads_iter_items(batch):
+                yield value
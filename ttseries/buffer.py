@@ -0,0 +1,492 @@
+# encoding:utf-8
+import glob
+import os
+import queue
+import threading
+import time
+
+import msgpack
+import numpy as np
+import pandas as pd
+
+from ttseries.exceptions import FlushError, RedisTimeSeriesError
+from ttseries.ts import RedisNumpyTimeSeries, RedisPandasTimeSeries
+
+_STOP = object()
+
+
+class _KeyBuffer(object):
+    """
+    the buffered points of one key
+    """
+    __slots__ = ("points", "created", "held", "retries", "retry_at")
+
+    def __init__(self, created=None):
+        self.points = []  # [(timestamp, data, segment),...]
+        self.created = time.monotonic() if created is None else created
+        self.held = False  # the points were held back by the reorder window
+        self.retries = 0
+        self.retry_at = 0.0  # the monotonic time of the next retry of the failed points
+
+
+class BufferedWriter(object):
+    """
+    Write-behind buffer of a time-series instance.
+
+    accumulate the points of each key in memory, a background thread
+    flushes the points of a key through `add_many` when the key holds
+    `max_points` points or the oldest point is older than `max_age` seconds.
+
+    >>> writer = BufferedWriter(RedisHashTimeSeries(client), max_points=1000, max_age=1.0)
+    >>> writer.add("APPL:SECOND", 1526611599.240008, {"value": 10})
+    >>> writer.close()
+
+    the points are (timestamp, data) pairs, with RedisNumpyTimeSeries the data
+    is the whole row includes the timestamp column, and with RedisPandasTimeSeries
+    the data is a pandas.Series named with the datetime.
+
+    the points of a failed flush go back into the buffer and are retried with
+    backoff, after `max_retries` the points are left to the journal and
+    `add`, `flush` or `close` raises FlushError, which lists all the
+    failed flushes since the last raised one in `errors`.
+
+    the points held back by the reorder window keep their age, a key is
+    flushed regardless of the window once the oldest point is older than
+    `max_age` + `reorder_window` seconds.
+    """
+
+    def __init__(self, time_series, max_points=1000, max_age=1.0,
+                 max_queue_size=100000, reorder_window=0.0,
+                 journal_path=None, journal_segment_bytes=4194304, journal_fsync=False,
+                 chunks_size=2000, on_conflict="skip", max_retries=3, retry_backoff=0.1, start=True):
+        """
+        :param time_series: time-series instance, RedisSampleTimeSeries, RedisHashTimeSeries,
+            RedisNumpyTimeSeries or RedisPandasTimeSeries
+        :param max_points: int, flush a key when the buffered points reach the number
+        :param max_age: float, flush a key when the oldest buffered point reaches the seconds
+        :param max_queue_size: int, the bound of the queue between `add` and the flush thread,
+            `add` blocks when the queue is full
+        :param reorder_window: float, hold back the points within the latest seconds of
+            timestamps of each key, so the slightly late points are sorted into the same batch,
+            the repeated timestamps in the buffer keep the last added point.
+        :param journal_path: str, the path prefix of the append-only journal segments,
+            the unflushed points of a crashed writer are replayed when a writer starts
+            with the same path, None disables the journal. the records are message-pack
+            with the data encoded by the serializer of the time-series instance.
+        :param journal_segment_bytes: int, start a new journal segment when the current one
+            reaches the bytes, a segment is removed once all of its points are flushed.
+        :param journal_fsync: bool, fsync the journal after each point
+        :param chunks_size: int, the chunks size of `add_many`
+        :param on_conflict: str, the policy of the exist timestamps of `add_many`
+        :param max_retries: int, the retries of the failed flush of a key
+        :param retry_backoff: float, the seconds before the first retry, doubled by each retry
+        :param start: bool, start the flush thread
+        """
+        time_series._validate_on_conflict(on_conflict)
+
+        self.time_series = time_series
+        self.max_points = max_points
+        self.max_age = max_age
+        self.reorder_window = reorder_window
+        self.chunks_size = chunks_size
+        self.on_conflict = on_conflict
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._buffers = {}
+        self._last_timestamps = {}
+        self._closed = False
+        self._errors = []  # FlushError to raise in the caller thread
+
+        self._metrics_lock = threading.Lock()
+        self._metrics = {"flushes": 0, "flushed_points": 0,
+                         "last_batch_size": 0, "max_batch_size": 0,
+                         "last_flush_latency": 0.0, "max_flush_latency": 0.0,
+                         "total_flush_latency": 0.0,
+                         "late_points": 0, "dropped_points": 0,
+                         "errors": 0, "last_error": None, "failed_points": 0}
+
+        self.journal_path = journal_path
+        self.journal_segment_bytes = journal_segment_bytes
+        self.journal_fsync = journal_fsync
+        self._journal_lock = threading.Lock()
+        self._journal_file = None
+        self._segment = 0
+        self._pending = {}  # {segment: unflushed points}
+
+        if journal_path:
+            self._recover_journal()
+            self._open_segment(self._segment + 1)
+
+        self._thread = threading.Thread(target=self._run, name="ttseries-buffered-writer", daemon=True)
+        if start:
+            self.start()
+
+    def start(self):
+        """
+        start the background flush thread
+        """
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # **************** public ****************
+
+    def add(self, name, timestamp, data, block=True, timeout=None):
+        """
+        buffer one point, write it into the journal before queued.
+        :param name: redis key
+        :param timestamp: float
+        :param data: obj
+        :param block: bool, block when the queue is full
+        :param timeout: float, the seconds to block, raise queue.Full after timeout
+        :raise queue.Full
+        :raise FlushError: a former flush failed after the retries
+        """
+        if self._closed:
+            raise RedisTimeSeriesError("BufferedWriter is closed")
+        self._raise_error()
+        self.time_series._validate_key(name)
+
+        segment = self._write_journal(name, timestamp, data)
+        try:
+            self._queue.put((name, timestamp, data, segment), block, timeout)
+        except queue.Full:
+            self._release_segments([segment])
+            raise
+
+    def flush(self, timeout=None):
+        """
+        flush all the buffered points, ignore the reorder window,
+        block until the points queued before are written into redis,
+        the failed keys are retried until written or out of retries.
+        :param timeout: float
+        :return: bool, False if timeout
+        :raise FlushError: a flush failed after the retries
+        :raise RedisTimeSeriesError: the writer is closed or the flush thread is not running
+        """
+        if self._closed:
+            raise RedisTimeSeriesError("BufferedWriter is closed")
+        if not self._thread.is_alive():
+            raise RedisTimeSeriesError("the flush thread of BufferedWriter is not running")
+        event = threading.Event()
+        self._queue.put(event)
+        flushed = event.wait(timeout)
+        self._raise_error()
+        return flushed
+
+    def close(self, timeout=None):
+        """
+        flush all the buffered points and stop the flush thread
+        :param timeout: float
+        :raise FlushError: a flush failed after the retries
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+        with self._journal_lock:
+            if self._journal_file is not None:
+                self._journal_file.close()
+                self._journal_file = None
+                self._remove_flushed_segments()
+        self._raise_error()
+
+    @property
+    def metrics(self):
+        """
+        the metrics of the writer
+        :return: dict, flushes, flushed_points, last_batch_size, max_batch_size,
+            last_flush_latency, max_flush_latency, avg_flush_latency, queue_depth,
+            buffered_points, late_points, dropped_points, errors, last_error, failed_points
+        """
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        total_latency = metrics.pop("total_flush_latency")
+        metrics["avg_flush_latency"] = total_latency / metrics["flushes"] if metrics["flushes"] else 0.0
+        metrics["queue_depth"] = self._queue.qsize()
+        metrics["buffered_points"] = sum(len(buffer.points) for buffer in list(self._buffers.values()))
+        return metrics
+
+    # **************** flush thread ****************
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_age
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush_all()
+                return
+            elif isinstance(item, threading.Event):
+                self._flush_all()
+                item.set()
+                continue
+            elif item is not None:
+                name, timestamp, data, segment = item
+                buffer = self._buffers.get(name)
+                if buffer is None:
+                    buffer = self._buffers[name] = _KeyBuffer()
+                buffer.points.append((timestamp, data, segment))
+                if len(buffer.points) >= self.max_points:
+                    self._flush_key(name)
+
+            now = time.monotonic()
+            if now >= deadline:
+                # flush the keys reach the max age, the held back points ignore the reorder window
+                # after another window, then wait until the oldest one or the next retry
+                for name, buffer in list(self._buffers.items()):
+                    if now >= self._flush_deadline(buffer):
+                        self._flush_key(name, force=buffer.held)
+                deadline = min((max(self._flush_deadline(buffer), buffer.retry_at)
+                                for buffer in self._buffers.values()), default=now + self.max_age)
+
+    def _flush_deadline(self, buffer):
+        """
+        :param buffer: _KeyBuffer
+        :return: float, the monotonic time to flush the key by the age
+        """
+        if buffer.held:
+            return buffer.created + self.max_age + self.reorder_window
+        return buffer.created + self.max_age
+
+    def _flush_all(self):
+        """
+        flush all the keys, wait for the backoff of the failed keys and retry them
+        until written or out of retries.
+        """
+        while self._buffers:
+            wait = min(buffer.retry_at for buffer in self._buffers.values()) - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            for name in list(self._buffers):
+                self._flush_key(name, force=True)
+
+    def _raise_error(self):
+        with self._metrics_lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            error = errors[0]
+            raise FlushError(error.name, error.points, error.retries, error.error, errors=errors)
+
+    def _flush_key(self, name, force=False):
+        """
+        sort the buffered points, keep the last point of the repeated timestamps,
+        write the points out of the reorder window with `add_many`,
+        the key waits for the backoff after a failed flush.
+        :param name: redis key
+        :param force: bool, ignore the reorder window
+        """
+        if self._buffers[name].retry_at > time.monotonic():
+            return
+        buffer = self._buffers.pop(name)
+
+        points = {}
+        for point in sorted(buffer.points, key=lambda item: item[0]):
+            duplicated = points.get(point[0])
+            if duplicated is not None:
+                self._release_segments([duplicated[2]])
+                self._add_metrics(dropped_points=1)
+            points[point[0]] = point
+        points = list(points.values())
+
+        if not force and self.reorder_window > 0 and points:
+            cut = points[-1][0] - self.reorder_window
+            index = next((i for i, point in enumerate(points) if point[0] > cut), len(points))
+            points, held = points[:index], points[index:]
+            if held:
+                rest = self._buffers[name] = _KeyBuffer(buffer.created)
+                rest.points = held
+                rest.held = True
+
+        if not points:
+            return
+
+        last_timestamp = self._last_timestamps.get(name)
+        if last_timestamp is not None:
+            late = sum(1 for point in points if point[0] <= last_timestamp)
+            if late:
+                self._add_metrics(late_points=late)
+
+        begin = time.monotonic()
+        try:
+            self.time_series.add_many(name, self._make_batch(points), chunks_size=self.chunks_size,
+                                      assume_sorted=True, on_conflict=self.on_conflict)
+        except Exception as e:
+            self._add_metrics(errors=1, last_error=repr(e))
+            self._retry_points(name, points, buffer, e)
+            return
+
+        latency = time.monotonic() - begin
+        self._last_timestamps[name] = max(points[-1][0], last_timestamp or points[-1][0])
+        self._release_segments([point[2] for point in points])
+
+        with self._metrics_lock:
+            metrics = self._metrics
+            metrics["flushes"] += 1
+            metrics["flushed_points"] += len(points)
+            metrics["last_batch_size"] = len(points)
+            metrics["max_batch_size"] = max(metrics["max_batch_size"], len(points))
+            metrics["last_flush_latency"] = latency
+            metrics["max_flush_latency"] = max(metrics["max_flush_latency"], latency)
+            metrics["total_flush_latency"] += latency
+
+    def _retry_points(self, name, points, buffer, error):
+        """
+        put the points of the failed flush back into the buffer of the key
+        and retry after the backoff, give up after the max retries.
+        :param name: redis key
+        :param points: [(timestamp, data, segment),...]
+        :param buffer: _KeyBuffer, the buffer of the failed points
+        :param error: the exception of the flush
+        """
+        if buffer.retries >= self.max_retries:
+            # keep the journal segments of the points, replay them at the next start
+            self._add_metrics(failed_points=len(points))
+            with self._metrics_lock:
+                self._errors.append(FlushError(name, len(points), buffer.retries, error))
+            return
+
+        held = self._buffers.get(name)
+        retry = self._buffers[name] = _KeyBuffer(buffer.created)
+        retry.points = points + (held.points if held is not None else [])
+        retry.retries = buffer.retries + 1
+        retry.retry_at = time.monotonic() + self.retry_backoff * 2 ** buffer.retries
+
+    def _make_batch(self, points):
+        """
+        build the `add_many` array of the time-series instance
+        :param points: [(timestamp, data, segment),...]
+        :return: list, numpy.ndarray or pandas.DataFrame
+        """
+        if isinstance(self.time_series, RedisNumpyTimeSeries):
+            return np.array([point[1] for point in points], dtype=self.time_series.dtype)
+        elif isinstance(self.time_series, RedisPandasTimeSeries):
+            return pd.DataFrame([point[1] for point in points])
+        return [(point[0], point[1]) for point in points]
+
+    def _add_metrics(self, **kwargs):
+        with self._metrics_lock:
+            for key, value in kwargs.items():
+                if key == "last_error":
+                    self._metrics[key] = value
+                else:
+                    self._metrics[key] += value
+
+    # **************** journal ****************
+
+    def _segment_path(self, segment):
+        return "{0}.{1:08d}".format(self.journal_path, segment)
+
+    def _open_segment(self, segment):
+        self._segment = segment
+        self._pending.setdefault(segment, 0)
+        self._journal_file = open(self._segment_path(segment), "ab")
+
+    def _write_journal(self, name, timestamp, data):
+        """
+        append the point into the current journal segment
+        :return: int, the segment of the point, None if the journal disabled
+        """
+        if self._journal_file is None:
+            return None
+
+        record = self._dumps_record(name, timestamp, data)
+        with self._journal_lock:
+            if self._journal_file.tell() >= self.journal_segment_bytes:
+                self._journal_file.close()
+                self._open_segment(self._segment + 1)
+                self._remove_flushed_segments()
+
+            self._journal_file.write(record)
+            self._journal_file.flush()
+            if self.journal_fsync:
+                os.fsync(self._journal_file.fileno())
+            self._pending[self._segment] += 1
+            return self._segment
+
+    def _dumps_record(self, name, timestamp, data):
+        """
+        :return: bytes, message-pack [name, timestamp, serialized data]
+        """
+        if isinstance(self.time_series, RedisNumpyTimeSeries):
+            data = np.asarray(data).tolist()
+        elif isinstance(self.time_series, RedisPandasTimeSeries):
+            data = data.tolist()  # the datetime name is rebuilt from the timestamp
+        return msgpack.packb([name, timestamp, self.time_series._serializer.dumps(data)])
+
+    def _loads_record(self, record):
+        """
+        :param record: list, [name, timestamp, serialized data]
+        :return: tuple, (name, timestamp, data)
+        """
+        name, timestamp, data = record
+        data = self.time_series._serializer.loads(data)
+        if isinstance(self.time_series, RedisNumpyTimeSeries):
+            data = tuple(data)
+        elif isinstance(self.time_series, RedisPandasTimeSeries):
+            data = pd.Series(data, index=self.time_series.columns,
+                             name=self.time_series._timestamp_datetime(timestamp))
+        return name, timestamp, data
+
+    def _release_segments(self, segments):
+        """
+        mark the points of the segments flushed
+        """
+        if self.journal_path is None:
+            return
+        with self._journal_lock:
+            for segment in segments:
+                self._pending[segment] -= 1
+            self._remove_flushed_segments()
+
+    def _remove_flushed_segments(self):
+        """
+        remove the segments without unflushed points, except the current writing one
+        """
+        for segment, count in list(self._pending.items()):
+            if count == 0 and (segment != self._segment or self._journal_file is None):
+                del self._pending[segment]
+                os.remove(self._segment_path(segment))
+
+    def _recover_journal(self):
+        """
+        replay the journal segments left by a crashed writer,
+        with the "skip" conflict policy the points already flushed are ignored.
+        """
+        paths = sorted(path for path in glob.glob(glob.escape(self.journal_path) + ".*")
+                       if path.rsplit(".", 1)[1].isdigit())
+        mapping = {}
+        for path in paths:
+            self._segment = max(self._segment, int(path.rsplit(".", 1)[1]))
+            with open(path, "rb") as f:
+                # the unpacker stops at the last record truncated by the crash
+                records = msgpack.Unpacker(f, raw=False)
+                while True:
+                    try:
+                        name, timestamp, data = self._loads_record(next(records))
+                    except StopIteration:
+                        break
+                    except Exception:
+                        # the corrupted tail of the segment
+                        break
+                    mapping.setdefault(name, {})[timestamp] = (timestamp, data, None)
+
+        for name, points in mapping.items():
+            points = sorted(points.values(), key=lambda item: item[0])
+            self.time_series.add_many(name, self._make_batch(points), chunks_size=self.chunks_size,
+                                      assume_sorted=True, on_conflict="skip")
+        for path in paths:
+            os.remove(path)
@@ -5,6 +5,50 @@ class RedisTimeSeriesError(Exception):
     """
 
 
+class ChunkWriteError(RedisTimeSeriesError):
+    """
+    some chunks failed to write with the parallel add_many,
+    the other chunks are already written into redis.
+    """
+
+    def __init__(self, errors, chunks):
+        """
+        :param errors: list, [(chunk index, exception),...]
+        :param chunks: int, the number of the chunks
+        """
+        super(ChunkWriteError, self).__init__("{0} of {1} chunks failed to write, "
+                                              "first error: {2!r}".format(len(errors), chunks, errors[0][1]))
+        self.errors = errors
+        self.chunks = chunks
+
+
+class FlushError(RedisTimeSeriesError):
+    """
+    the buffered points of a key failed to flush after the retries,
+    the points stay in the journal and are replayed at the next start.
+    """
+
+    def __init__(self, name, points, retries, error, errors=None):
+        """
+        :param name: redis key
+        :param points: int, the number of the points
+        :param retries: int, the number of the retries
+        :param error: the exception of the last flush
+        :param errors: list, all the FlushError of the failed flushes since the last raised one,
+            the first is the error of this key, default [self]
+        """
+        message = "flush {0} points of {1} failed after {2} retries, " \
+                  "last error: {3!r}".format(points, name, retries, error)
+        if errors is not None and len(errors) > 1:
+            message += ", {0} more flushes failed".format(len(errors) - 1)
+        super(FlushError, self).__init__(message)
+        self.name = name
+        self.points = points
+        self.retries = retries
+        self.error = error
+        self.errors = errors if errors is not None else [self]
+
+
 class RepeatedValueError(Exception):
     """
     repeated value
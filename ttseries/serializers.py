@@ -1,11 +1,66 @@
 # encoding:utf-8
 import abc
+import collections
+import contextlib
 import datetime
 import decimal
+import gc
+import itertools
+import lzma
+import re
+import struct
+import threading
+import time
+import zlib
 
 import msgpack
+import numpy as np
 from dateutil import parser
 
+from ttseries.exceptions import SerializerError
+
+_gc_lock = threading.Lock()
+_gc_state = {"depth": 0, "enabled": False}
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """
+    disable the garbage collector while unpacking the large batch of the objects,
+    the collector is enabled again when the last of the nested or concurrent callers exits.
+    """
+    with _gc_lock:
+        if _gc_state["depth"] == 0:
+            _gc_state["enabled"] = gc.isenabled()
+            gc.disable()
+        _gc_state["depth"] += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_state["depth"] -= 1
+            if _gc_state["depth"] == 0 and _gc_state["enabled"]:
+                gc.enable()
+
+
+def unpack_many(items, **kwargs):
+    """
+    deserialize the message-pack data of many items in one streaming unpacker
+    :param items: list, bytes of each item
+    :param kwargs: the options of msgpack.Unpacker
+    :return: list
+    """
+    if not items:
+        return []
+    buffer = b"".join(items)
+    unpacker = msgpack.Unpacker(raw=False, max_buffer_size=len(buffer), **kwargs)
+    unpacker.feed(buffer)
+    with gc_paused():
+        results = list(unpacker)
+    if len(results) != len(items):
+        raise SerializerError("unpack {0} objects from {1} items".format(len(results), len(items)))
+    return results
+
 
 class BaseSerializer(abc.ABC):
     """
@@ -29,6 +84,22 @@ class BaseSerializer(abc.ABC):
         """
         raise NotImplementedError()
 
+    def loads_many(self, items):
+        """
+        Deserialize the data of many items, override it to decode the whole batch at once
+        :param items: list, serialized data
+        :return: list
+        """
+        return [self.loads(data) for data in items]
+
+    def dumps_many(self, items):
+        """
+        Serialize the data of many items, override it to encode the whole batch at once
+        :param items: list, obj
+        :return: list
+        """
+        return [self.dumps(data) for data in items]
+
 
 class MsgPackDecoder(object):
     """
@@ -89,13 +160,158 @@ class MsgPackSerializer(BaseSerializer):
     You can use gc.disable() when unpacking large message.
     """
 
+    def __init__(self):
+        self._decode = MsgPackDecoder().decode
+        self._encode = MsgPackEncoder().encode
+
     def loads(self, data, *args, **kwargs):
         """
         deserializer data from message-pack format
         :param data: bytes
         :return:obj
         """
-        return msgpack.unpackb(data,raw=False, object_hook=MsgPackDecoder().decode, **kwargs)
+        return msgpack.unpackb(data, raw=False, object_hook=self._decode, **kwargs)
+
+    def dumps(self, data, *args, **kwargs):
+        """
+        serializer data to message-pack format
+        :param data: obj
+        :return: bytes
+        """
+        return msgpack.packb(data, default=self._encode, **kwargs)
+
+    def loads_many(self, items):
+        """
+        deserializer the concatenated data of the items with one unpacker
+        :param items: list, bytes
+        :return: list
+        """
+        return unpack_many(items, object_hook=self._decode)
+
+    def dumps_many(self, items):
+        """
+        :param items: list, obj
+        :return: list, bytes
+        """
+        packer = msgpack.Packer(default=self._encode, autoreset=True)
+        return list(map(packer.pack, items))
+
+
+class MsgPackExtSerializer(BaseSerializer):
+    """
+    MessagePack serializer with the ExtType of datetime, date, time and Decimal
+
+    datetime: int64 epoch microseconds, int32 utc offset seconds
+    date: int32 proleptic gregorian ordinal
+    time: int64 microseconds of the day, int32 utc offset seconds
+    Decimal: uint8 sign, int32 exponent, little-endian coefficient bytes
+
+    the naive values are stored with the NAIVE offset. the packer
+    of each thread is reused, and the data stored by MsgPackSerializer
+    with the `__cls__` dicts is still readable.
+    """
+
+    DATETIME, DATE, TIME, DECIMAL, DECIMAL_STR = 1, 2, 3, 4, 5
+
+    NAIVE = -(1 << 31)
+    EPOCH = datetime.datetime(1970, 1, 1)
+    EPOCH_UTC = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+    MICROSECOND = datetime.timedelta(microseconds=1)
+
+    MOMENT = struct.Struct("<qi")
+    ORDINAL = struct.Struct("<i")
+    SCALE = struct.Struct("<Bi")  # sign, exponent
+
+    def __init__(self):
+        self._local = threading.local()
+        self._legacy_decode = MsgPackDecoder().decode
+        self._tz_cache = {}
+
+    @property
+    def _packer(self):
+        packer = getattr(self._local, "packer", None)
+        if packer is None:
+            packer = self._local.packer = msgpack.Packer(default=self._encode, autoreset=True)
+        return packer
+
+    def _offset(self, value):
+        """
+        :param value: datetime or time
+        :return: int, utc offset seconds, NAIVE without tzinfo
+        """
+        offset = value.utcoffset()
+        if offset is None:
+            return self.NAIVE
+        return offset.days * 86400 + offset.seconds
+
+    def _timezone(self, offset):
+        tz = self._tz_cache.get(offset)
+        if tz is None:
+            tz = self._tz_cache[offset] = datetime.timezone(datetime.timedelta(seconds=offset))
+        return tz
+
+    def _encode(self, obj):
+        """
+        :param obj:
+        :return: msgpack.ExtType
+        """
+        obj_type = type(obj)
+        if obj_type is datetime.datetime:
+            offset = self._offset(obj)
+            epoch = self.EPOCH if offset == self.NAIVE else self.EPOCH_UTC
+            return msgpack.ExtType(self.DATETIME, self.MOMENT.pack((obj - epoch) // self.MICROSECOND, offset))
+        elif obj_type is datetime.date:
+            return msgpack.ExtType(self.DATE, self.ORDINAL.pack(obj.toordinal()))
+        elif obj_type is datetime.time:
+            microseconds = ((obj.hour * 60 + obj.minute) * 60 + obj.second) * 1000000 + obj.microsecond
+            return msgpack.ExtType(self.TIME, self.MOMENT.pack(microseconds, self._offset(obj)))
+        elif isinstance(obj, decimal.Decimal):
+            if not obj.is_finite():
+                return msgpack.ExtType(self.DECIMAL_STR, str(obj).encode("ascii"))
+            # the coefficient from the digits, as_integer_ratio expands the large exponents
+            sign, digits, exponent = obj.as_tuple()
+            coefficient = int(decimal.Decimal((0, digits, 0)))
+            return msgpack.ExtType(self.DECIMAL, self.SCALE.pack(sign, exponent) + coefficient.to_bytes(
+                (coefficient.bit_length() + 7) // 8, "little"))
+        return obj
+
+    def _ext_hook(self, code, data):
+        """
+        :param code: int, ExtType code
+        :param data: bytes
+        :return: obj
+        """
+        if code == self.DATETIME:
+            microseconds, offset = self.MOMENT.unpack(data)
+            if offset == self.NAIVE:
+                return self.EPOCH + datetime.timedelta(microseconds=microseconds)
+            return (self.EPOCH_UTC + datetime.timedelta(microseconds=microseconds)).astimezone(
+                self._timezone(offset))
+        elif code == self.DATE:
+            return datetime.date.fromordinal(self.ORDINAL.unpack(data)[0])
+        elif code == self.TIME:
+            microseconds, offset = self.MOMENT.unpack(data)
+            seconds, microsecond = divmod(microseconds, 1000000)
+            minutes, second = divmod(seconds, 60)
+            hour, minute = divmod(minutes, 60)
+            tz = None if offset == self.NAIVE else self._timezone(offset)
+            return datetime.time(hour, minute, second, microsecond, tzinfo=tz)
+        elif code == self.DECIMAL:
+            sign, exponent = self.SCALE.unpack_from(data)
+            coefficient = int.from_bytes(data[self.SCALE.size:], "little")
+            return decimal.Decimal((sign, decimal.Decimal(coefficient).as_tuple().digits, exponent))
+        elif code == self.DECIMAL_STR:
+            return decimal.Decimal(data.decode("ascii"))
+        return msgpack.ExtType(code, data)
+
+    def loads(self, data, *args, **kwargs):
+        """
+        deserializer data from message-pack format
+        :param data: bytes
+        :return: obj
+        """
+        return msgpack.unpackb(data, raw=False, ext_hook=self._ext_hook,
+                               object_hook=self._legacy_decode, **kwargs)
 
     def dumps(self, data, *args, **kwargs):
         """
@@ -103,7 +319,21 @@ class MsgPackSerializer(BaseSerializer):
         :param data: obj
         :return: bytes
         """
-        return msgpack.packb(data, default=MsgPackEncoder().encode, **kwargs)
+        return self._packer.pack(data)
+
+    def loads_many(self, items):
+        """
+        :param items: list, bytes
+        :return: list
+        """
+        return unpack_many(items, ext_hook=self._ext_hook, object_hook=self._legacy_decode)
+
+    def dumps_many(self, items):
+        """
+        :param items: list, obj
+        :return: list, bytes
+        """
+        return list(map(self._packer.pack, items))
 
 
 class DumpySerializer(BaseSerializer):
@@ -115,3 +345,334 @@ class DumpySerializer(BaseSerializer):
 
     def loads(self, data, *args, **kwargs):
         return data
+
+    def dumps_many(self, items):
+        return list(items)
+
+    def loads_many(self, items):
+        return list(items)
+
+
+class CompressedSerializer(BaseSerializer):
+    """
+    compress the data of the wrapped serializer above the threshold bytes,
+    configured with the class attributes, the time-series classes create
+    the serializer without parameters:
+
+    >>> class BookSerializer(CompressedSerializer):
+    >>>     algorithm = "zlib"
+    >>>     threshold = 256
+    >>>     zdict = CompressedSerializer.train_zdict(sample_books)
+    >>> RedisHashTimeSeries(client, serializer_cls=BookSerializer)
+
+    the compressed data starts with the one byte header 0xc1, which is never
+    used by msgpack, so the data stored by the wrapped serializer without the
+    compression stays readable. a zlib shared dictionary helps the small records,
+    the same dictionary must be used to read the data compressed with it.
+    """
+
+    HEADER = b"\xc1"
+    # the first byte of the xz format, zlib streams never start with it
+    LZMA_MAGIC = 0xfd
+
+    serializer_cls = MsgPackSerializer
+    algorithm = "zlib"  # "zlib" or "lzma"
+    threshold = 512  # compress the serialized data not less than the bytes
+    level = 6  # zlib level or lzma preset
+    zdict = None  # zlib shared dictionary, bytes
+
+    def __init__(self):
+        if self.algorithm not in ("zlib", "lzma"):
+            raise SerializerError("algorithm must be one of zlib, lzma")
+        if self.zdict is not None and self.algorithm != "zlib":
+            raise SerializerError("zdict only supports the zlib algorithm")
+
+        self._serializer = self.serializer_cls()
+        self._stats_lock = threading.Lock()
+        self._stats = {"dumps": 0, "compressed": 0, "raw_bytes": 0, "stored_bytes": 0,
+                       "dumps_time": 0.0, "loads": 0, "loads_time": 0.0}
+
+    @property
+    def stats(self):
+        """
+        :return: dict, the counters of the serialized data, `ratio` is
+            the serialized bytes over the stored bytes, the times are in seconds.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["ratio"] = stats["raw_bytes"] / stats["stored_bytes"] if stats["stored_bytes"] else 1.0
+        return stats
+
+    def _compress(self, data):
+        if self.algorithm == "lzma":
+            return lzma.compress(data, preset=self.level)
+        if self.zdict is None:
+            return zlib.compress(data, self.level)
+        compressor = zlib.compressobj(self.level, zdict=self.zdict)
+        return compressor.compress(data) + compressor.flush()
+
+    def _decompress(self, data):
+        try:
+            if data[0] == self.LZMA_MAGIC:
+                return lzma.decompress(data)
+            if self.zdict is None:
+                return zlib.decompress(data)
+            decompressor = zlib.decompressobj(zdict=self.zdict)
+            return decompressor.decompress(data) + decompressor.flush()
+        except (zlib.error, lzma.LZMAError) as e:
+            raise SerializerError("decompress data failed: {0}".format(e))
+
+    def dumps(self, data, *args, **kwargs):
+        """
+        :param data: obj
+        :return: bytes
+        """
+        begin = time.perf_counter()
+        return self._store([self._serializer.dumps(data, *args, **kwargs)], begin)[0]
+
+    def dumps_many(self, items):
+        """
+        :param items: list, obj
+        :return: list, bytes
+        """
+        begin = time.perf_counter()
+        return self._store(self._serializer.dumps_many(items), begin)
+
+    def _store(self, raws, begin):
+        """
+        compress the serialized data above the threshold and count them
+        :param raws: list, bytes of the wrapped serializer
+        :param begin: float, the perf counter when the dumps began
+        :return: list, bytes
+        """
+        results = []
+        compressed_count = raw_bytes = stored_bytes = 0
+        for raw in raws:
+            compressed = len(raw) >= self.threshold or raw[:1] == self.HEADER
+            stored = self.HEADER + self._compress(raw) if compressed else raw
+            results.append(stored)
+            compressed_count += compressed
+            raw_bytes += len(raw)
+            stored_bytes += len(stored)
+
+        with self._stats_lock:
+            stats = self._stats
+            stats["dumps"] += len(results)
+            stats["compressed"] += compressed_count
+            stats["raw_bytes"] += raw_bytes
+            stats["stored_bytes"] += stored_bytes
+            stats["dumps_time"] += time.perf_counter() - begin
+        return results
+
+    def loads(self, data, *args, **kwargs):
+        """
+        :param data: bytes
+        :return: obj
+        """
+        begin = time.perf_counter()
+        if data[:1] == self.HEADER:
+            data = self._decompress(data[1:])
+        result = self._serializer.loads(data, *args, **kwargs)
+
+        with self._stats_lock:
+            self._stats["loads"] += 1
+            self._stats["loads_time"] += time.perf_counter() - begin
+        return result
+
+    def loads_many(self, items):
+        """
+        decompress the items, then deserialize them in one batch of the wrapped serializer
+        :param items: list, bytes
+        :return: list
+        """
+        begin = time.perf_counter()
+        raws = [self._decompress(data[1:]) if data[:1] == self.HEADER else data for data in items]
+        results = self._serializer.loads_many(raws)
+
+        with self._stats_lock:
+            self._stats["loads"] += len(raws)
+            self._stats["loads_time"] += time.perf_counter() - begin
+        return results
+
+    @classmethod
+    def train_zdict(cls, samples, size=16384, width=8):
+        """
+        build a zlib shared dictionary from the sample data,
+        the most frequent byte substrings of the serialized samples are
+        kept, the most frequent ones at the end, which is the nearest to the data.
+        :param samples: iterable, the sample objects
+        :param size: int, the max bytes of the dictionary
+        :param width: int, the bytes of the counted substrings
+        :return: bytes
+        """
+        serializer = cls.serializer_cls()
+        counter = collections.Counter()
+        for sample in samples:
+            raw = serializer.dumps(sample)
+            counter.update(set(raw[i:i + width] for i in range(0, len(raw) - width + 1)))
+
+        pieces = []
+        length = 0
+        for piece, count in counter.most_common():
+            if count < 2 or length + width > size:
+                break
+            pieces.append(piece)
+            length += width
+        return b"".join(reversed(pieces))
+
+
+class StructSerializer(BaseSerializer):
+    """
+    pack the fixed-shape records into a fixed binary layout with `struct`,
+    declared with the class attributes, the field names are not stored:
+
+    >>> class QuoteSerializer(StructSerializer):
+    >>>     fields = [("bid", "d"), ("ask", "d"), ("side", "B")]
+    >>>     version = 1
+    >>>     schemas = {0: [("bid", "d"), ("ask", "d")]}
+    >>> RedisSampleTimeSeries(client, serializer_cls=QuoteSerializer)
+
+    the data starts with the uint8 schema version followed by the little-endian
+    values, the field types are the struct format characters, "Ns" is N bytes
+    padded with zeros. the records of the older versions in `schemas` are still
+    readable, `loads_columns` fills the fields they don't have with `defaults`.
+    """
+
+    VERSION_FIELD = "__version__"
+    NUMPY_TYPES = {"b": "i1", "B": "u1", "h": "<i2", "H": "<u2", "i": "<i4", "I": "<u4",
+                   "l": "<i4", "L": "<u4", "q": "<i8", "Q": "<u8", "e": "<f2", "f": "<f4",
+                   "d": "<f8", "?": "?"}
+
+    fields = ()  # [(name, struct format),...]
+    version = 0  # the current schema version, 0 ~ 255
+    schemas = {}  # the older schemas, {version: fields}
+    record_type = dict  # the loaded record, dict, tuple or list
+    defaults = {}  # {name: value}, the missing columns of the older versions, 0 or nan by default
+
+    def __init__(self):
+        if not self.fields:
+            raise SerializerError("fields must be declared")
+        if not 0 <= self.version <= 255 or self.version in self.schemas:
+            raise SerializerError("version must be in 0 ~ 255 and not in the older schemas")
+        if self.record_type not in (dict, tuple, list):
+            raise SerializerError("record_type must be one of dict, tuple, list")
+
+        self._names = {}
+        self._structs = {}
+        self._dtypes = {}
+        for version, fields in itertools.chain(self.schemas.items(), [(self.version, self.fields)]):
+            if not 0 <= version <= 255:
+                raise SerializerError("version must be in 0 ~ 255")
+            names = [name for name, _ in fields]
+            if len(set(names)) != len(names) or self.VERSION_FIELD in names:
+                raise SerializerError("fields names must be unique")
+
+            self._names[version] = names
+            self._structs[version] = struct.Struct("<B" + "".join(fmt for _, fmt in fields))
+            self._dtypes[version] = np.dtype([(self.VERSION_FIELD, "u1")] +
+                                             [(name, self._numpy_type(fmt)) for name, fmt in fields])
+
+        self._struct = self._structs[self.version]
+
+    def _numpy_type(self, fmt):
+        """
+        :param fmt: str, struct format of one field
+        :return: str, numpy dtype
+        """
+        match = re.match(r"^(\d*)(\D)$", fmt)
+        if match is None:
+            raise SerializerError("unsupported field format: {0}".format(fmt))
+        count, char = match.groups()
+        if char == "s":
+            return "S{0}".format(count or 1)
+        if count or char not in self.NUMPY_TYPES:
+            raise SerializerError("unsupported field format: {0}".format(fmt))
+        return self.NUMPY_TYPES[char]
+
+    def _record(self, names, values):
+        if self.record_type is dict:
+            return dict(zip(names, values))
+        return self.record_type(values)
+
+    def dumps(self, data, *args, **kwargs):
+        """
+        :param data: dict of the field names, or the sequence of the values
+        :return: bytes
+        """
+        return self.dumps_many([data])[0]
+
+    def dumps_many(self, items):
+        """
+        :param items: list, dict or sequence
+        :return: list, bytes
+        """
+        pack = self._struct.pack
+        names = self._names[self.version]
+        version = self.version
+        try:
+            return [pack(version, *[data[name] for name in names]) if isinstance(data, dict)
+                    else pack(version, *data) for data in items]
+        except (struct.error, KeyError, TypeError) as e:
+            raise SerializerError("pack the record failed: {0}".format(e))
+
+    def loads(self, data, *args, **kwargs):
+        """
+        :param data: bytes
+        :return: dict, tuple or list as the `record_type`
+        """
+        try:
+            values = self._structs[data[0]].unpack(data)
+        except (KeyError, IndexError, struct.error) as e:
+            raise SerializerError("unpack the record failed: {0}".format(e))
+        return self._record(self._names[values[0]], values[1:])
+
+    def loads_many(self, items):
+        """
+        unpack the records of the current version from the joined buffer at once
+        :param items: list, bytes
+        :return: list
+        """
+        size = self._struct.size
+        if all(len(data) == size for data in items):
+            rows = list(self._struct.iter_unpack(b"".join(items)))
+            if all(row[0] == self.version for row in rows):
+                names = self._names[self.version]
+                return [self._record(names, row[1:]) for row in rows]
+        return [self.loads(data) for data in items]
+
+    def loads_columns(self, items):
+        """
+        decode the records into numpy columns at once
+        :param items: list, bytes
+        :return: dict, {name: numpy.ndarray,...} of the current fields
+        """
+        dtype = self._dtypes[self.version]
+        count = len(items)
+        lengths = np.fromiter(map(len, items), np.int64, count)
+        versions = np.fromiter((data[0] if data else -1 for data in items), np.int16, count)
+
+        if (lengths == dtype.itemsize).all() and (versions == self.version).all():
+            array = np.frombuffer(b"".join(items), dtype=dtype)
+            return {name: array[name].copy() for name in self._names[self.version]}
+
+        columns = {name: np.full(count, self._default(name, dtype[name]), dtype=dtype[name])
+                   for name in self._names[self.version]}
+
+        for version in np.unique(versions).tolist():
+            index = np.flatnonzero(versions == version)
+            if version not in self._dtypes or (lengths[index] != self._dtypes[version].itemsize).any():
+                raise SerializerError("unpack the records of the schema version {0} failed".format(version))
+            array = np.frombuffer(b"".join([items[i] for i in index]), dtype=self._dtypes[version])
+            for name in self._names[version]:
+                if name in columns:
+                    columns[name][index] = array[name]
+        return columns
+
+    def _default(self, name, dtype):
+        if name in self.defaults:
+            return self.defaults[name]
+        if dtype.kind == "f":
+            return np.nan
+        if dtype.kind == "S":
+            return b""
+        return 0
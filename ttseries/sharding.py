@@ -0,0 +1,465 @@
+# encoding:utf-8
+import bisect
+import collections
+import concurrent.futures
+import contextlib
+import copy
+import hashlib
+import itertools
+import threading
+
+import redis
+
+import ttseries.utils
+from ttseries.exceptions import RedisTimeSeriesError
+from ttseries.ts import RedisSampleTimeSeries
+
+
+class HashRing(object):
+    """
+    consistent hash ring with virtual nodes,
+    adding or removing a node only remaps the keys of the neighbour points.
+    """
+
+    def __init__(self, nodes=(), replicas=160):
+        """
+        :param nodes: iterable, node names
+        :param replicas: int, the virtual nodes of each node on the ring
+        """
+        self.replicas = replicas
+        self._points = []  # sorted hash points
+        self._owners = {}  # {hash point: node}
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    @property
+    def nodes(self):
+        return set(self._owners.values())
+
+    def add_node(self, node):
+        """
+        :param node: str, node name
+        """
+        if node in self.nodes:
+            raise RedisTimeSeriesError("node {0} already in the hash ring".format(node))
+        for i in range(self.replicas):
+            point = self._hash("{0}#{1}".format(node, i))
+            if point not in self._owners:
+                bisect.insort(self._points, point)
+                self._owners[point] = node
+
+    def remove_node(self, node):
+        """
+        :param node: str, node name
+        """
+        for point in [point for point, owner in self._owners.items() if owner == node]:
+            del self._owners[point]
+            del self._points[bisect.bisect_left(self._points, point)]
+
+    def get_node(self, key):
+        """
+        the node of the key, the first point clockwise from the hash of the key
+        :param key: str, redis key
+        :return: str, node name
+        """
+        if not self._points:
+            raise RedisTimeSeriesError("no node in the hash ring")
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self._owners[self._points[index]]
+
+
+class ShardedTimeSeries(object):
+    """
+    spread the time-series across standalone redis nodes,
+    each series name is mapped to one node by consistent hashing,
+    each node keeps its own redis client and connection pool.
+
+    >>> sharded = ShardedTimeSeries({"node1": "redis://10.0.0.1:6379/0",
+    >>>                              "node2": "redis://10.0.0.2:6379/0"},
+    >>>                             series_cls=RedisHashTimeSeries, max_length=100000)
+    >>> sharded.add_many("APPL:SECOND", data_list)
+
+    the operations of many keys fan out to the nodes in parallel threads.
+
+    while adding or removing a node, each key is routed to its old node
+    until it has moved, the operations of the keys being moved wait for them.
+    """
+
+    def __init__(self, nodes, series_cls=RedisSampleTimeSeries, replicas=160, max_workers=None,
+                 move_chunk_size=100, **kwargs):
+        """
+        :param nodes: dict, {node name: redis client or redis url}
+        :param series_cls: time-series class of each node
+        :param replicas: int, the virtual nodes of each node on the hash ring
+        :param max_workers: int, the threads to fan out, default the number of the nodes
+        :param move_chunk_size: int, the keys of each DUMP and RESTORE batch of the rebalance
+        :param kwargs: the parameters of the time-series class
+        """
+        self.series_cls = series_cls
+        self._series_kwargs = kwargs
+        self._series = {}
+        self.ring = HashRing(replicas=replicas)
+        self.max_workers = max_workers
+        self.move_chunk_size = move_chunk_size
+        self._executor = None
+
+        # the routing state of the rebalance, guarded by the condition
+        self._routing = threading.Condition()
+        self._next_ring = None  # the hash ring after the rebalance
+        self._moved = set()  # the keys already on their node of the next ring
+        self._moving = set()  # the keys between DUMP and the source deleted
+        self._active = collections.Counter()  # the operations in flight of each key
+        self._paused = False
+
+        for node, client in nodes.items():
+            self._add_series(node, client)
+            self.ring.add_node(node)
+
+    def _add_series(self, node, client):
+        if isinstance(client, str):
+            client = redis.StrictRedis.from_url(client)
+        self._series[node] = self.series_cls(client, **self._series_kwargs)
+
+    @property
+    def executor(self):
+        with self._routing:
+            if self._executor is None:
+                self._executor = self._new_executor()
+            return self._executor
+
+    def _new_executor(self):
+        return concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers or len(self._series))
+
+    def _swap_executor(self, executor):
+        """
+        swap in the fan out threads, the calls already submitted
+        finish before the old threads shut down.
+        :param executor: ThreadPoolExecutor or None
+        """
+        with self._routing:
+            executor, self._executor = self._executor, executor
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def close(self):
+        """
+        shutdown the fan out threads
+        """
+        self._swap_executor(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _get_node(self, name):
+        if self._next_ring is not None and name in self._moved:
+            return self._next_ring.get_node(name)
+        return self.ring.get_node(name)
+
+    def get_series(self, name):
+        """
+        the time-series instance of the node stores the key
+        :param name: redis key
+        :return: time-series instance
+        """
+        with self._routing:
+            return self._series[self._get_node(name)]
+
+    @contextlib.contextmanager
+    def _routed(self, names):
+        """
+        hold the keys on their nodes while the operation runs,
+        the rebalance doesn't move the keys until the operation is done.
+        :param names: iterable, redis keys
+        :return: dict, {node: [name,...]}
+        """
+        names = list(names)
+        with self._routing:
+            self._routing.wait_for(lambda: not self._paused and self._moving.isdisjoint(names))
+            self._active.update(names)
+            groups = {}
+            for name in names:
+                groups.setdefault(self._get_node(name), []).append(name)
+        try:
+            yield groups
+        finally:
+            with self._routing:
+                self._active -= collections.Counter(names)
+                self._routing.notify_all()
+
+    def _call(self, method, name, *args, **kwargs):
+        with self._routed([name]) as groups:
+            node, = groups
+            return getattr(self._series[node], method)(name, *args, **kwargs)
+
+    def _fan_out(self, func, node_args):
+        """
+        call the function of each node in parallel threads
+        :param func: function, func(time-series instance, args)
+        :param node_args: dict, {node: args}
+        :return: dict, {node: result}
+        """
+        # submit under the lock, the executor is never shut down between
+        with self._routing:
+            executor = self.executor
+            futures = {node: executor.submit(func, self._series[node], args)
+                       for node, args in node_args.items()}
+        return {node: future.result() for node, future in futures.items()}
+
+    # **************** single key ****************
+
+    def add(self, name, *args, **kwargs):
+        """
+        add one time-series data into the node of the key
+        """
+        return self._call("add", name, *args, **kwargs)
+
+    def add_many(self, name, *args, **kwargs):
+        """
+        add large amount of data into the node of the key
+        """
+        return self._call("add_many", name, *args, **kwargs)
+
+    def get(self, name, timestamp):
+        """
+        get one item by timestamp from the node of the key
+        """
+        return self._call("get", name, timestamp)
+
+    def get_slice(self, name, *args, **kwargs):
+        """
+        return a slice from the node of the key
+        """
+        return self._call("get_slice", name, *args, **kwargs)
+
+    def delete(self, name, start_timestamp=None, end_timestamp=None):
+        """
+        delete the key or the elements between the timestamps from the node of the key
+        """
+        return self._call("delete", name, start_timestamp, end_timestamp)
+
+    def trim(self, name, length):
+        """
+        trim the key in the node of the key
+        """
+        return self._call("trim", name, length)
+
+    def length(self, name):
+        """
+        the time-series length of the key
+        """
+        return self._call("length", name)
+
+    def count(self, name, start_timestamp=None, end_timestamp=None):
+        """
+        the number of elements between the timestamps of the key
+        """
+        return self._call("count", name, start_timestamp, end_timestamp)
+
+    def exists(self, name):
+        """
+        exist key in the node of the key
+        """
+        return self._call("exists", name)
+
+    def iter(self, name, *args, **kwargs):
+        """
+        iterator all the time-series data of the key,
+        the pages are read lazily without holding the key against the rebalance
+        """
+        return self.get_series(name).iter(name, *args, **kwargs)
+
+    def iter_slice(self, name, *args, **kwargs):
+        """
+        iterator a slice of the key by the pages in order,
+        the pages are read lazily without holding the key against the rebalance
+        """
+        return self.get_series(name).iter_slice(name, *args, **kwargs)
+
+    # **************** many keys ****************
+
+    def add_many_keys(self, mapping, **kwargs):
+        """
+        add the data of many keys, each node writes its keys in parallel threads
+        :param mapping: dict, {name: array,...}
+        :param kwargs: the parameters of `add_many_keys`
+        """
+        with self._routed(mapping) as groups:
+            node_mapping = {node: {name: mapping[name] for name in names} for node, names in groups.items()}
+            self._fan_out(lambda series, node_data: series.add_many_keys(node_data, **kwargs), node_mapping)
+
+    def get_slice_many(self, names, start_timestamp=None, end_timestamp=None, limit=None, asc=True):
+        """
+        return the slices of many keys, each node reads its keys in parallel threads
+        :param names: iterable, redis keys
+        :return: dict, {name: slice,...}
+        """
+
+        def get_slices(series, node_names):
+            return {name: series.get_slice(name, start_timestamp, end_timestamp, limit, asc)
+                    for name in node_names}
+
+        results = {}
+        with self._routed(names) as groups:
+            for node_results in self._fan_out(get_slices, groups).values():
+                results.update(node_results)
+        return results
+
+    def remove_many(self, names, start_timestamp=None, end_timestamp=None):
+        """
+        remove many keys, each node removes its keys in parallel threads
+        :param names: iterable, redis keys
+        :param start_timestamp: float, start timestamp
+        :param end_timestamp: float, end timestamp
+        """
+        with self._routed(names) as groups:
+            self._fan_out(lambda series, node_names: series.remove_many(node_names, start_timestamp, end_timestamp),
+                          groups)
+
+    def iter_keys(self, count=None):
+        """
+        the time-series keys of all the nodes, the nodes are scanned in parallel threads
+        :param count: the number of the keys of each SCAN
+        :return: iter
+        """
+        results = self._fan_out(lambda series, _: list(series.iter_keys(count)),
+                                dict.fromkeys(self._series))
+        return itertools.chain.from_iterable(results.values())
+
+    def flush(self):
+        """
+        flush the database of all the nodes
+        """
+        self._fan_out(lambda series, _: series.flush(), dict.fromkeys(self._series))
+
+    # **************** rebalance ****************
+
+    def add_node(self, node, client):
+        """
+        add a node into the hash ring, move the keys now mapped
+        to the new node from the other nodes with DUMP and RESTORE.
+        :param node: str, node name
+        :param client: redis client or redis url
+        :return: int, the number of the moved keys
+        """
+        if node in self._series:
+            raise RedisTimeSeriesError("node {0} already exists".format(node))
+
+        self._add_series(node, client)
+        self._swap_executor(self._new_executor())  # resize the threads with the nodes
+
+        next_ring = copy.deepcopy(self.ring)
+        next_ring.add_node(node)
+        return self._rebalance(next_ring, [name for name in self._series if name != node])
+
+    def remove_node(self, node):
+        """
+        remove a node from the hash ring, move its keys to the other nodes.
+        :param node: str, node name
+        :return: int, the number of the moved keys
+        """
+        if len(self._series) == 1:
+            raise RedisTimeSeriesError("can't remove the last node")
+        next_ring = copy.deepcopy(self.ring)
+        next_ring.remove_node(node)
+        moved = self._rebalance(next_ring, [node])
+        del self._series[node]
+        self._swap_executor(self._new_executor())
+        return moved
+
+    def _rebalance(self, next_ring, source_nodes):
+        """
+        move the keys of the source nodes, which not belong to them on the next ring.
+        the keys are routed to their old nodes until moved, then the operations
+        pause for a last pass moving the keys created meanwhile, and the next ring takes over.
+        ! if the rebalance fails, the moved keys stay routed to their new nodes.
+        :param next_ring: HashRing, the hash ring after the rebalance
+        :param source_nodes: list, node names
+        :return: int, the number of the moved keys
+        """
+        with self._routing:
+            self._next_ring = next_ring
+        try:
+            # own threads, the fan out threads serve the operations the moves wait for
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(source_nodes)) as executor:
+                moved = sum(executor.map(lambda node: self._move_node_keys(node, next_ring), source_nodes))
+
+            with self._routing:
+                self._paused = True
+                self._routing.wait_for(lambda: not self._active)
+            moved += sum(self._move_node_keys(node, next_ring) for node in source_nodes)
+
+            with self._routing:
+                self.ring = next_ring
+                self._next_ring = None
+                self._moved.clear()
+        finally:
+            with self._routing:
+                self._paused = False
+                self._routing.notify_all()
+        return moved
+
+    def _move_node_keys(self, node, next_ring):
+        """
+        move the keys of the node to their node of the next ring by chunks
+        :return: int, the number of the moved keys
+        """
+        series = self._series[node]
+        moves = {}
+        for name in series.iter_keys():
+            target = next_ring.get_node(name)
+            if target != node:
+                moves.setdefault(target, []).append(name)
+
+        for target, names in moves.items():
+            for chunk_names in ttseries.utils.chunks(names, self.move_chunk_size):
+                self._move_chunk(series, self._series[target], chunk_names)
+        return sum(len(names) for names in moves.values())
+
+    def _move_chunk(self, source, target, names):
+        """
+        move one chunk of keys, the operations of the keys wait until moved
+        """
+        with self._routing:
+            self._moving.update(names)
+            self._routing.wait_for(lambda: not any(self._active[name] for name in names))
+        try:
+            self._move_keys(source, target, names)
+            with self._routing:
+                self._moved.update(names)
+        finally:
+            with self._routing:
+                self._moving.difference_update(names)
+                self._routing.notify_all()
+
+    @staticmethod
+    def _move_keys(source, target, names):
+        """
+        move the storage keys of the time-series with DUMP and RESTORE,
+        the source keys are deleted after restored into the target node.
+        no operation writes the keys meanwhile, the target keys are replaced.
+        :param source: time-series instance
+        :param target: time-series instance
+        :param names: list, redis keys
+        """
+        storage_keys = list(itertools.chain.from_iterable(source._storage_keys(name) for name in names))
+
+        pipe = source.client.pipeline(transaction=False)
+        for key in storage_keys:
+            pipe.dump(key)
+            pipe.pttl(key)
+        results = pipe.execute()
+
+        pipe = target.client.pipeline(transaction=False)
+        for key, dumps, ttl in zip(storage_keys, results[0::2], results[1::2]):
+            if dumps is not None:
+                pipe.restore(key, max(ttl, 0), dumps, replace=True)
+        pipe.execute()
+
+        source.client.delete(*storage_keys)
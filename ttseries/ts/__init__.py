@@ -1,4 +1,5 @@
 # encoding:utf-8
+from .chunked import RedisChunkedTimeSeries
 from .hash import RedisHashTimeSeries
 from .numpy import RedisNumpyTimeSeries
 from .pandas import RedisPandasTimeSeries
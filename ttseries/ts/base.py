@@ -1,15 +1,18 @@
 # encoding:utf-8
+import concurrent.futures
 import contextlib
 import functools
 import threading
-from operator import itemgetter
 
 import numpy
 import redis
+import redis.asyncio.cluster
+import redis.cluster
 
 import ttseries.utils
 from ttseries import serializers
-from ttseries.exceptions import SerializerError, RedisTimeSeriesError
+from ttseries.exceptions import SerializerError, RedisTimeSeriesError, ChunkWriteError
+from ttseries.ts import replies, scripts
 
 
 class RedisTSBase(object):
@@ -32,22 +35,35 @@ class RedisTSBase(object):
     the max or end timestamp could be `10`
     """
 
-    # todo support redis cluster
-    # todo support parllizem and multi threading
+    conflict_policies = ("error", "skip", "replace")
+    cluster_clients = (redis.cluster.RedisCluster, redis.asyncio.cluster.RedisCluster)
+    iter_batch_size = 1000  # the number of the scanned items deserialized at once by `iter`
+
     # todo implement auto moving windows
 
     def __init__(self, redis_client, max_length=100000, transaction=True,
-                 serializer_cls=serializers.MsgPackSerializer):
+                 serializer_cls=serializers.MsgPackSerializer, cluster=None, lock_stripes=64):
         """
         :param redis_client: redis client instance, only test with redis-py client.
         :param max_length: int, max length of data to store the time-series data.
         :param transaction: bool, to ensure all the add or delete commands can be executed atomically
         :param serializer_cls: serializer class, serializer the data
+        :param cluster: bool, redis cluster mode, the keys of one time-series share
+            one hash slot with hash tags. None detects with the redis client type.
+        :param lock_stripes: int, the number of the locks shared by the series names,
+            the threads write different series rarely wait for each other.
         """
         self._redis_client = redis_client
         self.max_length = max_length
         self.transaction = transaction
-        self._lock = threading.RLock()
+        if cluster is None:
+            cluster = isinstance(redis_client, self.cluster_clients)
+        self.cluster = cluster
+        self._locks = ttseries.utils.StripedLock(lock_stripes)
+        self._local = threading.local()  # the pipelines of each thread
+        self._stats_lock = threading.Lock()
+        self._watch_stats = {"transactions": 0, "conflicts": 0, "max_retries": 0}
+        self._scripts = {}
 
         if issubclass(serializer_cls, serializers.BaseSerializer):
             self._serializer = serializer_cls()
@@ -63,13 +79,71 @@ class RedisTSBase(object):
         """
         return self._redis_client
 
+    def _script(self, lua):
+        """
+        register the lua script with redis client once, the script
+        executes with EVALSHA and reloads itself if missing in the server cache.
+        :param lua: str, lua script source
+        :return: redis.client.Script
+        """
+        script = self._scripts.get(lua)
+        if script is None:
+            script = self._scripts[lua] = self.client.register_script(lua)
+            if isinstance(self.client, redis.cluster.RedisCluster):
+                # cluster pipelines never reload the missing scripts, load into all the primaries
+                self.client.script_load(lua)
+        return script
+
+    def _key_lock(self, name):
+        """
+        the lock of the series name, shared with the names of the same stripe
+        :param name: redis key
+        :return: threading.RLock
+        """
+        return self._locks.get(name)
+
     @contextlib.contextmanager
-    def _pipe_acquire(self):
+    def _pipe_acquire(self, transaction=None):
         """
-        redis pipeline
+        redis pipeline of the current thread, the pipeline object is reused
+        by the later calls of the thread and reset after each use.
+        a nested call gets another pipeline.
+        :param transaction: bool, default with the `transaction` attribute
         :return:
         """
-        yield self.client.pipeline(transaction=self.transaction)
+        if transaction is None:
+            transaction = self.transaction
+        pipes = getattr(self._local, "pipes", None)
+        if pipes is None:
+            pipes = self._local.pipes = {}
+
+        pipe = pipes.pop(transaction, None)
+        if pipe is None:
+            pipe = self.client.pipeline(transaction=transaction)
+        try:
+            yield pipe
+        finally:
+            pipe.reset()
+            pipes[transaction] = pipe
+
+    @property
+    def watch_stats(self):
+        """
+        the counters of the WATCH transactions of `transaction_pipe`
+        :return: dict, {"transactions": executed transactions,
+            "conflicts": WATCH conflicts, "max_retries": the max retries of one transaction}
+        """
+        with self._stats_lock:
+            return dict(self._watch_stats)
+
+    def _record_transaction(self, retries):
+        """
+        :param retries: int, the WATCH conflicts of one executed transaction
+        """
+        with self._stats_lock:
+            self._watch_stats["transactions"] += 1
+            self._watch_stats["conflicts"] += retries
+            self._watch_stats["max_retries"] = max(self._watch_stats["max_retries"], retries)
 
     def flush(self):
         """
@@ -147,13 +221,23 @@ class RedisTSBase(object):
         Convenience callable `func` as executable in a
         transaction while watching all keys specified in `watches`.
         The 'func' callable should expect a Pipeline object as its first argument.
+
+        the threads write the same series wait on the lock of the first watch key,
+        so they don't retry on the WATCH conflicts of each other,
+        the threads write different series go on concurrently.
         :param pipe_func: function
         :param watch_keys: redis watch keys
         :param args:
         :param kwargs:
         :return:
         """
-        with self._lock, self._pipe_acquire() as pipe:
+        if isinstance(watch_keys, str):
+            watch_keys = (watch_keys,)
+
+        lock = self._key_lock(watch_keys[0]) if watch_keys else contextlib.nullcontext()
+
+        with lock, self._pipe_acquire() as pipe:
+            retries = 0
             while True:
                 try:
                     if watch_keys:
@@ -164,13 +248,70 @@ class RedisTSBase(object):
                     if callable(pipe_func):
                         pipe_func(pipe, *args, **kwargs)
 
-                    return pipe.execute()
+                    results = pipe.execute()
+                    self._record_transaction(retries)
+                    return results
 
                 except redis.exceptions.WatchError:
+                    retries += 1
                     continue
                 finally:
                     pipe.reset()
 
+    def _delete_keys(self, keys):
+        """
+        delete the keys, in cluster mode group the keys by the hash slot
+        and send one DEL command of each slot in one pipeline.
+        :param keys: list, redis keys
+        """
+        if not self.cluster:
+            return self.client.delete(*keys)
+
+        with self._pipe_acquire(transaction=False) as pipe:
+            for group_keys in self._group_slots(keys):
+                pipe.delete(*group_keys)
+            return sum(pipe.execute())
+
+    @staticmethod
+    def _group_slots(keys):
+        """
+        :param keys: list, redis keys
+        :return: list, [[key,...],...] the keys of each hash slot
+        """
+        slot_keys = {}
+        for key in keys:
+            slot_keys.setdefault(ttseries.utils.key_slot(key), []).append(key)
+        return list(slot_keys.values())
+
+    def _scan_iter(self, match=None, count=None):
+        """
+        iterator the keys of the redis server,
+        with redis cluster client scan each primary node in parallel threads.
+        :param match: str, the pattern of the keys
+        :param count: int, the number of keys of each SCAN
+        :return: iter, keys
+        """
+        if not isinstance(self.client, redis.cluster.RedisCluster):
+            yield from self.client.scan_iter(match=match, count=count)
+            return
+
+        def scan_node(node):
+            return list(node.redis_connection.scan_iter(match=match, count=count))
+
+        nodes = self.client.get_primaries()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(nodes)) as executor:
+            futures = [executor.submit(scan_node, node) for node in nodes]
+            for future in concurrent.futures.as_completed(futures):
+                yield from future.result()
+
+    def _storage_keys(self, name):
+        """
+        all the redis keys store the time-series
+        :param name: redis key
+        :return: list
+        """
+        return [name]
+
     def _validate_key(self, name):
         """
         validate redis key can't contains specific names
@@ -179,28 +320,93 @@ class RedisTSBase(object):
         if ":HASH" in name or ":ID" in name:
             raise RedisTimeSeriesError("Key can't contains `:HASH`, `:ID` values.")
 
-    def _timestamp_exist(self, name, array):
+    def _timestamp_exist(self, name, timestamps):
         """
-        :param name:
-        :param array: already sorted array list
+        check the timestamps exist in redis sorted sets,
+        only compare the scores, never fetch and deserialize the stored data.
+
+        if the overlapping range holds fewer items than the timestamps,
+        fetch the overlapping scores, or else check each timestamp in redis server,
+        so the transfer is bounded by the smaller side.
+        :param name: redis key
+        :param timestamps: numpy.ndarray, already sorted float64 timestamps
+        :raise RedisTimeSeriesError
         """
+        if timestamps.size == 0:
+            return
 
-        end_timestamp = array[-1][0]  # max
-        start_timestamp = array[0][0]  # min
+        start_timestamp = float(timestamps[0])  # min
+        end_timestamp = float(timestamps[-1])  # max
 
         exist_length = self.count(name, start_timestamp, end_timestamp)
 
-        if exist_length > 0:
+        if exist_length == 0:
+            return
 
-            timestamp_array = numpy.fromiter((item[0] for item in array), numpy.float64)
+        if exist_length <= timestamps.size:
+            scores = self._script(scripts.RANGE_SCORES)(keys=[name],
+                                                        args=[start_timestamp, end_timestamp])
+            duplicated = numpy.intersect1d(timestamps, numpy.array(scores, dtype=numpy.float64))
+            if duplicated.size > 0:
+                raise RedisTimeSeriesError("add duplicated timestamp into redis -> "
+                                           "timestamp: {0}".format(duplicated[0]))
+        else:
+            with self._pipe_acquire(transaction=False) as pipe:
+                self._pipe_timestamps_exist(pipe, name, timestamps)
+                self._check_timestamps_exist(pipe.execute())
 
-            data_array = self.get_slice(name, start_timestamp, end_timestamp)
-            filter_timestamp_array = numpy.fromiter((item[0] for item in data_array), numpy.float64)
+    def _pipe_timestamps_exist(self, pipe, name, timestamps):
+        """
+        queue the lua script calls to check each timestamp exist in redis server
+        :param pipe: redis pipeline
+        :param name: redis key
+        :param timestamps: numpy.ndarray, float64 timestamps
+        """
+        script = self._script(scripts.TIMESTAMPS_EXIST)
+        for chunk_timestamps in ttseries.utils.chunks(timestamps.tolist(), 10000):
+            script(keys=[name], args=chunk_timestamps, client=pipe)
 
-            duplicated = numpy.intersect1d(timestamp_array, filter_timestamp_array)
+    def _check_timestamps_exist(self, results):
+        """
+        :param results: the pipeline results of the timestamps exist lua script calls
+        :raise RedisTimeSeriesError
+        """
+        for duplicated in results:
+            if duplicated:
+                raise RedisTimeSeriesError("add duplicated timestamp into redis -> "
+                                           "timestamp: {0}".format(duplicated.decode("utf-8")))
 
-            if duplicated.size > 0:
-                raise RedisTimeSeriesError("add duplicated timestamp into redis -> timestamp:")
+    def _sort_array(self, array, assume_sorted=False):
+        """
+        sort the array with timestamps as the asc and check timestamp repeated
+        :param array: data pairs, [("timestamp",data)...]
+        :param assume_sorted: bool, the array already sorted, skip to sort it
+        :return: tuple, (sorted array, float64 timestamps)
+        :raise RepeatedValueError
+        """
+        timestamp_pairs, timestamps = ttseries.utils.sort_timestamp_pairs(array, assume_sorted)
+        ttseries.utils.check_timestamps_repeated(timestamps)
+        return timestamp_pairs, timestamps
+
+    def _validate_on_conflict(self, on_conflict):
+        """
+        validate the policy of the exist timestamp
+        :param on_conflict: str, "error", "skip" or "replace"
+        """
+        if on_conflict not in self.conflict_policies:
+            raise RedisTimeSeriesError("on_conflict must be one of "
+                                       "{0}".format(", ".join(self.conflict_policies)))
+
+    def _trim_array(self, array_data):
+        """
+        trim the array data with the limitation of max length, keep the latest data
+        :param array_data: array data
+        :return: trim array
+        """
+        array_length = len(array_data)
+        if array_length > self.max_length:
+            array_data = array_data[array_length - self.max_length:]
+        return array_data
 
     def _auto_trim_array(self, name, array_data):
         """
@@ -216,53 +422,272 @@ class RedisTSBase(object):
             trim_length = array_length + self.length(name) - self.max_length
             self.trim(name, trim_length)
 
-        if array_length > self.max_length:
-            array_data = array_data[array_length - self.max_length:]
-        return array_data
+        return self._trim_array(array_data)
 
-    def _add_many_validate_mixin(self, name, timestamp_pairs):
+    def _add_many_validate_mixin(self, name, timestamp_pairs, assume_sorted=False, on_conflict="error"):
         """
         validate keys
-        trim the array with max length
         check array timestamp repeated
+        trim the array with max length
+        check timestamp exist in redis
+
+        with the "skip" or "replace" conflict policy, the exist timestamps
+        and the max length are handled in redis server while inserting,
+        so only the array is trimmed here.
+        :param assume_sorted: bool, the timestamp pairs already sorted as the asc
+        :param on_conflict: str, "error", "skip" or "replace"
         :return:
         """
         self._validate_key(name)
+        self._validate_on_conflict(on_conflict)
+
+        # sort and check timestamp repeated
+        timestamp_pairs, timestamps = self._sort_array(timestamp_pairs, assume_sorted)
+
+        if on_conflict != "error":
+            return self._trim_array(timestamp_pairs)
 
-        timestamp_pairs = sorted(timestamp_pairs, key=itemgetter(0))
         # auto trim timestamps
         timestamp_pairs = self._auto_trim_array(name, timestamp_pairs)
-        # check timestamp repeated
-        ttseries.utils.check_array_repeated(timestamp_pairs)
+        timestamps = timestamps[timestamps.size - len(timestamp_pairs):]
         # validate timestamp exist
-        self._timestamp_exist(name, timestamp_pairs)
+        self._timestamp_exist(name, timestamps)
 
         return timestamp_pairs
 
+    def _add_many_keys_validate_mixin(self, mapping, assume_sorted=False, on_conflict="error"):
+        """
+        validate keys, sort and check timestamp repeated of each array,
+        trim the arrays with max length.
+        with the "error" conflict policy read the length and the overlapping count
+        of all the keys in one pipeline, and check the overlapping timestamps
+        of all the keys in redis server with one more pipeline.
+        :param mapping: dict, {name: [(timestamp, data),...],...}
+        :param assume_sorted: bool, the timestamp pairs already sorted as the asc
+        :param on_conflict: str, "error", "skip" or "replace"
+        :return: list, [(name, timestamp_pairs, trim_length),...]
+        """
+        self._validate_on_conflict(on_conflict)
+
+        prepared = []
+        for name, array in mapping.items():
+            self._validate_key(name)
+            timestamp_pairs, timestamps = self._sort_array(array, assume_sorted)
+            timestamp_pairs = self._trim_array(timestamp_pairs)
+            if len(timestamp_pairs):
+                prepared.append((name, timestamp_pairs, timestamps[timestamps.size - len(timestamp_pairs):]))
+
+        if on_conflict != "error":
+            # exist timestamps and max length are handled in redis server
+            return [(name, timestamp_pairs, 0) for name, timestamp_pairs, _ in prepared]
+
+        with self._pipe_acquire(transaction=False) as pipe:
+            for name, _, timestamps in prepared:
+                pipe.zcard(name)
+                pipe.zcount(name, min=float(timestamps[0]), max=float(timestamps[-1]))
+            results = pipe.execute()
+            lengths, exist_lengths = results[0::2], results[1::2]
+
+            for (name, _, timestamps), exist_length in zip(prepared, exist_lengths):
+                if exist_length > 0:
+                    self._pipe_timestamps_exist(pipe, name, timestamps)
+            self._check_timestamps_exist(pipe.execute())
+
+        return [(name, timestamp_pairs, max(len(timestamp_pairs) + length - self.max_length, 0))
+                for (name, timestamp_pairs, _), length in zip(prepared, lengths)]
+
+    def _dumps_pairs(self, timestamp_pairs):
+        """
+        serialize the data of one chunk with one batch call of the serializer
+        :param timestamp_pairs: [(timestamp, data),...]
+        :return: [(timestamp, serialized data),...]
+        """
+        return list(zip([timestamp for timestamp, _ in timestamp_pairs],
+                        self._serializer.dumps_many([data for _, data in timestamp_pairs])))
+
+    def _loads_columns(self, timestamps, values):
+        """
+        deserialize a slice into numpy columns with the `loads_columns` of the serializer
+        :param timestamps: list, float timestamps
+        :param values: list, serialized data
+        :return: tuple, (numpy.ndarray float64 timestamps, {name: numpy.ndarray,...})
+        """
+        loads_columns = getattr(self._serializer, "loads_columns", None)
+        if loads_columns is None:
+            raise RedisTimeSeriesError("the serializer doesn't support loads_columns")
+        return numpy.array(timestamps, dtype=numpy.float64), loads_columns(values)
+
+    def _execute_sized_pipe(self, pipe_funcs, pipeline_bytes):
+        """
+        queue the commands of many keys into shared pipelines,
+        execute the pipeline each time the queued payload reaches the pipeline bytes,
+        so the round trips are proportional to the bytes, not to the number of keys.
+        :param pipe_funcs: iterable, [(payload bytes, func(pipe)),...]
+        :param pipeline_bytes: int, the payload bytes of each pipeline
+        """
+        # the keys of many time-series are in different hash slots, no transaction in cluster mode
+        with self._pipe_acquire(transaction=self.transaction and not self.cluster) as pipe:
+            queued_bytes = 0
+            for payload_bytes, pipe_func in pipe_funcs:
+                pipe_func(pipe)
+                queued_bytes += payload_bytes
+                if queued_bytes >= pipeline_bytes:
+                    pipe.execute()
+                    queued_bytes = 0
+            if len(pipe):
+                pipe.execute()
+
+    def _validate_parallelism(self, parallelism):
+        """
+        :param parallelism: int, the number of the chunks written concurrently
+        :return: bool, write the chunks in parallel
+        """
+        if parallelism > 1 and self.transaction:
+            raise RedisTimeSeriesError("parallelism requires transaction=False")
+        return parallelism > 1
+
+    def _execute_parallel_chunks(self, pipe_funcs, parallelism):
+        """
+        execute each pipeline function on its own pipeline without MULTI/EXEC,
+        `parallelism` pipelines are sent concurrently over the pooled connections,
+        the next chunks are prepared while the former ones are in flight.
+
+        ! the chunks are not atomic as a whole, the chunks written before
+        or after a failed chunk stay in redis, nothing is rolled back.
+        :param pipe_funcs: iterable, [func(pipe),...] of each chunk
+        :param parallelism: int, the number of the chunks in flight
+        :raise ChunkWriteError: with the index and the exception of each failed chunk
+        """
+
+        def execute(pipe_func):
+            with self._pipe_acquire(transaction=False) as pipe:
+                pipe_func(pipe)
+                return pipe.execute()
+
+        errors = []
+        chunks = 0
+
+        def collect(futures):
+            for future in futures:
+                index = pending.pop(future)
+                if future.exception() is not None:
+                    errors.append((index, future.exception()))
+
+        pending = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=parallelism) as executor:
+            for index, pipe_func in enumerate(pipe_funcs):
+                pending[executor.submit(execute, pipe_func)] = index
+                chunks += 1
+                if len(pending) >= parallelism * 2:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    collect(done)
+            collect(list(pending))
+
+        if errors:
+            raise ChunkWriteError(sorted(errors, key=lambda item: item[0]), chunks)
+
     def _get_slice_mixin(self, name, start_timestamp=None,
-                         end_timestamp=None, limit=None, asc=True):
+                         end_timestamp=None, limit=None, asc=True, parser=replies.parse_slice):
         """
+        the reply is read without the `withscores` option of redis-py,
+        so redis-py never builds the (member, score) pairs, the parser
+        converts the scores into a float64 array with one numpy call.
         :param name:
         :param start_timestamp:
         :param end_timestamp:
         :param limit:
         :param asc:
-        :return:
+        :param parser: function, parse the raw reply, see `ttseries.ts.replies`
+        :return: the parsed reply, (members list, numpy.ndarray float64 timestamps) by default
         """
-        if asc:
-            zrange_func = self.client.zrangebyscore
-        else:  # desc
-            zrange_func = self.client.zrevrangebyscore
+        return parser(self.client.execute_command(*self._slice_command(name, start_timestamp, end_timestamp,
+                                                                       limit, asc),
+                                                  **{redis.client.NEVER_DECODE: True}))
 
+    def _slice_command(self, name, start_timestamp=None, end_timestamp=None, limit=None, asc=True):
+        """
+        :return: list, the arguments of the ZRANGEBYSCORE or ZREVRANGEBYSCORE command with the scores
+        """
         if start_timestamp is None:
             start_timestamp = "-inf"
         if end_timestamp is None:
             end_timestamp = "+inf"
 
-        if limit is None:
-            limit = -1
+        if asc:
+            args = ["ZRANGEBYSCORE", name, start_timestamp, end_timestamp, "WITHSCORES"]
+        else:
+            args = ["ZREVRANGEBYSCORE", name, end_timestamp, start_timestamp, "WITHSCORES"]
+        if limit is not None:
+            args.extend(["LIMIT", 0, limit])
+        return args
+
+    def get_slice_raw(self, name, start_timestamp=None,
+                      end_timestamp=None, limit=None, asc=True):
+        """
+        return a slice without deserialization, to forward the stored data as it is,
+        the serialized data is copied once into a packed buffer instead of deserialized into the objects.
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param limit: int, limit the length of the result data.
+        :param asc: bool, sorted as the timestamp values
+        :return: tuple, (numpy.ndarray float64 timestamps, bytes buffer of the serialized data,
+            numpy.ndarray int64 offsets), the data i is buffer[offsets[i]:offsets[i + 1]]
+        """
+        return self._get_slice_mixin(name, start_timestamp, end_timestamp, limit, asc,
+                                     parser=replies.parse_raw_slice)
+
+    def iter_slice(self, name, start_timestamp=None, end_timestamp=None, page_size=10000, asc=True):
+        """
+        iterator a slice by the pages in order, each page is read with a score
+        cursor after the last timestamp of the former page, the next page is
+        fetched by a background thread while the current page is processed,
+        so the memory is bounded by the page size instead of the range.
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param page_size: int, the number of the items of each page
+        :param asc: bool, sorted as the timestamp values
+        :return: iter, the pages as the result of `get_slice`
+        """
+        self._validate_page_size(page_size)
+        fetch = functools.partial(self._slice_page, name, limit=page_size, asc=asc)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(fetch, start_timestamp, end_timestamp)
+            while future is not None:
+                members, timestamps = future.result()
+                bounds = self._next_page_bounds(start_timestamp, end_timestamp, timestamps, page_size, asc)
+                future = executor.submit(fetch, *bounds) if bounds else None
+                if len(timestamps):
+                    yield self._loads_slice(members, timestamps)
+
+    def _slice_page(self, name, start_timestamp, end_timestamp, limit, asc):
+        """
+        read one page of `iter_slice`
+        :return: tuple, (serialized data list, numpy.ndarray float64 timestamps)
+        """
+        return self._get_slice_mixin(name, start_timestamp, end_timestamp, limit, asc)
 
-        return zrange_func(name, min=start_timestamp,
-                           max=end_timestamp,
-                           withscores=True,
-                           start=0, num=limit)
+    @staticmethod
+    def _validate_page_size(page_size):
+        """
+        :param page_size: int, the number of the items of each page
+        """
+        if not isinstance(page_size, int) or page_size <= 0:
+            raise RedisTimeSeriesError("page_size must be a positive integer")
+
+    @staticmethod
+    def _next_page_bounds(start_timestamp, end_timestamp, timestamps, page_size, asc):
+        """
+        the timestamps are unique in one time-series, the next page
+        starts after the last timestamp of the page exclusively.
+        :param timestamps: numpy.ndarray, float64 timestamps of the page
+        :return: tuple, (start timestamp, end timestamp) of the next page, None if it's the last page
+        """
+        if len(timestamps) < page_size:
+            return None
+        cursor = "(" + repr(float(timestamps[-1]))
+        if asc:
+            return cursor, end_timestamp
+        return start_timestamp, cursor
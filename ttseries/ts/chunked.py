@@ -0,0 +1,827 @@
+# encoding:utf-8
+import struct
+import threading
+
+import numpy as np
+import redis
+
+import ttseries.utils
+from ttseries.exceptions import RedisTimeSeriesError
+from ttseries.ts import gorilla, scripts
+from ttseries.ts.base import RedisTSBase
+
+# the head point, int64 microseconds timestamp and float64 value
+HEAD_RECORD = struct.Struct("<qd")
+HEAD_DTYPE = np.dtype([("timestamp", "<i8"), ("value", "<f8")])
+
+
+class RedisChunkedTimeSeries(RedisTSBase):
+    """
+    Redis Time-series storage of float values in compressed blocks.
+
+    the points are grouped into blocks by time windows of `block_span` seconds,
+    each block is compressed with delta-of-delta timestamps and XOR-ed float values
+    (see `ttseries.ts.gorilla`) and stored as one member scored by its window start.
+    the new points are appended into an uncompressed head, `compact` seals
+    the head points of the past windows into the blocks.
+
+    sorted sets [(window start, block),...]
+    head sorted sets [(timestamp, timestamp and value),...]
+    count string, the number of the points of the blocks
+
+    the timestamps are kept with microsecond precision, a point added into a
+    sealed time window is merged into its block, so the head never repeats a
+    sealed timestamp. the max length is trimmed by whole blocks, the oldest
+    block is removed only if the remaining points are not fewer than the max
+    length, the oldest head points are trimmed only if there is no block left.
+    """
+    head_format = "{key}:HEAD"  # the uncompressed head
+    count_format = "{key}:COUNT"  # the points count of the blocks
+    PAGE_BLOCKS = 16  # the number of the blocks read at once by `iter_slice`
+
+    # in redis cluster mode, hash tags keep the keys of one time-series in one hash slot
+    cluster_head_format = "{{{key}}}:HEAD"
+    cluster_count_format = "{{{key}}}:COUNT"
+
+    def __init__(self, redis_client, max_length=100000, block_span=3600, *args, **kwargs):
+        """
+        :param block_span: float, the seconds of the time window of each block
+        :param args:
+        :param kwargs:
+        """
+        super(RedisChunkedTimeSeries, self).__init__(redis_client=redis_client,
+                                                     max_length=max_length, *args, **kwargs)
+        if block_span <= 0:
+            raise RedisTimeSeriesError("block_span must be greater than 0")
+        self.block_span = block_span
+        self._span = int(round(block_span * 1e6))  # microseconds
+
+        self._compactor = None
+        self._compactor_stop = threading.Event()
+        self.compaction_stats = {"runs": 0, "sealed_points": 0, "errors": 0, "last_error": None}
+
+    def _head_key(self, name):
+        """
+        :param name: redis key
+        :return: str, the head key of the time-series
+        """
+        if self.cluster and not ttseries.utils.has_hash_tag(name):
+            return self.cluster_head_format.format(key=name)
+        return self.head_format.format(key=name)
+
+    def _count_key(self, name):
+        """
+        :param name: redis key
+        :return: str, the key of the points count of the blocks
+        """
+        if self.cluster and not ttseries.utils.has_hash_tag(name):
+            return self.cluster_count_format.format(key=name)
+        return self.count_format.format(key=name)
+
+    def _series_name(self, head_key):
+        """
+        the time-series name of the head key
+        :param head_key: str
+        :return: str
+        """
+        name = head_key[:-len(":HEAD")]
+        if self.cluster and name.startswith("{") and name.find("}") == len(name) - 1:
+            return name[1:-1]
+        return name
+
+    def _storage_keys(self, name):
+        """
+        :param name: redis key
+        :return: list, the blocks, the head and the count keys
+        """
+        return [name, self._head_key(name), self._count_key(name)]
+
+    def _validate_key(self, name):
+        """
+        the key can't contains `:HEAD` or `:COUNT` either
+        :param name:
+        """
+        super(RedisChunkedTimeSeries, self)._validate_key(name)
+        if ":HEAD" in name:
+            raise RedisTimeSeriesError("Key can't contains `:HEAD` values.")
+        if ":COUNT" in name:
+            raise RedisTimeSeriesError("Key can't contains `:COUNT` values.")
+        if self.cluster and name.startswith("{") and name.find("}") == len(name) - 1:
+            raise RedisTimeSeriesError("Key can't be a whole hash tag in cluster mode.")
+
+    # **************** points ****************
+
+    def _window(self, timestamps):
+        """
+        :param timestamps: int or numpy.ndarray, microseconds
+        :return: the microseconds start of the time window
+        """
+        return timestamps - timestamps % self._span
+
+    @staticmethod
+    def _values_array(values, count):
+        """
+        :param values: iterable, float values
+        :param count: int
+        :return: numpy.ndarray float64
+        """
+        try:
+            return np.fromiter(values, np.float64, count=count)
+        except (TypeError, ValueError):
+            raise RedisTimeSeriesError("RedisChunkedTimeSeries only stores float values")
+
+    @staticmethod
+    def _loads_points(blocks, head):
+        """
+        decode the blocks and the head points,
+        the head point replaces the block point of the same timestamp.
+        :param blocks: list, encoded blocks
+        :param head: list, head members
+        :return: tuple, (sorted int64 microseconds timestamps, float64 values)
+        """
+        parts = [gorilla.decode_block(block) for block in blocks]
+        if head:
+            records = np.frombuffer(b"".join(head), dtype=HEAD_DTYPE)
+            parts.append((records["timestamp"], records["value"]))
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        timestamps = np.concatenate([timestamps for timestamps, _ in parts])
+        values = np.concatenate([values for _, values in parts])
+        return RedisChunkedTimeSeries._unique_last(timestamps, values)
+
+    @staticmethod
+    def _unique_last(timestamps, values):
+        """
+        sort the points, keep the last one of the same timestamps
+        :return: tuple, (timestamps, values)
+        """
+        order = np.argsort(timestamps, kind="mergesort")
+        timestamps, values = timestamps[order], values[order]
+        keep = np.append(timestamps[1:] != timestamps[:-1], True)
+        return timestamps[keep], values[keep]
+
+    def _merge_points(self, timestamps, values, new_timestamps, new_values, on_conflict):
+        """
+        :param on_conflict: str, the policy of the exist timestamps, "error", "skip" or "replace"
+        :return: tuple, (timestamps, values)
+        """
+        duplicated = np.isin(new_timestamps, timestamps)
+        if duplicated.any():
+            if on_conflict == "error":
+                raise RedisTimeSeriesError("add duplicated timestamp into redis -> "
+                                           "timestamp: {0}".format(new_timestamps[duplicated][0] / 1e6))
+            if on_conflict == "skip":
+                new_timestamps, new_values = new_timestamps[~duplicated], new_values[~duplicated]
+        return self._unique_last(np.concatenate((timestamps, new_timestamps)),
+                                 np.concatenate((values, new_values)))
+
+    # **************** blocks ****************
+
+    def _pipe_write_blocks(self, pipe, name, old_blocks, timestamps, values, removed_points=0):
+        """
+        replace the old blocks with the points encoded by the time windows,
+        update the points count of the blocks and trim the oldest blocks with max length.
+        :param pipe: redis pipeline
+        :param name: redis key
+        :param old_blocks: list, the encoded blocks to remove
+        :param timestamps: numpy.ndarray, sorted int64 microseconds
+        :param values: numpy.ndarray, float64
+        :param removed_points: int, the points of the other blocks removed by the caller
+        """
+        count_change = len(timestamps) - removed_points - sum(map(gorilla.block_count, old_blocks))
+        if old_blocks:
+            pipe.zrem(name, *old_blocks)
+
+        if len(timestamps):
+            windows = self._window(timestamps)
+            bounds = np.flatnonzero(np.append(True, windows[1:] != windows[:-1])).tolist() + [len(windows)]
+            mapping = {}
+            for begin, end in zip(bounds[:-1], bounds[1:]):
+                block = gorilla.encode_block(timestamps[begin:end].tolist(), values[begin:end])
+                mapping[block] = int(windows[begin]) / 1e6
+            pipe.zadd(name, mapping)
+
+        self._script(scripts.CHUNKED_TRIM)(keys=self._storage_keys(name),
+                                           args=[self.max_length, count_change], client=pipe)
+
+    def _rewrite(self, name, prepare):
+        """
+        read and rewrite the blocks and the head of the time-series atomically,
+        `prepare(pipe)` reads with the pipeline watching the keys, and returns
+        a function queues the writes into the transaction, or None if nothing to write.
+        :param name: redis key
+        :param prepare: function
+        :return: the result of the transaction
+        """
+        watch_keys = self._storage_keys(name)
+
+        with self._key_lock(name), self._pipe_acquire(transaction=True) as pipe:
+            retries = 0
+            while True:
+                try:
+                    for key in watch_keys:
+                        pipe.watch(key)
+                    pipe_func = prepare(pipe)
+                    if pipe_func is None:
+                        return None
+                    pipe.multi()
+                    pipe_func(pipe)
+
+                    results = pipe.execute()
+                    self._record_transaction(retries)
+                    return results
+
+                except redis.exceptions.WatchError:
+                    retries += 1
+                    continue
+                finally:
+                    pipe.reset()
+
+    def _read_range(self, name, start_timestamp=None, end_timestamp=None, blocks=None):
+        """
+        decode the blocks overlap the range, with the head points in the range
+        :param name: redis key
+        :param start_timestamp: float or str, "(" prefix excludes the timestamp
+        :param end_timestamp: float or str, "(" prefix excludes the timestamp
+        :param blocks: list, the encoded blocks already read, only the head points are read if given
+        :return: tuple, (sorted int64 microseconds timestamps, float64 values)
+        """
+        start, start_exclusive = _parse_bound(start_timestamp, "-inf")
+        end, end_exclusive = _parse_bound(end_timestamp, "+inf")
+
+        block_start = "-inf"
+        if np.isfinite(start):
+            block_start = self._window(int(round(start * 1e6))) / 1e6
+        end_bound = "+inf" if end_timestamp is None else end_timestamp
+
+        head_start = "-inf" if start_timestamp is None else start_timestamp
+        if blocks is None:
+            with self._pipe_acquire(transaction=False) as pipe:
+                pipe.zrangebyscore(name, block_start, end_bound)
+                pipe.zrangebyscore(self._head_key(name), head_start, end_bound)
+                blocks, head = pipe.execute()
+        else:
+            head = self.client.zrangebyscore(self._head_key(name), head_start, end_bound)
+
+        timestamps, values = self._loads_points(blocks, head)
+
+        mask = np.ones(len(timestamps), dtype=bool)
+        if np.isfinite(start):
+            start = int(round(start * 1e6))
+            mask &= timestamps > start if start_exclusive else timestamps >= start
+        if np.isfinite(end):
+            end = int(round(end * 1e6))
+            mask &= timestamps < end if end_exclusive else timestamps <= end
+        return timestamps[mask], values[mask]
+
+    # **************** write ****************
+
+    def add(self, name: str, timestamp: float, data, on_conflict="skip"):
+        """
+        append one point into the uncompressed head in one lua script call,
+        the point of a time window already sealed in a block is merged into
+        the decoded block instead, so the head never repeats a sealed timestamp.
+        :param name: redis key
+        :param timestamp: float
+        :param data: float
+        :param on_conflict: str, the policy of an exist timestamp,
+            "skip" ignores the data, "replace" overwrites the stored data,
+            "error" raises RedisTimeSeriesError
+        :return: int
+        """
+        self._validate_key(name)
+        self._validate_on_conflict(on_conflict)
+        timestamp_us = int(round(timestamp * 1e6))
+        try:
+            member = HEAD_RECORD.pack(timestamp_us, data)
+        except struct.error:
+            raise RedisTimeSeriesError("RedisChunkedTimeSeries only stores float values")
+
+        result = self._script(scripts.CHUNKED_ADD)(keys=self._storage_keys(name),
+                                                   args=[timestamp, member, self.max_length, on_conflict,
+                                                         self._window(timestamp_us) / 1e6])
+        if result == -2:
+            written = self._write_windows(name, np.array([timestamp_us], dtype=np.int64),
+                                          np.array([data], dtype=np.float64), on_conflict)
+            return 0 if written is None else 1
+        if result < 0:
+            if on_conflict == "error":
+                raise RedisTimeSeriesError("add duplicated timestamp into redis -> "
+                                           "timestamp: {0}".format(timestamp))
+            return 0
+        return result
+
+    def add_many(self, name, array: list, chunks_size=2000, assume_sorted=False, on_conflict="error"):
+        """
+        add large amount of data into the compressed blocks directly,
+        merge with the exist blocks and the head points of the same time windows.
+        :param name: redis key
+        :param array: data pairs, [(timestamp, float),...]
+        :param chunks_size: int, the points of each transaction, rounded up to whole time windows
+        :param assume_sorted: bool, the array already sorted as the timestamp asc, skip to sort it
+        :param on_conflict: str, the policy of the exist timestamps,
+            "error" raises RedisTimeSeriesError before insert any data,
+            "skip" ignores the data, "replace" overwrites the stored data
+        """
+        self._validate_key(name)
+        self._validate_on_conflict(on_conflict)
+
+        timestamp_pairs, timestamps = self._sort_array(array, assume_sorted)
+        timestamp_pairs = self._trim_array(timestamp_pairs)
+        if not len(timestamp_pairs):
+            return
+
+        timestamps = np.round(timestamps[len(timestamps) - len(timestamp_pairs):] * 1e6).astype(np.int64)
+        values = self._values_array((value for _, value in timestamp_pairs), len(timestamp_pairs))
+
+        if on_conflict == "error":
+            exist_timestamps, _ = self._read_range(name, timestamps[0] / 1e6, timestamps[-1] / 1e6)
+            self._merge_points(exist_timestamps, np.empty(len(exist_timestamps)),
+                               timestamps, values, on_conflict)
+
+        windows = self._window(timestamps)
+        bounds = np.flatnonzero(np.append(True, windows[1:] != windows[:-1])).tolist() + [len(windows)]
+
+        begin = 0
+        for end in bounds[1:]:
+            if end - begin >= chunks_size or end == len(windows):
+                self._write_windows(name, timestamps[begin:end], values[begin:end], on_conflict)
+                begin = end
+
+    def _write_windows(self, name, timestamps, values, on_conflict):
+        """
+        merge the points into the blocks of their time windows,
+        the head points of the windows are sealed together.
+        :param name: redis key
+        :param timestamps: numpy.ndarray, sorted int64 microseconds
+        :param values: numpy.ndarray, float64
+        :param on_conflict: str, "error", "skip" or "replace"
+        :return: the result of the transaction, None if all the points are skipped
+        """
+        head_key = self._head_key(name)
+        window_start = int(self._window(timestamps[0])) / 1e6
+        window_end = "({0!r}".format((int(self._window(timestamps[-1])) + self._span) / 1e6)
+
+        def prepare(pipe):
+            blocks = pipe.zrangebyscore(name, window_start, window_end)
+            head = pipe.zrangebyscore(head_key, window_start, window_end)
+            exist_timestamps, exist_values = self._loads_points(blocks, head)
+            if on_conflict == "skip" and np.isin(timestamps, exist_timestamps).all():
+                return None
+            merged = self._merge_points(exist_timestamps, exist_values, timestamps, values, on_conflict)
+
+            def pipe_func(_pipe):
+                if head:
+                    _pipe.zrem(head_key, *head)
+                self._pipe_write_blocks(_pipe, name, blocks, *merged)
+
+            return pipe_func
+
+        return self._rewrite(name, prepare)
+
+    def compact(self, name, force=False):
+        """
+        seal the head points into the compressed blocks, the head points
+        of the latest time window stay in the head unless `force` is True.
+        :param name: redis key
+        :param force: bool, seal all the head points
+        :return: int, the number of the sealed points
+        """
+        head_key = self._head_key(name)
+        sealed = []
+
+        def prepare(pipe):
+            head = pipe.zrange(head_key, 0, -1)
+            if not head:
+                return None
+            records = np.frombuffer(b"".join(head), dtype=HEAD_DTYPE)
+            windows = self._window(records["timestamp"])
+
+            mask = np.ones(len(records), dtype=bool)
+            if not force:
+                open_window = windows.max()
+                last_block = pipe.zrevrange(name, 0, 0, withscores=True)
+                if last_block:
+                    open_window = max(open_window, int(round(last_block[0][1] * 1e6)))
+                mask = windows < open_window
+            if not mask.any():
+                return None
+
+            seal_windows = np.unique(windows[mask])
+            window_set = set(seal_windows.tolist())
+            blocks = [block for block, score in
+                      pipe.zrangebyscore(name, seal_windows[0] / 1e6, seal_windows[-1] / 1e6, withscores=True)
+                      if int(round(score * 1e6)) in window_set]
+            timestamps, values = self._loads_points(blocks, [])
+            timestamps, values = self._merge_points(timestamps, values, records["timestamp"][mask],
+                                                    records["value"][mask], "replace")
+            head_members = [member for member, seal in zip(head, mask.tolist()) if seal]
+            sealed[:] = [len(head_members)]
+
+            def pipe_func(_pipe):
+                _pipe.zrem(head_key, *head_members)
+                self._pipe_write_blocks(_pipe, name, blocks, timestamps, values)
+
+            return pipe_func
+
+        self._rewrite(name, prepare)
+        return sealed[0] if sealed else 0
+
+    def compact_all(self, force=False, count=None):
+        """
+        compact all the time-series with the head points
+        :param force: bool, seal all the head points
+        :param count: int, the number of the keys of each SCAN
+        :return: int, the number of the sealed points
+        """
+        return sum(self.compact(self._series_name(head_key.decode("utf-8")), force)
+                   for head_key in self._scan_iter(match="*:HEAD", count=count))
+
+    def start_compaction(self, interval=60.0):
+        """
+        compact all the time-series in a background thread every interval seconds
+        :param interval: float, seconds
+        """
+        if self._compactor is not None:
+            raise RedisTimeSeriesError("compaction already started")
+        self._compactor_stop.clear()
+        self._compactor = threading.Thread(target=self._run_compaction, args=(interval,),
+                                           name="ttseries-compaction", daemon=True)
+        self._compactor.start()
+
+    def stop_compaction(self):
+        """
+        stop the background compaction, wait the running compaction to finish
+        """
+        if self._compactor is not None:
+            self._compactor_stop.set()
+            self._compactor.join()
+            self._compactor = None
+
+    def _run_compaction(self, interval):
+        while not self._compactor_stop.wait(interval):
+            try:
+                sealed = self.compact_all()
+            except Exception as e:
+                self.compaction_stats["errors"] += 1
+                self.compaction_stats["last_error"] = repr(e)
+                continue
+            self.compaction_stats["runs"] += 1
+            self.compaction_stats["sealed_points"] += sealed
+
+    # **************** delete ****************
+
+    def delete(self, name: str, start_timestamp=None, end_timestamp=None):
+        """
+        Removes all the points between start timestamp and end timestamp (inclusive),
+        the blocks overlap the range are rewritten.
+        if parameter only contains `name`, will delete all data stored in redis key.
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        """
+        head_key = self._head_key(name)
+
+        if not (start_timestamp or end_timestamp):
+            return self.client.delete(*self._storage_keys(name))
+
+        start, start_exclusive = _parse_bound(start_timestamp, "-inf")
+        end, end_exclusive = _parse_bound(end_timestamp, "+inf")
+        start_bound = "-inf" if start_timestamp is None else start_timestamp
+        end_bound = "+inf" if end_timestamp is None else end_timestamp
+        block_start = "-inf"
+        if np.isfinite(start):
+            block_start = self._window(int(round(start * 1e6))) / 1e6
+
+        def prepare(pipe):
+            blocks = pipe.zrangebyscore(name, block_start, end_bound)
+            timestamps, values = self._loads_points(blocks, [])
+
+            keep = np.zeros(len(timestamps), dtype=bool)
+            if np.isfinite(start):
+                start_us = int(round(start * 1e6))
+                keep |= timestamps <= start_us if start_exclusive else timestamps < start_us
+            if np.isfinite(end):
+                end_us = int(round(end * 1e6))
+                keep |= timestamps >= end_us if end_exclusive else timestamps > end_us
+
+            def pipe_func(_pipe):
+                _pipe.zremrangebyscore(head_key, min=start_bound, max=end_bound)
+                if not keep.all():
+                    self._pipe_write_blocks(_pipe, name, blocks, timestamps[keep], values[keep])
+
+            return pipe_func
+
+        self._rewrite(name, prepare)
+
+    def remove_many(self, names, start_timestamp=None, end_timestamp=None):
+        """
+        remove many keys with timestamp
+        ! if only parameter contains names, will directly delete redis key.
+        :param names: tuple, redis keys
+        :param start_timestamp: float, start timestamp
+        :param end_timestamp: float, end timestamp
+        """
+        for chunk_keys in ttseries.utils.chunks(names, 1000):
+            if start_timestamp or end_timestamp:
+                for name in chunk_keys:
+                    self.delete(name, start_timestamp, end_timestamp)
+            else:
+                self._delete_keys([key for name in chunk_keys for key in self._storage_keys(name)])
+
+    def trim(self, name: str, length: int):
+        """
+        trim the oldest length of the points, the oldest whole blocks are removed
+        by rank with the head points before them, only the block of the boundary
+        is decoded and re-encoded.
+        :param name: redis key
+        :param length: int, length
+        """
+        current_length = self.length(name)
+
+        if current_length > length > 0:
+            self._rewrite(name, lambda pipe: self._prepare_trim(pipe, name, length))
+        elif length >= current_length:
+            self.delete(name)
+
+    def _prepare_trim(self, pipe, name, length):
+        """
+        read the oldest blocks by pages until the block holds the boundary,
+        the head points older than a block are counted before the block.
+        :return: function, queues the writes of the trim
+        """
+        head_key = self._head_key(name)
+        head_length = pipe.zcard(head_key)
+        dropped = dropped_points = 0
+        boundary = None  # (block, the number of the oldest points to remove from it)
+
+        for block, window_start in self._oldest_blocks(pipe, name):
+            older = dropped_points
+            if head_length:
+                older += pipe.zcount(head_key, "-inf", "({0!r}".format(window_start))
+            count = gorilla.block_count(block)
+            if older + count > length:
+                if older < length:
+                    boundary = (block, length - older)
+                break
+            dropped += 1
+            dropped_points += count
+        head_points = length - dropped_points - (boundary[1] if boundary else 0)
+
+        def pipe_func(_pipe):
+            if dropped:
+                _pipe.zremrangebyrank(name, 0, dropped - 1)
+            if head_points:
+                _pipe.zremrangebyrank(head_key, 0, head_points - 1)
+            old_blocks, timestamps, values = [], np.empty(0, dtype=np.int64), np.empty(0)
+            if boundary:
+                old_blocks = [boundary[0]]
+                timestamps, values = gorilla.decode_block(boundary[0])
+                timestamps, values = timestamps[boundary[1]:], values[boundary[1]:]
+            self._pipe_write_blocks(_pipe, name, old_blocks, timestamps, values, dropped_points)
+
+        return pipe_func
+
+    def _oldest_blocks(self, pipe, name):
+        """
+        :return: iter, [(block, window start),...] by pages from the oldest block
+        """
+        rank = 0
+        while True:
+            page = pipe.zrange(name, rank, rank + self.PAGE_BLOCKS - 1, withscores=True)
+            yield from page
+            if len(page) < self.PAGE_BLOCKS:
+                return
+            rank += self.PAGE_BLOCKS
+
+    # **************** read ****************
+
+    def length(self, name):
+        """
+        the number of the points in the blocks and the head, the points of
+        the blocks are kept by the count key as the blocks are written or trimmed,
+        the head points never repeat the timestamps of the blocks.
+        :param name: redis key
+        :return: int
+        """
+        return self._script(scripts.CHUNKED_LENGTH)(keys=self._storage_keys(name))
+
+    def count(self, name, start_timestamp: float = None, end_timestamp: float = None):
+        """
+        the number of the points between the timestamps,
+        the blocks overlap the range are decoded.
+        :param name: redis key
+        :param start_timestamp: float, start timestamp
+        :param end_timestamp: float, end timestamp
+        :return: int
+        """
+        timestamps, _ = self._read_range(name, start_timestamp, end_timestamp)
+        return len(timestamps)
+
+    def exists(self, name):
+        """
+        exist key in name
+        :param name: redis key
+        :return: bool
+        """
+        return self.client.exists(name, self._head_key(name)) > 0
+
+    def exist_timestamp(self, name, timestamp) -> bool:
+        """
+        :param name: redis key
+        :param timestamp: float
+        :return: bool
+        """
+        return self.count(name, timestamp, timestamp) > 0
+
+    def max_timestamp(self, name):
+        """
+        :param name: key name
+        :return: tuple, (timestamp, data)
+        """
+        return self._edge_point(name, -1)
+
+    def min_timestamp(self, name):
+        """
+        :param name: key name
+        :return: tuple, (timestamp, data)
+        """
+        return self._edge_point(name, 0)
+
+    def _edge_point(self, name, index):
+        """
+        the first or the last point is in the first or the last block, or in the head
+        :param index: int, 0 or -1
+        :return: tuple, (timestamp, data)
+        """
+        with self._pipe_acquire(transaction=False) as pipe:
+            pipe.zrange(name, index, index)
+            pipe.zrange(self._head_key(name), index, index)
+            blocks, head = pipe.execute()
+
+        timestamps, values = self._loads_points(blocks, head)
+        if len(timestamps):
+            return timestamps[index] / 1e6, float(values[index])
+
+    def get(self, name: str, timestamp: float):
+        """
+        get one item by timestamp
+        :param name: redis key
+        :param timestamp: float, timestamp
+        :return: float
+        """
+        _, values = self._read_range(name, timestamp, timestamp)
+        if len(values):
+            return float(values[0])
+
+    def get_slice(self, name, start_timestamp=None,
+                  end_timestamp=None, limit=None, asc=True):
+        """
+        return a slice with timestamp pairs,
+        only the blocks overlap the range are decoded.
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param limit: int, limit the length of the result data.
+        :param asc: bool, sorted as the timestamp values
+        :return: [(timestamp,data),...]
+        """
+        timestamps, values = self._slice_points(name, start_timestamp, end_timestamp, limit, asc)
+        if len(timestamps):
+            return self._loads_slice(values, timestamps / 1e6)
+
+    def _loads_slice(self, values, timestamps):
+        """
+        :param values: numpy.ndarray, float64
+        :param timestamps: numpy.ndarray, float64 seconds
+        :return: [(timestamp,data),...]
+        """
+        return list(zip(timestamps.tolist(), values.tolist()))
+
+    def get_slice_raw(self, name, start_timestamp=None,
+                      end_timestamp=None, limit=None, asc=True):
+        """
+        return a slice without building the python objects of the points,
+        the data of each point is the 8 bytes of the little-endian float64 value.
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param limit: int, limit the length of the result data.
+        :param asc: bool, sorted as the timestamp values
+        :return: tuple, (numpy.ndarray float64 timestamps, bytes buffer of the values,
+            numpy.ndarray int64 offsets), the data i is buffer[offsets[i]:offsets[i + 1]]
+        """
+        timestamps, values = self._slice_points(name, start_timestamp, end_timestamp, limit, asc)
+        return (timestamps / 1e6, values.astype("<f8").tobytes(),
+                np.arange(len(values) + 1, dtype=np.int64) * 8)
+
+    def _slice_points(self, name, start_timestamp, end_timestamp, limit, asc, blocks=None):
+        """
+        :return: tuple, (numpy.ndarray int64 microseconds timestamps, numpy.ndarray float64 values)
+        """
+        timestamps, values = self._read_range(name, start_timestamp, end_timestamp, blocks)
+        if not asc:
+            timestamps, values = timestamps[::-1], values[::-1]
+        if limit is not None and limit >= 0:
+            timestamps, values = timestamps[:limit], values[:limit]
+        return timestamps, values
+
+    def _slice_page(self, name, start_timestamp, end_timestamp, limit, asc):
+        """
+        read one page of `iter_slice`, the blocks are read in order until the
+        blocks after the first one hold `limit` points, the range is narrowed to
+        the time windows of the read blocks, so only the blocks of the page are decoded.
+        :return: tuple, (numpy.ndarray float64 values, numpy.ndarray float64 timestamps)
+        """
+        start, _ = _parse_bound(start_timestamp, "-inf")
+        end, _ = _parse_bound(end_timestamp, "+inf")
+        block_start = self._window(int(round(start * 1e6))) / 1e6 if np.isfinite(start) else "-inf"
+        end_bound = "+inf" if end_timestamp is None else end_timestamp
+
+        blocks = []
+        points = 0
+        while points < limit:
+            if asc:
+                batch = self.client.zrangebyscore(name, block_start, end_bound, withscores=True,
+                                                  start=len(blocks), num=self.PAGE_BLOCKS)
+            else:
+                batch = self.client.zrevrangebyscore(name, end_bound, block_start, withscores=True,
+                                                     start=len(blocks), num=self.PAGE_BLOCKS)
+            for block, window_start in batch:
+                # the first block may be partly out of the range, such as after the cursor
+                if blocks:
+                    points += gorilla.block_count(block)
+                blocks.append(block)
+                if points >= limit:
+                    # the page ends with the time window of the block
+                    window_end = (int(round(window_start * 1e6)) + self._span) / 1e6
+                    if asc and window_end <= end:
+                        end_timestamp = "({0!r}".format(window_end)
+                    elif not asc and window_start > start:
+                        start_timestamp = window_start
+                    break
+            if len(batch) < self.PAGE_BLOCKS:
+                break
+
+        timestamps, values = self._slice_points(name, start_timestamp, end_timestamp, limit, asc, blocks)
+        return values, timestamps / 1e6
+
+    def iter_keys(self, count=None):
+        """
+        generator iterator all time-series keys
+        :param count: the number of the keys
+        :return: iter,
+        """
+        names = set()
+        for key in self._scan_iter(count=count):
+            key = key.decode("utf-8")
+            if key.endswith(":COUNT"):
+                continue  # the count key only exists with the blocks key
+            name = self._series_name(key) if key.endswith(":HEAD") else key
+            if name not in names:
+                names.add(name)
+                yield name
+
+    def iter(self, name, count=None):
+        """
+        iterator all the time-series data with redis key by pages of blocks,
+        the head points of the time windows of each page are merged in order.
+        :param name: redis key
+        :param count: int, the number of the blocks of each page
+        :return: iter, [(timestamp, data),...]
+        """
+        head_key = self._head_key(name)
+        count = count or 100
+
+        rank = 0
+        lower = "-inf"
+        while True:
+            blocks = self.client.zrange(name, rank, rank + count - 1, withscores=True)
+            if not blocks:
+                break
+            upper = (int(round(blocks[-1][1] * 1e6)) + self._span) / 1e6
+            head = self.client.zrangebyscore(head_key, lower, "({0!r}".format(upper))
+            timestamps, values = self._loads_points([block for block, _ in blocks], head)
+            yield from zip((timestamps / 1e6).tolist(), values.tolist())
+
+            rank += count
+            lower = upper
+
+        timestamps, values = self._loads_points([], self.client.zrangebyscore(head_key, lower, "+inf"))
+        yield from zip((timestamps / 1e6).tolist(), values.tolist())
+
+
+def _parse_bound(timestamp, default):
+    """
+    >>> _parse_bound("(10", "-inf")
+    ... (10.0, True)
+    :param timestamp: float, str or None, "(" prefix excludes the timestamp
+    :param default: str, "-inf" or "+inf"
+    :return: tuple, (float, exclusive)
+    """
+    if timestamp is None:
+        return float(default), False
+    if isinstance(timestamp, str) and timestamp.startswith("("):
+        return float(timestamp[1:]), True
+    return float(timestamp), False
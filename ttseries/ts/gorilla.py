@@ -0,0 +1,144 @@
+# encoding:utf-8
+"""
+the block codec of the compressed time-series, as described in
+Facebook's Gorilla paper, timestamps are encoded with delta-of-delta
+and float values are XOR-ed with the former value.
+
+timestamps are integer microseconds, so the delta-of-delta of a regular
+series is 0 and costs one bit, a repeated value costs one bit too.
+
+block layout: uint32 points count, int64 first timestamp, little-endian,
+followed by the big-endian bit stream padded with zeros.
+"""
+import struct
+
+import numpy as np
+
+HEADER = struct.Struct("<Iq")
+
+# (prefix, prefix bits, value bits) of the delta-of-delta buckets, 0 is encoded as "0"
+DOD_BUCKETS = ((0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12), (0b11110, 5, 32), (0b11111, 5, 64))
+# the number of the leading "1" of the prefix: value bits
+DOD_BITS = {1: 7, 2: 9, 3: 12, 4: 32, 5: 64}
+
+
+def encode_block(timestamps, values):
+    """
+    >>> encode_block([1537112691000000, 1537112692000000], [1.0, 1.5])
+    :param timestamps: list, sorted int microseconds timestamps
+    :param values: list, float values
+    :return: bytes
+    """
+    count = len(timestamps)
+    if count == 0:
+        raise ValueError("encode empty block")
+
+    value_bits = np.asarray(values, dtype=np.float64).view(np.uint64).tolist()
+    bits = [format(value_bits[0], "064b")]
+    write = bits.append
+
+    prev_timestamp = timestamps[0]
+    prev_delta = 0
+    prev_value = value_bits[0]
+    prev_leading = prev_trailing = -1
+
+    for index in range(1, count):
+        timestamp = timestamps[index]
+        delta = timestamp - prev_timestamp
+        dod = delta - prev_delta
+        if dod == 0:
+            write("0")
+        else:
+            for prefix, prefix_bits, size in DOD_BUCKETS:
+                if -(1 << (size - 1)) <= dod < (1 << (size - 1)):
+                    write(format(prefix, "0{0}b".format(prefix_bits)))
+                    write(format(dod & ((1 << size) - 1), "0{0}b".format(size)))
+                    break
+        prev_timestamp, prev_delta = timestamp, delta
+
+        value = value_bits[index]
+        xor = value ^ prev_value
+        if xor == 0:
+            write("0")
+        else:
+            leading = min(64 - xor.bit_length(), 31)
+            trailing = (xor & -xor).bit_length() - 1
+            if prev_leading >= 0 and leading >= prev_leading and trailing >= prev_trailing:
+                # the meaningful bits fit in the former window
+                size = 64 - prev_leading - prev_trailing
+                write("10")
+                write(format(xor >> prev_trailing, "0{0}b".format(size)))
+            else:
+                size = 64 - leading - trailing
+                write("11")
+                write(format(leading, "05b"))
+                write(format(size & 0b111111, "06b"))  # 64 is stored as 0
+                write(format(xor >> trailing, "0{0}b".format(size)))
+                prev_leading, prev_trailing = leading, trailing
+        prev_value = value
+
+    stream = "".join(bits)
+    stream += "0" * (-len(stream) % 8)
+    return HEADER.pack(count, timestamps[0]) + int(stream, 2).to_bytes(len(stream) // 8, "big")
+
+
+def decode_block(data):
+    """
+    :param data: bytes, encoded block
+    :return: tuple, (numpy.ndarray int64 microseconds timestamps, numpy.ndarray float64 values)
+    """
+    count, timestamp = HEADER.unpack_from(data)
+    payload = data[HEADER.size:]
+    stream = format(int.from_bytes(payload, "big"), "0{0}b".format(len(payload) * 8))
+
+    timestamps = [timestamp]
+    value = int(stream[:64], 2)
+    value_bits = [value]
+    pos = 64
+    delta = 0
+    leading = trailing = 0
+
+    for _ in range(count - 1):
+        if stream[pos] == "0":
+            pos += 1
+        else:
+            ones = 0
+            while ones < 5 and stream[pos] == "1":
+                ones += 1
+                pos += 1
+            if ones < 5:
+                pos += 1  # the ending "0" of the prefix
+            size = DOD_BITS[ones]
+            dod = int(stream[pos:pos + size], 2)
+            pos += size
+            if dod >= 1 << (size - 1):
+                dod -= 1 << size
+            delta += dod
+        timestamp += delta
+        timestamps.append(timestamp)
+
+        if stream[pos] == "0":
+            pos += 1
+        else:
+            if stream[pos + 1] == "1":
+                leading = int(stream[pos + 2:pos + 7], 2)
+                size = int(stream[pos + 7:pos + 13], 2) or 64
+                trailing = 64 - leading - size
+                pos += 13
+            else:
+                pos += 2
+            size = 64 - leading - trailing
+            value ^= int(stream[pos:pos + size], 2) << trailing
+            pos += size
+        value_bits.append(value)
+
+    return (np.array(timestamps, dtype=np.int64),
+            np.array(value_bits, dtype=np.uint64).view(np.float64))
+
+
+def block_count(data):
+    """
+    :param data: bytes, encoded block
+    :return: int, the number of the points in the block
+    """
+    return HEADER.unpack_from(data)[0]
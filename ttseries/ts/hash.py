@@ -1,8 +1,13 @@
 # encoding:utf-8
 
+import functools
 import itertools
 
+import redis
+
 import ttseries.utils
+from ttseries.exceptions import RedisTimeSeriesError
+from ttseries.ts import replies, scripts
 from ttseries.ts.base import RedisTSBase
 
 
@@ -21,23 +26,59 @@ class RedisHashTimeSeries(RedisTSBase):
     hash_format = "{key}:HASH"  # as the hash set id
     incr_format = "{key}:ID"  # as the auto increase id
 
-    def _auto_trim(self, name, key_id, hash_key):
+    # in redis cluster mode, hash tags keep the keys of one time-series in one hash slot
+    cluster_hash_format = "{{{key}}}:HASH"
+    cluster_incr_format = "{{{key}}}:ID"
+
+    # read the ids and the data in one lua script call, or ZRANGEBYSCORE and then HMGET,
+    # the script blocks the server while it builds the whole reply of a large slice.
+    scripted_reads = True
+
+    def _hash_key(self, name):
         """
-        auto trim the redis data  with max length in the redis keys
         :param name: redis key
-        :param key_id:
-        :param hash_key:
+        :return: str, the hashes key of the time-series
+        """
+        if self.cluster and not ttseries.utils.has_hash_tag(name):
+            return self.cluster_hash_format.format(key=name)
+        return self.hash_format.format(key=name)
+
+    def _incr_key(self, name):
+        """
+        :param name: redis key
+        :return: str, the auto increase id key of the time-series
+        """
+        if self.cluster and not ttseries.utils.has_hash_tag(name):
+            return self.cluster_incr_format.format(key=name)
+        return self.incr_format.format(key=name)
+
+    def _series_name(self, incr_key):
         """
-        # if current length reach the max length of the data
-        # remove oldest key store in data
-        remove_key = key_id - self.max_length
-        watch_keys = (name, hash_key)
+        the time-series name of the auto increase id key
+        :param incr_key: str
+        :return: str
+        """
+        name = incr_key[:-len(":ID")]
+        if self.cluster and name.startswith("{") and name.find("}") == len(name) - 1:
+            return name[1:-1]
+        return name
 
-        def pipe_func(_pipe):  # trans function
-            self.client.zrem(name, remove_key)
-            self.client.hdel(hash_key, remove_key)
+    def _storage_keys(self, name):
+        """
+        :param name: redis key
+        :return: list, the sorted sets, hashes and auto increase id keys
+        """
+        return [name, self._hash_key(name), self._incr_key(name)]
 
-        self.transaction_pipe(pipe_func, watch_keys)
+    def _validate_key(self, name):
+        """
+        in cluster mode the key can't be a whole hash tag like `{APPL}`,
+        which shares the hashes and id keys of the key `APPL`.
+        :param name:
+        """
+        super(RedisHashTimeSeries, self)._validate_key(name)
+        if self.cluster and name.startswith("{") and name.find("}") == len(name) - 1:
+            raise RedisTimeSeriesError("Key can't be a whole hash tag in cluster mode.")
 
     def get(self, name, timestamp):
         """
@@ -46,46 +87,64 @@ class RedisHashTimeSeries(RedisTSBase):
         :param timestamp: float, timestamp
         :return: obj
         """
-        hash_key = self.hash_format.format(key=name)
+        values, _ = self._read_slice(name, timestamp, timestamp, 1)
+        if values:
+            return self._serializer.loads(values[0])
 
-        result_id = self.client.zrangebyscore(name, min=timestamp, max=timestamp)
-        if result_id:
-            data = self.client.hmget(hash_key, result_id)
-            return self._serializer.loads(data[0])
+    def _read_slice(self, name, start_timestamp=None, end_timestamp=None, limit=None, asc=True):
+        """
+        read the data of a slice, in one lua script call with `scripted_reads`
+        :return: tuple, (serialized data list, numpy.ndarray float64 timestamps)
+        """
+        if not self.scripted_reads:
+            ids, timestamps = self._get_slice_mixin(name, start_timestamp, end_timestamp, limit, asc)
+            if ids:
+                return self._skip_missing(self.client.hmget(self._hash_key(name), ids), timestamps)
+            return [], timestamps
+
+        return replies.parse_slice(self._script(scripts.HASH_GET_SLICE)(
+            keys=[name, self._hash_key(name)], args=self._scripted_slice_args(start_timestamp, end_timestamp,
+                                                                             limit, asc)))
+
+    @staticmethod
+    def _scripted_slice_args(start_timestamp=None, end_timestamp=None, limit=None, asc=True):
+        """
+        :return: list, the arguments of the HASH_GET_SLICE script
+        """
+        return ["-inf" if start_timestamp is None else start_timestamp,
+                "+inf" if end_timestamp is None else end_timestamp,
+                int(asc), -1 if limit is None else limit]
 
-    def add(self, name: str, timestamp: float, data) -> bool:
+    def add(self, name: str, timestamp: float, data, on_conflict="skip") -> bool:
         """
         add one times-series data into redis
 
-        ensure only one timestamp corresponding one value
+        ensure only one timestamp corresponding one value,
+        allocate the id, check the timestamp, trim the oldest item
+        with max length and insert the data in one lua script call.
         :param name: key name
         :param timestamp: timestamp: float
         :param data: object
+        :param on_conflict: str, the policy of an exist timestamp,
+            "skip" ignores the data, "replace" overwrites the stored data,
+            "error" raises RedisTimeSeriesError
         :return: bool
         """
         self._validate_key(name)
+        self._validate_on_conflict(on_conflict)
 
-        incr_key = self.incr_format.format(key=name)  # APPL:SECOND:ID
-        hash_key = self.hash_format.format(key=name)  # APPL:second:HASH
-
-        if not self.exist_timestamp(name, timestamp):
-
-            dumps_data = self._serializer.dumps(data)
-
-            key_id = self.client.incr(incr_key)  # int, key id start with 1
-            # key id start with 1,2,3,4,5,6...
-
-            if self.length(name) == self.max_length:
-                self._auto_trim(name, key_id, hash_key)
+        incr_key = self._incr_key(name)  # APPL:SECOND:ID
+        hash_key = self._hash_key(name)  # APPL:second:HASH
 
-            dumps_dict = {key_id: dumps_data}  # { 1: values}
+        dumps_data = self._serializer.dumps(data)
 
-            def pipe_func(_pipe):  # trans function
-                _pipe.zadd(name, {key_id: timestamp})
-                _pipe.hset(hash_key, mapping=dumps_dict)  # APPL:second:HASH, {1:value}
-
-            watch_keys = (name, hash_key)  # APPL:SECOND , APPL:second:HASH
-            return self.transaction_pipe(pipe_func, watch_keys)
+        result = self._script(scripts.HASH_ADD)(keys=[name, hash_key, incr_key],
+                                                args=[timestamp, dumps_data,
+                                                      self.max_length, on_conflict])
+        if result < 0 and on_conflict == "error":
+            raise RedisTimeSeriesError("add duplicated timestamp into redis -> "
+                                       "timestamp: {0}".format(timestamp))
+        return result > 0
 
     def delete(self, name, start_timestamp=None, end_timestamp=None):
         """
@@ -98,8 +157,8 @@ class RedisHashTimeSeries(RedisTSBase):
         :param end_timestamp: timestamp
         :return: bool or delete num
         """
-        incr_key = self.incr_format.format(key=name)  # APPL:SECOND:ID
-        hash_key = self.hash_format.format(key=name)  # APPL:second:HASH
+        incr_key = self._incr_key(name)  # APPL:SECOND:ID
+        hash_key = self._hash_key(name)  # APPL:second:HASH
 
         if start_timestamp or end_timestamp:
 
@@ -144,10 +203,10 @@ class RedisHashTimeSeries(RedisTSBase):
                     self.delete(name, start_timestamp, end_timestamp)
         else:
             for chunk_keys in chunks_data:
-                incr_chunks = map(lambda x: self.incr_format.format(key=x), chunk_keys)
-                hash_chunks = map(lambda x: self.hash_format.format(key=x), chunk_keys)
+                incr_chunks = map(self._incr_key, chunk_keys)
+                hash_chunks = map(self._hash_key, chunk_keys)
                 del_items = itertools.chain(chunk_keys, incr_chunks, hash_chunks)
-                self.client.delete(*del_items)
+                self._delete_keys(list(del_items))
 
     def trim(self, name, length: int):
         """
@@ -157,7 +216,7 @@ class RedisHashTimeSeries(RedisTSBase):
         :param length: int, length
         """
         current_length = self.length(name)
-        hash_key = self.hash_format.format(key=name)
+        hash_key = self._hash_key(name)
 
         if current_length > length > 0:
             begin = 0  # start with 0 as the first set item
@@ -189,75 +248,243 @@ class RedisHashTimeSeries(RedisTSBase):
         :return: [(timestamp,data),...]
         """
 
-        hash_key = self.hash_format.format(key=name)
+        values, timestamps = self._read_slice(name, start_timestamp, end_timestamp, limit, asc)
 
-        results_ids = self._get_slice_mixin(name, start_timestamp,
-                                            end_timestamp, limit, asc)
+        if values:
+            return self._loads_slice(values, timestamps)
 
-        if results_ids:
-            ids, timestamps = list(itertools.zip_longest(*results_ids))
-            values = self.client.hmget(hash_key, *ids)
-            iter_dumps = map(self._serializer.loads, values)
-            return list(itertools.zip_longest(timestamps, iter_dumps))
+    def _loads_slice(self, values, timestamps):
+        """
+        :param values: list, serialized data
+        :param timestamps: numpy.ndarray, float64
+        :return: [(timestamp,data),...]
+        """
+        return list(zip(timestamps.tolist(), self._serializer.loads_many(values)))
 
-    def add_many(self, name, array: list, chunks_size=2000):
+    def _slice_page(self, name, start_timestamp, end_timestamp, limit, asc):
+        """
+        read one page of `iter_slice` in one lua script call
+        :return: tuple, (serialized data list, numpy.ndarray float64 timestamps)
+        """
+        return self._read_slice(name, start_timestamp, end_timestamp, limit, asc)
+
+    def get_slice_columns(self, name, start_timestamp=None,
+                          end_timestamp=None, limit=None, asc=True):
+        """
+        return a slice as the numpy columns, the serializer must support
+        `loads_columns`, such as StructSerializer
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param limit: int, limit the length of the result data.
+        :param asc: bool, sorted as the timestamp values
+        :return: tuple, (numpy.ndarray float64 timestamps, {name: numpy.ndarray,...})
+        """
+        values, timestamps = self._read_slice(name, start_timestamp, end_timestamp, limit, asc)
+
+        if values:
+            return self._loads_columns(timestamps, values)
+
+    def get_slice_raw(self, name, start_timestamp=None,
+                      end_timestamp=None, limit=None, asc=True):
+        """
+        return a slice without deserialization, the same as RedisTSBase.get_slice_raw,
+        the serialized data is read from the hash as `get_slice`, the missing data is skipped.
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param limit: int, limit the length of the result data.
+        :param asc: bool, sorted as the timestamp values
+        :return: tuple, (numpy.ndarray float64 timestamps, bytes buffer of the serialized data,
+            numpy.ndarray int64 offsets), the data i is buffer[offsets[i]:offsets[i + 1]]
+        """
+        values, timestamps = self._read_slice(name, start_timestamp, end_timestamp, limit, asc)
+        buffer, offsets = replies.pack_members(values)
+        return timestamps, buffer, offsets
+
+    def add_many(self, name, array: list, chunks_size=2000, assume_sorted=False, on_conflict="error",
+                 parallelism=1):
         """
         add large amount of data into redis sorted sets
         :param name: redis key
         :param array: data pairs, [("timestamp",data)...]
         :param chunks_size: split data into chunk, optimize for redis pipeline
+        :param assume_sorted: bool, the array already sorted as the timestamp asc, skip to sort it
+        :param on_conflict: str, the policy of the exist timestamps,
+            "error" raises RedisTimeSeriesError before insert any data,
+            "skip" ignores the data, "replace" overwrites the stored data,
+            both are resolved in redis server with one lua script call each chunk.
+        :param parallelism: int, write the chunks concurrently over the pooled connections,
+            only with `transaction=False`, the chunks are not atomic as a whole,
+            raise ChunkWriteError with the failed chunks after all the chunks are sent.
         """
+        parallel = self._validate_parallelism(parallelism)
+
+        incr_key = self._incr_key(name)
+        hash_key = self._hash_key(name)
 
-        incr_key = self.incr_format.format(key=name)
-        hash_key = self.hash_format.format(key=name)
+        timestamp_pairs = self._add_many_validate_mixin(name, array, assume_sorted, on_conflict)
+
+        if on_conflict == "error" and len(timestamp_pairs):
+            # allocate the ids of all the data at once, key id start with 1
+            start_id = self.client.incrby(incr_key, amount=len(timestamp_pairs)) - len(timestamp_pairs) + 1
+        else:
+            start_id = None
+
+        def iter_chunks():
+            for index, chunks in enumerate(ttseries.utils.chunks(timestamp_pairs, chunks_size)):
+                dumps_results = self._dumps_pairs(chunks)
+                ids_range = None
+                if start_id is not None:
+                    chunk_start_id = start_id + index * chunks_size
+                    ids_range = range(chunk_start_id, chunk_start_id + len(chunks))
+                yield dumps_results, ids_range
+
+        if parallel:
+            self._execute_parallel_chunks((functools.partial(self._pipe_add_chunk, name=name,
+                                                             dumps_results=dumps_results,
+                                                             ids_range=ids_range,
+                                                             on_conflict=on_conflict)
+                                           for dumps_results, ids_range in iter_chunks()),
+                                          parallelism)
+            return
+
+        for dumps_results, ids_range in iter_chunks():
+            if on_conflict != "error":
+                self._pipe_add_chunk(self.client, name, dumps_results, None, on_conflict)
+            else:
+                self.transaction_pipe(self._pipe_add_chunk, (name, hash_key),
+                                      name, dumps_results, ids_range, on_conflict)
+
+    def _pipe_add_chunk(self, pipe, name, dumps_results, ids_range, on_conflict="error"):
+        """
+        :param pipe: redis pipeline or client
+        :param name: redis key
+        :param dumps_results: list, [(timestamp, serialized data),...]
+        :param ids_range: range, the allocated ids of the data, only with "error" conflict policy
+        :param on_conflict: str, "error", "skip" or "replace"
+        """
+        incr_key = self._incr_key(name)
+        hash_key = self._hash_key(name)
 
-        timestamp_pairs = self._add_many_validate_mixin(name, array)
+        if on_conflict == "error":
+            # [(("timestamp",data),id),...]
+            mix_data = list(zip(dumps_results, ids_range))
 
-        chunks_data = ttseries.utils.chunks(timestamp_pairs, chunks_size)
-        for chunks in chunks_data:
+            ids_values = {item[1]: item[0][1] for item in mix_data}
+            timestamp_ids = {item[1]: item[0][0] for item in mix_data}
 
-            if not self.client.exists(incr_key):
-                self.client.incr(incr_key)
+            pipe.zadd(name, timestamp_ids)
+            return pipe.hset(hash_key, mapping=ids_values)
+        else:
+            args = [on_conflict, self.max_length]
+            for timestamp, data in dumps_results:
+                args.append(timestamp)
+                args.append(data)
+            return self._script(scripts.HASH_ADD_MANY)(keys=[name, hash_key, incr_key], args=args, client=pipe)
+
+    def add_many_keys(self, mapping, chunks_size=2000, pipeline_bytes=1048576,
+                      assume_sorted=False, on_conflict="error"):
+        """
+        add large amount of data of many keys into redis,
+        validation reads and the ids allocation of all the keys are pipelined,
+        and the writes of all the keys are packed into shared pipelines sized by the payload bytes.
+
+        ! each pipeline executes in a MULTI/EXEC transaction if `transaction` is True,
+        but the keys are not watched, the validation and the writes are not atomic.
+        :param mapping: dict, {name: [(timestamp, data),...],...}
+        :param chunks_size: split data of each key into chunk
+        :param pipeline_bytes: int, execute the pipeline when the queued payload reaches the bytes
+        :param assume_sorted: bool, the arrays already sorted as the timestamp asc, skip to sort them
+        :param on_conflict: str, the policy of the exist timestamps, "error", "skip" or "replace"
+        """
+        prepared = self._add_many_keys_validate_mixin(mapping, assume_sorted, on_conflict)
 
-            start_id = self.client.get(incr_key)  # if key not exist id equal 0
-            end_id = self.client.incrby(incr_key, amount=len(chunks))  # incr the add length
+        if on_conflict == "error":
+            with self._pipe_acquire(transaction=False) as pipe:
+                for name, timestamp_pairs, _ in prepared:
+                    pipe.incrby(self._incr_key(name), amount=len(timestamp_pairs))
+                end_ids = pipe.execute()
+        else:
+            end_ids = [None] * len(prepared)
 
-            ids_range = range(int(start_id), int(end_id))
+        def iter_pipe_funcs():
+            for (name, timestamp_pairs, trim_length), end_id in zip(prepared, end_ids):
+                if trim_length > 0:
+                    yield 0, functools.partial(self._pipe_trim, name=name, length=trim_length)
 
-            dumps_results = itertools.starmap(lambda timestamp, data:
-                                              (timestamp, self._serializer.dumps(data)), chunks)
+                start_id = end_id - len(timestamp_pairs) + 1 if end_id else None
 
-            # [(("timestamp",data),id),...]
-            mix_data = itertools.zip_longest(dumps_results, ids_range)
-            mix_data = list(mix_data)
+                for index, item in enumerate(ttseries.utils.chunks(timestamp_pairs, chunks_size)):
+                    dumps_results = self._dumps_pairs(item)
+                    ids_range = None
+                    if start_id:
+                        chunk_start_id = start_id + index * chunks_size
+                        ids_range = range(chunk_start_id, chunk_start_id + len(item))
 
-            ids_values = {item[1]: item[0][1] for item in mix_data}
-            timestamp_ids = {item[1]: item[0][0] for item in mix_data}
+                    payload_bytes = sum(ttseries.utils.sizeof_payload(data)
+                                        for _, data in dumps_results) + 16 * len(item)
+                    yield payload_bytes, functools.partial(self._pipe_add_chunk, name=name,
+                                                           dumps_results=dumps_results,
+                                                           ids_range=ids_range,
+                                                           on_conflict=on_conflict)
 
-            def pipe_func(_pipe):
-                _pipe.zadd(name, timestamp_ids)
-                _pipe.hset(hash_key, mapping=ids_values)
+        self._execute_sized_pipe(iter_pipe_funcs(), pipeline_bytes)
 
-            self.transaction_pipe(pipe_func, watch_keys=(name, hash_key))
+    def _pipe_trim(self, pipe, name, length):
+        """
+        :param pipe: redis pipeline
+        :param name: redis key
+        :param length: int, trim the oldest length of data from sorted sets and hashes
+        """
+        hash_key = self._hash_key(name)
+        return self._script(scripts.HASH_TRIM)(keys=[name, hash_key], args=[length], client=pipe)
 
     def iter_keys(self, count=None):
         """
         generator iterator all time-series keys
         :return: iter,
         """
-        for item in self.client.scan_iter(match="*:ID", count=count):
-            yield item.decode("utf-8").replace(":ID", "")
+        for item in self._scan_iter(match="*:ID", count=count):
+            yield self._series_name(item.decode("utf-8"))
 
-    def iter(self, name):
+    def iter(self, name, count=None):
         """
-        iterator all the time-series data with redis key.
-        only works in python3.6,
-        https://stackoverflow.com/questions/39980323/are-dictionaries-ordered-in-python-3-6
+        iterator all the time-series data with redis key as the timestamp asc,
+        the sorted sets are read by the pages with a score cursor after the last
+        timestamp of the former page, so the pages don't shift when the data is
+        trimmed or inserted meanwhile, the HMGET of the data of one page is
+        pipelined with the ZRANGEBYSCORE of the next page.
         :param name: redis key
+        :param count: int, the number of the items of each page, default with `iter_batch_size`
         :return: iter, [(timestamp, data),...]
         """
-        hash_key = self.hash_format.format(key=name)  # APPL:second:HASH
-
-        for timestamp_pairs, hash_pairs in itertools.zip_longest(self.client.zscan_iter(name=name),
-                                                                 self.client.hscan_iter(name=hash_key)):
-            yield timestamp_pairs[1], self._serializer.loads(hash_pairs[1])
+        hash_key = self._hash_key(name)  # APPL:second:HASH
+        count = count or self.iter_batch_size
+
+        ids, timestamps = self._get_slice_mixin(name, limit=count)
+        while ids:
+            bounds = self._next_page_bounds(None, None, timestamps, count, True)
+            with self._pipe_acquire(transaction=False) as pipe:
+                pipe.hmget(hash_key, ids)
+                if bounds:
+                    pipe.execute_command(*self._slice_command(name, *bounds, limit=count),
+                                         **{redis.client.NEVER_DECODE: True})
+                results = pipe.execute()
+
+            yield from self._loads_slice(*self._skip_missing(results[0], timestamps))
+            ids, timestamps = replies.parse_slice(results[1]) if bounds else ([], timestamps)
+
+    @staticmethod
+    def _skip_missing(values, timestamps):
+        """
+        the ids removed between the reads have no data, they are skipped.
+        :param values: list, serialized data or None
+        :param timestamps: numpy.ndarray, float64
+        :return: tuple, (serialized data list, numpy.ndarray float64 timestamps)
+        """
+        if None in values:
+            keep = [value is not None for value in values]
+            timestamps = timestamps[keep]
+            values = [value for value in values if value is not None]
+        return values, timestamps
@@ -1,6 +1,5 @@
 # encoding:utf-8
 import copy
-import itertools
 
 import numpy as np
 
@@ -13,17 +12,28 @@ class RedisNumpyTimeSeries(RedisSampleTimeSeries):
     """
     Numpy TimeSeries support Numpy array with dtype or
     just assign the timestamp column index
+
+    with `binary_records` each row of the dtype array is stored as the
+    fixed-width little-endian bytes of the columns except the timestamp,
+    the chunks are serialized from the raw bytes of the array in one step,
+    and the slices are rebuilt with `np.frombuffer` over the members.
     """
 
+    # the number of the rows deserialized at once while filling a slice
+    LOADS_CHUNK_SIZE = 10000
+
     def __init__(self, redis_client, max_length=100000,
                  dtype=None,
                  timestamp_column_name=None,
                  timestamp_column_index=0,
+                 binary_records=False,
                  *args, **kwargs):
         """
         :param dtype: numpy.dtype, if set the dtype and timestamp_column_name can't be None
         :param timestamp_column_name: timestamp column name
         :param timestamp_column_index: timestamp column index
+        :param binary_records: bool, store the rows as fixed-width binary records
+            instead of the serializer, only with a dtype without object columns.
         :param args:
         :param kwargs:
         """
@@ -45,180 +55,246 @@ class RedisNumpyTimeSeries(RedisSampleTimeSeries):
 
         self.timestamp_column_index = timestamp_column_index
 
-    def _validate_duplicated_index(self, array):
+        self.record_dtype = None
+        if binary_records:
+            self.record_dtype = self._get_record_dtype()
+
+    def _get_record_dtype(self):
+        """
+        the packed little-endian dtype of the stored records, without the timestamp column
+        :return: numpy.dtype
+        """
+        if self.dtype is None:
+            raise RedisTimeSeriesError("binary_records requires the dtype")
+        if self.dtype.hasobject:
+            raise RedisTimeSeriesError("binary_records doesn't support the object columns")
+
+        fields = [(name, self.dtype.fields[name][0].newbyteorder("<"))
+                  for name in self.names if name != self.timestamp_column_name]
+        if not fields:
+            raise RedisTimeSeriesError("binary_records requires the columns except the timestamp")
+        return np.dtype(fields)
+
+    def _validate_duplicated_index(self, array, assume_sorted=False):
         """
         sorted timestamp and check exist repeated timestamp
         :param array:
-        :return:
+        :param assume_sorted: bool, the array already sorted as the timestamp asc
+        :return: tuple, (sorted array, float64 timestamps)
         """
-        # sort timestamp
         if self.dtype:
             timestamp_array = array[self.timestamp_column_name].astype("float64")
-            array[self.timestamp_column_name] = timestamp_array
-            array = np.sort(array, order=[self.timestamp_column_name])
         else:
             timestamp_array = array[:, self.timestamp_column_index].astype("float64")
-            array[:, self.timestamp_column_index] = timestamp_array
-            array = np.sort(array, axis=self.timestamp_column_index)
+
+        # sort timestamp
+        if not assume_sorted and np.any(timestamp_array[1:] < timestamp_array[:-1]):
+            order = np.argsort(timestamp_array, kind="mergesort")
+            array = array[order]
+            timestamp_array = timestamp_array[order]
 
         # check repeated
-        if len(np.unique(timestamp_array)) != len(timestamp_array):
+        if np.any(timestamp_array[1:] == timestamp_array[:-1]):
             raise RedisTimeSeriesError("repeated timestamps in array data")
 
-        return array
+        return array, timestamp_array
 
-    def _timestamp_exist(self, name, array):
+    def add_many(self, name, array: np.ndarray, chunks_size=2000, assume_sorted=False, on_conflict="error",
+                 parallelism=1):
         """
-        :param name:
-        :param array:
-        :return:
+        add large amount of numpy array into redis
+        >>>[[timestamp,"a","c"],
+        >>> [timestamp,"b","e"],
+        >>> [timestamp,"c","a"],...]
+        :param name: redis key
+        :param array: numpy.ndarray
+        :param chunks_size: int, split data into chunk, optimize for redis pipeline
+        :param assume_sorted: bool, the array already sorted as the timestamp asc, skip to sort it
+        :param on_conflict: str, the policy of the exist timestamps, "error", "skip" or "replace"
+        :param parallelism: int, write the chunks concurrently, only with `transaction=False`
         """
-        if self.dtype:
-            timestamp_array = array[self.timestamp_column_name]
-        else:
-            timestamp_array = array[:, self.timestamp_column_index]
-
-        start_timestamp = timestamp_array.min()
-        end_timestamp = timestamp_array.max()
-
-        exist_length = self.count(name, start_timestamp, end_timestamp)
+        super(RedisNumpyTimeSeries, self).add_many(name, array, chunks_size, assume_sorted, on_conflict,
+                                                   parallelism)
 
-        if exist_length > 0:
+    def _sort_array(self, array, assume_sorted=False):
+        """
+        :param array: numpy.ndarray
+        :param assume_sorted: bool, the array already sorted as the timestamp asc
+        :return: tuple, (sorted array, float64 timestamps)
+        """
+        return self._validate_duplicated_index(array, assume_sorted)
 
-            filer_array = self.get_slice(name, start_timestamp, end_timestamp)
+    def _dumps_item(self, data):
+        """
+        :param data: one row of the dtype or the values without the timestamp column
+        :return: serialized data
+        """
+        if self.record_dtype is None:
+            return super(RedisNumpyTimeSeries, self)._dumps_item(data)
 
-            if self.dtype:
-                filter_timestamps = filer_array[self.timestamp_column_name]
-            else:
-                filter_timestamps = filer_array[:, self.timestamp_column_index]
+        if isinstance(data, (np.void, np.ndarray)) and data.dtype.names:
+            return self._dumps_records(np.atleast_1d(data))[0]
+        return np.array(tuple(data), dtype=self.record_dtype).tobytes()
 
-            # check repeated data
-            duplicated = np.intersect1d(filter_timestamps, timestamp_array)
+    def _dumps_records(self, array):
+        """
+        serialize the rows of the dtype array to the binary records, the array is never modified.
+        :param array: numpy.ndarray with dtype
+        :return: list, [bytes,...]
+        """
+        records = np.empty(len(array), dtype=self.record_dtype)
+        for name in self.record_dtype.names:
+            records[name] = array[name]
+        return records.view("V{0}".format(self.record_dtype.itemsize)).tolist()
 
-            if duplicated.size > 0:
-                raise RedisTimeSeriesError("add duplicated timestamp into redis -> timestamp:")
+    def _loads_records(self, members, timestamps):
+        """
+        rebuild the dtype array from the binary records
+        :param members: list, [bytes,...]
+        :param timestamps: iterable, float timestamps
+        :return: numpy.ndarray
+        """
+        records = np.frombuffer(b"".join(members), dtype=self.record_dtype)
+        array = np.empty(len(records), dtype=self.dtype)
+        array[self.timestamp_column_name] = np.fromiter(timestamps, np.float64, count=len(records))
+        for name in self.record_dtype.names:
+            array[name] = records[name]
+        return array
 
-    def add_many(self, name, array: np.ndarray, chunks_size=2000):
+    def _dumps_chunks(self, array, chunks_size=2000):
         """
-        add large amount of numpy array into redis
+        split the numpy array into chunks and serialize the rows without the timestamp column
         >>>[[timestamp,"a","c"],
         >>> [timestamp,"b","e"],
         >>> [timestamp,"c","a"],...]
-        :param name: redis key
         :param array: numpy.ndarray
-        :param chunks_size: int, split data into chunk, optimize for redis pipeline
+        :param chunks_size: int, split data into chunk
+        :return: yield dict, {serialized data: timestamp,...}
         """
-        self._validate_key(name)
+        if self.record_dtype is not None:
+            for chunk_array in ttseries.utils.chunks_np_or_pd_array(array, chunks_size):
+                timestamps = chunk_array[self.timestamp_column_name].astype(np.float64).tolist()
+                yield dict(zip(self._dumps_records(chunk_array), timestamps))
+            return
 
-        array = self._validate_duplicated_index(array)
-        # auto trim timestamps
-        array = self._auto_trim_array(name, array)
-        # validate timestamp exist
-        self._timestamp_exist(name, array)
+        if self.dtype:
+            timestamp_index = self.timestamp_name_index
+            names = copy.deepcopy(self.names)
+            names.pop(timestamp_index)
+        else:
+            timestamp_index = self.timestamp_column_index
 
         for chunk_array in ttseries.utils.chunks_np_or_pd_array(array, chunks_size):
 
-            if self.dtype:
-                timestamp_index = self.names.index(self.timestamp_column_name)
-                names = copy.deepcopy(self.names)
-                names.pop(self.timestamp_column_index)
-            else:
-                timestamp_index = self.timestamp_column_index
-
-            result = {}
+            timestamps = []
+            rows = []
 
             for row in chunk_array:
 
-                timestamp = row[timestamp_index]
+                timestamps.append(row[timestamp_index])
 
                 if self.dtype:
                     list_data = row[names]
                 else:
-                    part_row = row[:timestamp_index]
-                    rest_row = row[timestamp_index + 1:]
-                    if part_row.size == 0:
-                        list_data = rest_row
-                    elif rest_row.size == 0:
-                        list_data = part_row
-                    else:
-                        list_data = rest_row + part_row
-
-                list_data = tuple(data.item() for data in list_data)
-
-                data = self._serializer.dumps(list_data)
-
-                result[data] = timestamp
+                    list_data = np.concatenate((row[:timestamp_index], row[timestamp_index + 1:]))
 
-            def pipe_func(_pipe):
-                _pipe.zadd(name, result)
+                rows.append(tuple(data.item() for data in list_data))
 
-            self.transaction_pipe(pipe_func, watch_keys=name)
+            yield dict(zip(self._serializer.dumps_many(rows), timestamps))
 
-    def get(self, name: str, timestamp: float):
+    def _loads_item(self, timestamp, data):
         """
-        get one item by timestamp
-        :param name:
-        :param timestamp:
+        :param timestamp: float
+        :param data: serialized data
         :return: numpy.ndarray
         """
-        data = super(RedisNumpyTimeSeries, self).get(name, timestamp)
+        if self.record_dtype is not None:
+            return self._loads_records([data], [timestamp])[0]
 
-        if data:
-            if self.dtype is None:
-                data.insert(self.timestamp_column_index, timestamp)
-                return np.array(data)
-            else:
-                data.insert(self.timestamp_name_index, timestamp)
-                return np.array(tuple(data), dtype=self.dtype)
+        return self._insert_timestamp(timestamp, self._serializer.loads(data))
 
-    def iter(self, name, count=None):
+    def _insert_timestamp(self, timestamp, data):
         """
-        iterable all data with count values
-        :param name: redis key
-        :param count: the count length of records
-        :return: yield numpy.ndarray
+        :param timestamp: float
+        :param data: list, deserialized data
+        :return: numpy.ndarray
         """
-
         if self.dtype is None:
-            for timestamp, data in super(RedisNumpyTimeSeries, self).iter(name, count):
-                data.insert(self.timestamp_column_index, timestamp)
-                yield np.array(data)
+            data.insert(self.timestamp_column_index, timestamp)
+            return np.array(data)
         else:
+            data.insert(self.timestamp_name_index, timestamp)
+            return np.array(tuple(data), dtype=self.dtype)
 
-            for timestamp, data in super(RedisNumpyTimeSeries, self).iter(name, count):
-                data.insert(self.timestamp_name_index, timestamp)
-                yield np.array(tuple(data), dtype=self.dtype)
-
-    def get_slice(self, name, start_timestamp=None,
-                  end_timestamp=None, limit=None, asc=True):
+    def _loads_iter_items(self, results):
         """
-        return a slice numpy array from redis sorted sets
+        :param results: [(b'\x81\xa5value\x00', 1526008483.331131),...]
+        :return: list, the rows of the decoded block
+        """
+        return list(self._loads_slice([data for data, _ in results],
+                                      np.fromiter((timestamp for _, timestamp in results),
+                                                  np.float64, count=len(results))))
 
-        :param name: redis key
-        :param start_timestamp: start timestamp
-        :param end_timestamp: end timestamp
-        :param limit: int,
-        :param asc: bool, sorted as the timestamp values
+    def _loads_slice(self, members, timestamps):
+        """
+        preallocate the array with the length of the reply and
+        fill the timestamp column from the float64 scores at once
+        :param members: list, serialized data
+        :param timestamps: numpy.ndarray, float64
         :return: numpy.ndarray
         """
+        if self.record_dtype is not None:
+            return self._loads_records(members, timestamps)
+        if self.dtype is not None:
+            return self._loads_dtype_array(members, timestamps)
+        return self._loads_plain_array(members, timestamps)
 
-        results = self._get_slice_mixin(name, start_timestamp,
-                                        end_timestamp, limit, asc)
-
-        if results:
-            # [(b'\x81\xa5value\x00', 1526008483.331131),...]
-
-            def apply_numpy_index(serializer_data, timestamp):
-                data = self._serializer.loads(serializer_data)
-                data.insert(column_index, timestamp)
-                return tuple(data)
-
-            values = itertools.starmap(apply_numpy_index, results)
+    def _loads_dtype_array(self, members, timestamps):
+        """
+        :param members: list, serialized data
+        :param timestamps: numpy.ndarray, float64
+        :return: numpy.ndarray with dtype
+        """
+        array = np.empty(len(members), dtype=self.dtype)
+        array[self.timestamp_column_name] = timestamps
+        names = [name for name in self.names if name != self.timestamp_column_name]
+
+        for start in range(0, len(members), self.LOADS_CHUNK_SIZE):
+            rows = self._serializer.loads_many(members[start:start + self.LOADS_CHUNK_SIZE])
+            for index, name in enumerate(names):
+                array[name][start:start + len(rows)] = [row[index] for row in rows]
+        return array
 
-            if self.dtype is None:
-                column_index = self.timestamp_column_index
-                return np.array(list(values))
-            else:
+    def _loads_plain_array(self, members, timestamps):
+        """
+        the chunks are decoded into 2-d arrays first, the dtype of the result
+        is promoted from them and the float64 timestamps.
+        :param members: list, serialized data
+        :param timestamps: numpy.ndarray, float64
+        :return: numpy.ndarray
+        """
+        blocks = [np.array(self._serializer.loads_many(members[start:start + self.LOADS_CHUNK_SIZE]))
+                  for start in range(0, len(members), self.LOADS_CHUNK_SIZE)]
+        columns = blocks[0].shape[1] + 1
+        column_index = min(self.timestamp_column_index, columns - 1)
+
+        array = np.empty((len(members), columns), dtype=np.result_type(np.float64, *blocks))
+        array[:, column_index] = timestamps
+        others = [index for index in range(columns) if index != column_index]
+        start = 0
+        for block in blocks:
+            array[start:start + len(block), others] = block
+            start += len(block)
+        return array
 
-                column_index = self.timestamp_name_index
-                return np.fromiter(values, dtype=self.dtype)
+    def iter_batches(self, name, batch_size=10000):
+        """
+        iterator all the time-series data with redis key as the timestamp asc,
+        read by the pages of `iter_slice` and yield each page as a whole array,
+        the score cursor keeps the rows in order when the key is trimmed or
+        written between the batches.
+        :param name: redis key
+        :param batch_size: int, the number of the rows of each array
+        :return: iter, numpy.ndarray
+        """
+        yield from self.iter_slice(name, page_size=batch_size)
@@ -1,6 +1,5 @@
 # encoding:utf-8
-import itertools
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 import numpy
 import pandas as pd
@@ -15,12 +14,20 @@ class RedisPandasTimeSeries(RedisSampleTimeSeries):
     Base on Pandas DataFrame to store time series data into redis sorted set.
     """
 
+    # the local time offsets are resolved once for each quarter of an hour,
+    # the daylight saving time transitions happen at the quarter boundaries.
+    OFFSET_SECONDS = 900
+    EPOCH = datetime(1970, 1, 1)
+    # the number of the rows deserialized at once while filling the columns of a slice
+    LOADS_CHUNK_SIZE = 10000
+
     def __init__(self, redis_client, columns,
                  index_name="timestamp", dtypes=None,
-                 max_length=100000, *args, **kwargs):
+                 max_length=100000, timezone=None, *args, **kwargs):
         """
         :param redis_client: redis client instance, only test with redis-py client.
-        :param timezone: datetime timezone
+        :param timezone: str or tzinfo, the timezone of the loaded datetime index,
+            None is the naive local time.
         :param columns: pandas DataFrame columns names' list
         :param dtypes: pandas columns data type, example: {"value":"int64","value2":"float64"}
         :param max_length: int, max length of data to store the time-series data.
@@ -36,35 +43,56 @@ class RedisPandasTimeSeries(RedisSampleTimeSeries):
         self.columns = columns
         self.dtypes = dtypes
         self.index_name = index_name
+        self.timezone = timezone
 
-    def _timestamp_exist(self, name, data_frame):
+    def _index_timestamps(self, date_index):
         """
-        sorted timestamp and check exist repeated timestamp
-        :param name:
-        :param data_frame:
-        :return:
+        convert the DatetimeIndex into float64 timestamps from the int64 nanoseconds at once,
+        the same as `datetime.timestamp`, the naive datetime is the local time.
+        :param date_index: pandas.DatetimeIndex
+        :return: numpy.ndarray
         """
-        date_index = data_frame.index
-
-        start_timestamp = data_frame.idxmin()
-        start_timestamp = start_timestamp[0].to_pydatetime().timestamp()
-
-        end_timestamp = data_frame.idxmax()
-        end_timestamp = end_timestamp[0].to_pydatetime().timestamp()
-
-        exist_length = self.count(name, start_timestamp, end_timestamp)
-
-        if exist_length > 0:
-
-            filter_data_frame = self.get_slice(name, start_timestamp, end_timestamp)
-
-            filter_timestamps_index = filter_data_frame.index
-
-            # check repeated data
-            duplicated = numpy.intersect1d(filter_timestamps_index.to_pydatetime(), date_index.to_pydatetime())
-
-            if duplicated.size > 0:
-                raise RedisTimeSeriesError("add duplicated timestamp into redis -> timestamp:")
+        microseconds = date_index.asi8 // 1000
+        if date_index.tz is not None:
+            return microseconds / 1e6
+
+        seconds, microsecond = numpy.divmod(microseconds, 1000000)
+        quarters, inverse = numpy.unique(seconds // self.OFFSET_SECONDS, return_inverse=True)
+        offsets = numpy.array([int((self.EPOCH + timedelta(seconds=quarter * self.OFFSET_SECONDS)).timestamp())
+                               - quarter * self.OFFSET_SECONDS for quarter in quarters.tolist()],
+                              dtype=numpy.int64)
+        return (seconds + offsets[inverse]) + microsecond / 1e6
+
+    def _timestamps_index(self, timestamps):
+        """
+        convert the float64 timestamps into the DatetimeIndex at once,
+        rounded to microseconds the same as `datetime.fromtimestamp`.
+        :param timestamps: numpy.ndarray, float64
+        :return: pandas.DatetimeIndex, naive local time or in the timezone
+        """
+        fraction, seconds = numpy.modf(timestamps)
+        microseconds = seconds.astype(numpy.int64) * 1000000 + numpy.round(fraction * 1e6).astype(numpy.int64)
+
+        if self.timezone is None:
+            quarters, inverse = numpy.unique(microseconds // (self.OFFSET_SECONDS * 1000000), return_inverse=True)
+            offsets = numpy.array([(datetime.fromtimestamp(quarter * self.OFFSET_SECONDS) - self.EPOCH) //
+                                   timedelta(microseconds=1) - quarter * self.OFFSET_SECONDS * 1000000
+                                   for quarter in quarters.tolist()], dtype=numpy.int64)
+            microseconds += offsets[inverse]
+
+        date_index = pd.DatetimeIndex(microseconds.astype("datetime64[us]"), name=self.index_name)
+        if self.timezone is not None:
+            date_index = date_index.tz_localize("UTC").tz_convert(self.timezone)
+        return date_index
+
+    def _timestamp_datetime(self, timestamp):
+        """
+        :param timestamp: float
+        :return: datetime, naive local time or in the timezone
+        """
+        if self.timezone is None:
+            return datetime.fromtimestamp(timestamp)
+        return pd.Timestamp(datetime.fromtimestamp(timestamp, timezone.utc)).tz_convert(self.timezone)
 
     def _validate_append_data(self, data_frame):
         """
@@ -76,6 +104,17 @@ class RedisPandasTimeSeries(RedisSampleTimeSeries):
         if not unique_date.empty:
             raise RedisTimeSeriesError("DataFrame index can't contains duplicated index data")
 
+    def _trim_array(self, array_data):
+        """
+        trim the DataFrame rows with the limitation of max length, keep the latest rows
+        :param array_data: pandas.DataFrame
+        :return: pandas.DataFrame
+        """
+        length = len(array_data)
+        if length > self.max_length:
+            array_data = array_data.iloc[length - self.max_length:]
+        return array_data
+
     def _auto_trim_array(self, name, array_data):
         """
         auto to trim the redis sorted set base on the max length.
@@ -86,126 +125,135 @@ class RedisPandasTimeSeries(RedisSampleTimeSeries):
         :param array_data:
         :return:
         """
-        length = array_data.size
+        length = len(array_data)
         # auto trim array
         if length + self.length(name) >= self.max_length:
             trim_length = length + self.length(name) - self.max_length
             self.trim(name, trim_length)
 
-        if length > self.max_length:
-            array_data = array_data.iloc[length - self.max_length:]
-        return array_data
+        return self._trim_array(array_data)
 
-    def add_many(self, name, data_frame, chunks_size=2000):
+    def _sort_array(self, data_frame, assume_sorted=False):
         """
-        add large amount of pandas.DataFrame, the dataframe index type should be the pandas.DateTimeIndex.
-        or a kind of timestamp index.
-        :param name: redis key
+        sort the DataFrame with the index and check repeated index
         :param data_frame: pandas.DataFrame
-        :param chunks_size: int, split data into chunk, optimize for redis pipeline
+        :param assume_sorted: bool, the DataFrame index already sorted, skip to sort it
+        :return: tuple, (sorted DataFrame, float64 timestamps)
         """
-        self._validate_key(name)
         if not isinstance(data_frame, pd.DataFrame):
             raise TypeError("data parameter's type must be a pandas.DataFrame")
         if not isinstance(data_frame.index, pd.DatetimeIndex):
             raise TypeError("DataFrame index must be pandas.DateTimeIndex type")
-        data_frame = data_frame.sort_index()
+        if not assume_sorted:
+            data_frame = data_frame.sort_index()
 
         # check timestamp repeated
         self._validate_append_data(data_frame)
 
-        # auto trim timestamps
-        array = self._auto_trim_array(name, data_frame)
-        # validate timestamp exist
-        self._timestamp_exist(name, array)
-        for chunk_array in ttseries.utils.chunks_np_or_pd_array(array, chunks_size):
-            # To preserve dtypes while iterating over the rows, it is better
-            # to use :meth:`itertuples` which returns namedtuples of the values
-            # and which is generally faster than ``iterrows``
-
-            data_pairs = {self._serializer.dumps(row[1:]): row[0].to_pydatetime().timestamp()
-                          for row in chunk_array.itertuples()}
+        return data_frame, self._index_timestamps(data_frame.index)
 
-            def pipe_func(_pipe):
-                _pipe.zadd(name, data_pairs)
+    def _dumps_chunks(self, data_frame, chunks_size=2000):
+        """
+        split the DataFrame into chunks, convert each chunk into the columns
+        of the python values at once and serialize the rows of the chunk in one batch
+        :param data_frame: pandas.DataFrame
+        :param chunks_size: int, split data into chunk
+        :return: yield dict, {serialized data: timestamp,...}
+        """
+        for chunk_array in ttseries.utils.chunks_np_or_pd_array(data_frame, chunks_size):
+            timestamps = self._index_timestamps(chunk_array.index).tolist()
+            columns = [chunk_array.iloc[:, index].tolist() for index in range(chunk_array.shape[1])]
 
-            self.transaction_pipe(pipe_func, watch_keys=name)
+            yield dict(zip(self._serializer.dumps_many(list(zip(*columns))), timestamps))
 
-    def add(self, name, series):
+    def add_many(self, name, data_frame, chunks_size=2000, assume_sorted=False, on_conflict="error",
+                 parallelism=1):
         """
+        add large amount of pandas.DataFrame, the dataframe index type should be the pandas.DateTimeIndex.
+        or a kind of timestamp index.
         :param name: redis key
-        :param series: pandas.Series
-        :return: bool
+        :param data_frame: pandas.DataFrame
+        :param chunks_size: int, split data into chunk, optimize for redis pipeline
+        :param assume_sorted: bool, the DataFrame index already sorted, skip to sort it
+        :param on_conflict: str, the policy of the exist timestamps, "error", "skip" or "replace"
+        :param parallelism: int, write the chunks concurrently, only with `transaction=False`
         """
-        self._validate_key(name)
+        super(RedisPandasTimeSeries, self).add_many(name, data_frame, chunks_size, assume_sorted, on_conflict,
+                                                    parallelism)
 
-        if isinstance(series, pd.Series) and hasattr(series.name, "timestamp"): # validate datetime
+    def _dumps_series(self, series):
+        """
+        :param series: pandas.Series, the series name is the datetime
+        :return: tuple, (timestamp, serialized data)
+        """
+        if isinstance(series, pd.Series) and hasattr(series.name, "timestamp"):  # validate datetime
 
             series_time = series.name.to_pydatetime()
             timestamp = series_time.timestamp()
 
-            with self._lock:
-                if not self.exist_timestamp(name, timestamp):
-                    values = series.tolist()
-                    data = self._serializer.dumps(values)
-                    if self.length(name) == self.max_length:
-                        self.client.zpopmin(name)
-                    return self.client.zadd(name, {data: timestamp})
+            return timestamp, self._serializer.dumps(series.tolist())
         else:
             raise RedisTimeSeriesError("Please check series Type or "
                                        "series name value is not pandas.DateTimeIndex type")
 
-    def get(self, name: str, timestamp: float):
+    def add(self, name, series, on_conflict="skip"):
         """
-        get one item by timestamp
-        :param name:
-        :param timestamp:
-        :return: pandas.Series
+        :param name: redis key
+        :param series: pandas.Series
+        :param on_conflict: str, the policy of an exist timestamp, "error", "skip" or "replace"
+        :return: bool
         """
-        data = super(RedisPandasTimeSeries, self).get(name, timestamp)
-        if data:
-            date = datetime.fromtimestamp(timestamp)
-            return pd.Series(data=data, index=self.columns, name=date)
+        self._validate_key(name)
+        self._validate_on_conflict(on_conflict)
+
+        timestamp, data = self._dumps_series(series)
+        return self._add_script(name, timestamp, data, on_conflict)
 
-    def iter(self, name, count=None):
+    def _loads_item(self, timestamp, data):
         """
-        iterable all data with count values
-        :param name: redis key
-        :param count: the count length of records
-        :return: yield pandas.Series
+        :param timestamp: float
+        :param data: serialized data
+        :return: pandas.Series
         """
-        for timestamp, data in super(RedisPandasTimeSeries, self).iter(name, count):
-            date = datetime.fromtimestamp(timestamp)
-            yield pd.Series(data=data, index=self.columns, name=date)
+        date = self._timestamp_datetime(timestamp)
+        return pd.Series(data=self._serializer.loads(data), index=self.columns, name=date)
 
-    def get_slice(self, name, start_timestamp=None,
-                  end_timestamp=None, limit=None, asc=True):
+    def _loads_iter_items(self, results):
         """
-        return a slice pandas.DataFrame from start timestamp to end timestamps,
-        if start timestamp is None, and end timestamp is None, will retrieve all records from
-        redis sorted set.
+        :param results: [(b'\x81\xa5value\x00', 1526008483.331131),...]
+        :return: list, [pandas.Series,...]
+        """
+        values = self._serializer.loads_many([data for data, _ in results])
+        return [pd.Series(data=data, index=self.columns, name=self._timestamp_datetime(timestamp))
+                for (_, timestamp), data in zip(results, values)]
 
-        :param name: redis key
-        :param start_timestamp: float, start timestamp
-        :param end_timestamp: float, end timestamp
-        :param limit: int,
-        :param asc: bool, sorted as the timestamp values
+    def _loads_slice(self, members, timestamps):
+        """
+        the rows are deserialized in chunks and filled into the columns,
+        the columns of the numpy `dtypes` are preallocated typed arrays.
+        :param members: list, serialized data
+        :param timestamps: numpy.ndarray, float64
         :return: pandas.DataFrame
         """
-
-        results = self._get_slice_mixin(name, start_timestamp,
-                                        end_timestamp, limit, asc)
-
-        if results:
-            # [(b'\x81\xa5value\x00', 1526008483.331131),...]
-
-            data = list(itertools.starmap(lambda serializer, timestamp:
-                                          [datetime.fromtimestamp(timestamp)] +
-                                          self._serializer.loads(serializer),
-                                          results))
-
-            data_frame = pd.DataFrame.from_records(data, columns=[self.index_name] + self.columns)
-            data_frame = data_frame.set_index(self.index_name)
-            if self.dtypes:
-                data_frame = data_frame.astype(dtype=self.dtypes)
-            return data_frame
+        count = len(members)
+        date_index = self._timestamps_index(timestamps)
+        dtypes = self.dtypes or {}
+        columns = {}
+        for column in self.columns:
+            try:
+                columns[column] = numpy.empty(count, dtype=numpy.dtype(dtypes[column]))
+            except (KeyError, TypeError):
+                # inferred or the pandas extension dtypes
+                columns[column] = [None] * count
+
+        for start in range(0, count, self.LOADS_CHUNK_SIZE):
+            rows = self._serializer.loads_many(members[start:start + self.LOADS_CHUNK_SIZE])
+            for index, column in enumerate(self.columns):
+                columns[column][start:start + len(rows)] = [row[index] for row in rows]
+
+        data_frame = pd.DataFrame(columns, index=date_index, columns=self.columns, copy=False)
+        extension_dtypes = {column: dtype for column, dtype in dtypes.items()
+                            if column in columns and isinstance(columns[column], list)}
+        if extension_dtypes:
+            data_frame = data_frame.astype(dtype=extension_dtypes)
+        return data_frame
@@ -0,0 +1,62 @@
+# encoding:utf-8
+"""
+the parsers of the raw sorted set replies.
+
+the slices are read without the `withscores` option of redis-py, so the
+replies are never converted into the (member, float) pairs by redis-py,
+the parsers split the reply and convert all the scores with one numpy call.
+
+RESP2 replies are flat, [member, score, member, score,...],
+RESP3 replies are the pairs, [[member, score],...].
+"""
+import numpy as np
+
+
+def split_reply(response):
+    """
+    :param response: list, the reply of ZRANGEBYSCORE with WITHSCORES
+    :return: tuple, (list members, list scores)
+    """
+    if response and isinstance(response[0], list):
+        return [pair[0] for pair in response], [pair[1] for pair in response]
+    return response[0::2], response[1::2]
+
+
+def parse_scores(scores):
+    """
+    :param scores: list, the bytes scores of RESP2 or the floats of RESP3
+    :return: numpy.ndarray float64
+    """
+    return np.array(scores, dtype=np.float64)
+
+
+def pack_members(members):
+    """
+    copy the members into one packed buffer, it's not zero-copy,
+    the bytes of each member are already built by redis-py from the reply.
+    :param members: list, bytes
+    :return: tuple, (bytes buffer, numpy.ndarray int64 offsets),
+        the member i is buffer[offsets[i]:offsets[i + 1]]
+    """
+    offsets = np.zeros(len(members) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, members), np.int64, count=len(members)), out=offsets[1:])
+    return b"".join(members), offsets
+
+
+def parse_raw_slice(response):
+    """
+    :param response: list, the reply of ZRANGEBYSCORE with WITHSCORES
+    :return: tuple, (numpy.ndarray float64 scores, bytes buffer, numpy.ndarray int64 offsets)
+    """
+    members, scores = split_reply(response)
+    buffer, offsets = pack_members(members)
+    return parse_scores(scores), buffer, offsets
+
+
+def parse_slice(response):
+    """
+    :param response: list, the reply of ZRANGEBYSCORE with WITHSCORES
+    :return: tuple, (list members, numpy.ndarray float64 scores)
+    """
+    members, scores = split_reply(response)
+    return members, parse_scores(scores)
@@ -1,8 +1,12 @@
 # encoding:utf-8
 
-import itertools
+import functools
+
+import numpy
 
 import ttseries.utils
+from ttseries.exceptions import RedisTimeSeriesError
+from ttseries.ts import scripts
 from ttseries.ts.base import RedisTSBase
 
 
@@ -27,39 +31,156 @@ class RedisSampleTimeSeries(RedisTSBase):
     let's it support some specific patch to full support time-series data.
     """
 
-    def add(self, name: str, timestamp: float, data):
+    def add(self, name: str, timestamp: float, data, on_conflict="skip"):
         """
-        add one times-series data into redis
+        add one times-series data into redis,
+        check timestamp, trim with max length and insert
+        execute atomically in one lua script call.
         :param name: redis key
         :param timestamp: float
         :param data: obj
+        :param on_conflict: str, the policy of an exist timestamp,
+            "skip" ignores the data, "replace" overwrites the stored data,
+            "error" raises RedisTimeSeriesError
         :return: int
         """
         self._validate_key(name)
-        with self._lock:
-            if not self.exist_timestamp(name, timestamp):
-                data = self._serializer.dumps(data)
-                if self.length(name) == self.max_length:
-                    self.client.zpopmin(name)
+        self._validate_on_conflict(on_conflict)
+        data = self._dumps_item(data)
+        return self._add_script(name, timestamp, data, on_conflict)
+
+    def _dumps_item(self, data):
+        """
+        serialize one item added by `add`
+        :param data: obj
+        :return: serialized data
+        """
+        return self._serializer.dumps(data)
+
+    def _add_script(self, name, timestamp, dumps_data, on_conflict="skip"):
+        """
+        :param name: redis key
+        :param timestamp: float
+        :param dumps_data: serialized data
+        :param on_conflict: str, "error", "skip" or "replace"
+        :return: int, 0 if the timestamp already exists
+        """
+        result = self._script(scripts.SAMPLE_ADD)(keys=[name],
+                                                  args=[timestamp, dumps_data,
+                                                        self.max_length, on_conflict])
+        if result < 0:
+            if on_conflict == "error":
+                raise RedisTimeSeriesError("add duplicated timestamp into redis -> "
+                                           "timestamp: {0}".format(timestamp))
+            return 0
+        return result
+
+    def _add_chunk(self, name, data_pairs, on_conflict="error"):
+        """
+        insert one chunk of the serialized data into redis sorted sets
+        :param name: redis key
+        :param data_pairs: dict, {serialized data: timestamp,...}
+        :param on_conflict: str, "error" inserts in a transaction after validated,
+            "skip" or "replace" resolves the exist timestamps in one lua script call.
+        """
+        if on_conflict == "error":
+            self.transaction_pipe(self._pipe_add_chunk, name, name, data_pairs, on_conflict)
+        else:
+            self._pipe_add_chunk(self.client, name, data_pairs, on_conflict)
 
-                return self.client.zadd(name, mapping={data: timestamp})
+    def _pipe_add_chunk(self, pipe, name, data_pairs, on_conflict="error"):
+        """
+        :param pipe: redis pipeline or client
+        :param name: redis key
+        :param data_pairs: dict, {serialized data: timestamp,...}
+        :param on_conflict: str, "error", "skip" or "replace"
+        """
+        if on_conflict == "error":
+            return pipe.zadd(name, data_pairs)
+        else:
+            args = [on_conflict, self.max_length]
+            for data, timestamp in data_pairs.items():
+                args.append(timestamp)
+                args.append(data)
+            return self._script(scripts.SAMPLE_ADD_MANY)(keys=[name], args=args, client=pipe)
+
+    def _pipe_trim(self, pipe, name, length):
+        """
+        :param pipe: redis pipeline
+        :param name: redis key
+        :param length: int, trim the oldest length of data
+        """
+        return pipe.zremrangebyrank(name, min=0, max=length - 1)
 
-    def add_many(self, name, array: list, chunks_size=2000):
+    def add_many(self, name, array: list, chunks_size=2000, assume_sorted=False, on_conflict="error",
+                 parallelism=1):
         """
         add large amount of data into redis sorted sets
         :param name: redis key
         :param array: data pairs, [("timestamp",data)...]
         :param chunks_size: split data into chunk, optimize for redis pipeline
+        :param assume_sorted: bool, the array already sorted as the timestamp asc, skip to sort it
+        :param on_conflict: str, the policy of the exist timestamps,
+            "error" raises RedisTimeSeriesError before insert any data,
+            "skip" ignores the data, "replace" overwrites the stored data,
+            both are resolved in redis server without reading the exist data.
+        :param parallelism: int, write the chunks concurrently over the pooled connections,
+            only with `transaction=False`, the chunks are not atomic as a whole,
+            raise ChunkWriteError with the failed chunks after all the chunks are sent.
         """
-        timestamp_pairs = self._add_many_validate_mixin(name, array)
+        parallel = self._validate_parallelism(parallelism)
+        array = self._add_many_validate_mixin(name, array, assume_sorted, on_conflict)
 
-        for item in ttseries.utils.chunks(timestamp_pairs, chunks_size):
-            result_data = {self._serializer.dumps(data): timestamp for timestamp, data in item}
+        if parallel:
+            self._execute_parallel_chunks((functools.partial(self._pipe_add_chunk, name=name,
+                                                             data_pairs=result_data,
+                                                             on_conflict=on_conflict)
+                                           for result_data in self._dumps_chunks(array, chunks_size)),
+                                          parallelism)
+            return
 
-            def pipe_func(_pipe):
-                _pipe.zadd(name, result_data)
+        for result_data in self._dumps_chunks(array, chunks_size):
+            self._add_chunk(name, result_data, on_conflict)
 
-            self.transaction_pipe(pipe_func, watch_keys=name)
+    def _dumps_chunks(self, array, chunks_size=2000):
+        """
+        split the array into chunks and serialize the data
+        :param array: data pairs, [("timestamp",data)...]
+        :param chunks_size: int, split data into chunk
+        :return: yield dict, {serialized data: timestamp,...}
+        """
+        for item in ttseries.utils.chunks(array, chunks_size):
+            yield {data: timestamp for timestamp, data in self._dumps_pairs(item)}
+
+    def add_many_keys(self, mapping, chunks_size=2000, pipeline_bytes=1048576,
+                      assume_sorted=False, on_conflict="error"):
+        """
+        add large amount of data of many keys into redis sorted sets,
+        validation reads of all the keys are pipelined, and the writes of all
+        the keys are packed into shared pipelines sized by the payload bytes.
+
+        ! each pipeline executes in a MULTI/EXEC transaction if `transaction` is True,
+        but the keys are not watched, the validation and the writes are not atomic.
+        :param mapping: dict, {name: [(timestamp, data),...],...}
+        :param chunks_size: split data of each key into chunk
+        :param pipeline_bytes: int, execute the pipeline when the queued payload reaches the bytes
+        :param assume_sorted: bool, the arrays already sorted as the timestamp asc, skip to sort them
+        :param on_conflict: str, the policy of the exist timestamps, "error", "skip" or "replace"
+        """
+        prepared = self._add_many_keys_validate_mixin(mapping, assume_sorted, on_conflict)
+
+        def iter_pipe_funcs():
+            for name, timestamp_pairs, trim_length in prepared:
+                if trim_length > 0:
+                    yield 0, functools.partial(self._pipe_trim, name=name, length=trim_length)
+
+                for result_data in self._dumps_chunks(timestamp_pairs, chunks_size):
+                    payload_bytes = sum(map(ttseries.utils.sizeof_payload, result_data)) + 16 * len(result_data)
+                    yield payload_bytes, functools.partial(self._pipe_add_chunk, name=name,
+                                                           data_pairs=result_data,
+                                                           on_conflict=on_conflict)
+
+        self._execute_sized_pipe(iter_pipe_funcs(), pipeline_bytes)
 
     def get(self, name: str, timestamp: float):
         """
@@ -70,7 +191,26 @@ class RedisSampleTimeSeries(RedisTSBase):
         """
         result = self.client.zrangebyscore(name, min=timestamp, max=timestamp)
         if result:
-            return self._serializer.loads(result[0])
+            return self._loads_item(timestamp, result[0])
+
+    def _loads_item(self, timestamp, data):
+        """
+        deserialize one item returned by `get`
+        :param timestamp: float
+        :param data: serialized data
+        :return: obj
+        """
+        return self._serializer.loads(data)
+
+    def _loads_iter_items(self, results):
+        """
+        deserialize one batch of the items yield by `iter`
+        :param results: [(b'\x81\xa5value\x00', 1526008483.331131),...]
+        :return: [(timestamp, data),...]
+        """
+        return self._loads_slice([data for data, _ in results],
+                                 numpy.fromiter((timestamp for _, timestamp in results),
+                                                numpy.float64, count=len(results)))
 
     def delete(self, name: str, start_timestamp=None, end_timestamp=None):
         """
@@ -83,7 +223,7 @@ class RedisSampleTimeSeries(RedisTSBase):
         :param end_timestamp: end timestamp
         :return: int, the result of the elements removed
         """
-        with self._lock:
+        with self._key_lock(name):
             if start_timestamp or end_timestamp:
                 if start_timestamp is None:
                     start_timestamp = "-inf"
@@ -111,7 +251,7 @@ class RedisSampleTimeSeries(RedisTSBase):
                     self.delete(name, start_timestamp, end_timestamp)
         else:
             for chunk_keys in chunks_data:
-                self.client.delete(*chunk_keys)
+                self._delete_keys(chunk_keys)
 
     def trim(self, name: str, length: int):
         """
@@ -120,9 +260,8 @@ class RedisSampleTimeSeries(RedisTSBase):
         :param name: redis key
         :param length: int, length
         """
-        current_length = self.length(name)
-
-        with self._lock:
+        with self._key_lock(name):
+            current_length = self.length(name)
             if current_length > length > 0:
                 begin = 0  # start with 0 as the first set item
                 end = length - 1
@@ -143,14 +282,38 @@ class RedisSampleTimeSeries(RedisTSBase):
         :return: [(timestamp,data),...]
         """
 
-        results = self._get_slice_mixin(name, start_timestamp,
-                                        end_timestamp, limit, asc)
+        members, timestamps = self._get_slice_mixin(name, start_timestamp,
+                                                    end_timestamp, limit, asc)
+
+        if members:
+            return self._loads_slice(members, timestamps)
+
+    def _loads_slice(self, members, timestamps):
+        """
+        deserialize the sorted sets slice
+        :param members: [b'\x81\xa5value\x00',...]
+        :param timestamps: numpy.ndarray, float64
+        :return: [(timestamp,data),...]
+        """
+        return list(zip(timestamps.tolist(), self._serializer.loads_many(members)))
+
+    def get_slice_columns(self, name, start_timestamp=None,
+                          end_timestamp=None, limit=None, asc=True):
+        """
+        return a slice as the numpy columns, the serializer must support
+        `loads_columns`, such as StructSerializer
+        :param name: redis key
+        :param start_timestamp: start timestamp
+        :param end_timestamp: end timestamp
+        :param limit: int, limit the length of the result data.
+        :param asc: bool, sorted as the timestamp values
+        :return: tuple, (numpy.ndarray float64 timestamps, {name: numpy.ndarray,...})
+        """
+        members, timestamps = self._get_slice_mixin(name, start_timestamp,
+                                                    end_timestamp, limit, asc)
 
-        if results:
-            # [(b'\x81\xa5value\x00', 1526008483.331131),...]
-            return list(itertools.starmap(lambda data, timestamp:
-                                          (timestamp, self._serializer.loads(data)),
-                                          results))
+        if members:
+            return self._loads_columns(timestamps, members)
 
     def iter_keys(self, count=None):
         """
@@ -158,16 +321,17 @@ class RedisSampleTimeSeries(RedisTSBase):
         :param count: the number of the keys
         :return: iter,
         """
-        for item in self.client.scan_iter(count=count):
+        for item in self._scan_iter(count=count):
             yield item.decode("utf-8")
 
     def iter(self, name, count=None):
         """
-        iterator all the time-series data with redis key.
+        iterator all the time-series data with redis key,
+        the scanned items are deserialized in batches.
         :param name: redis key
         :param count:
         :return: iter, [(timestamp, data),...]
         """
-        for item in self.client.zscan_iter(name, count=count):
-            # (timestamp, array_data)
-            yield (item[1], self._serializer.loads(item[0]))
+        for batch in ttseries.utils.chunks(self.client.zscan_iter(name, count=count), self.iter_batch_size):
+            # [(array_data, timestamp),...]
+            yield from self._loads_iter_items(batch)
@@ -0,0 +1,261 @@
+# encoding:utf-8
+"""
+redis lua scripts, executed with EVALSHA so that
+each command runs atomically in one server round trip.
+"""
+
+# KEYS[1]: sorted sets key
+# ARGV[1]: timestamp, ARGV[2]: serialized data, ARGV[3]: max length,
+# ARGV[4]: conflict policy, "replace" overwrites the data of an exist timestamp
+# return: -1 when the timestamp already exists and not replaced, else the ZADD result
+SAMPLE_ADD = """
+local timestamp = ARGV[1]
+if redis.call("ZCOUNT", KEYS[1], timestamp, timestamp) > 0 then
+    if ARGV[4] ~= "replace" then
+        return -1
+    end
+    redis.call("ZREMRANGEBYSCORE", KEYS[1], timestamp, timestamp)
+else
+    local overflow = redis.call("ZCARD", KEYS[1]) - tonumber(ARGV[3])
+    if overflow >= 0 then
+        redis.call("ZREMRANGEBYRANK", KEYS[1], 0, overflow)
+    end
+end
+return redis.call("ZADD", KEYS[1], timestamp, ARGV[2])
+"""
+
+# KEYS[1]: sorted sets key
+# ARGV[1]: conflict policy, "skip" or "replace", ARGV[2]: max length,
+# ARGV[3...]: timestamp, serialized data, timestamp, serialized data...
+# trim the oldest items with max length after insert.
+# return: the number of the new timestamps added
+SAMPLE_ADD_MANY = """
+local added = 0
+for i = 3, #ARGV, 2 do
+    local timestamp = ARGV[i]
+    if redis.call("ZCOUNT", KEYS[1], timestamp, timestamp) > 0 then
+        if ARGV[1] == "replace" then
+            redis.call("ZREMRANGEBYSCORE", KEYS[1], timestamp, timestamp)
+            redis.call("ZADD", KEYS[1], timestamp, ARGV[i + 1])
+        end
+    else
+        added = added + redis.call("ZADD", KEYS[1], timestamp, ARGV[i + 1])
+    end
+end
+local overflow = redis.call("ZCARD", KEYS[1]) - tonumber(ARGV[2])
+if overflow > 0 then
+    redis.call("ZREMRANGEBYRANK", KEYS[1], 0, overflow - 1)
+end
+return added
+"""
+
+# KEYS[1]: sorted sets key
+# ARGV[1]: start timestamp, ARGV[2]: end timestamp
+# return: the scores between start and end timestamp without the members
+RANGE_SCORES = """
+local items = redis.call("ZRANGEBYSCORE", KEYS[1], ARGV[1], ARGV[2], "WITHSCORES")
+local scores = {}
+for i = 2, #items, 2 do
+    scores[#scores + 1] = items[i]
+end
+return scores
+"""
+
+# KEYS[1]: sorted sets key
+# ARGV: timestamps
+# return: the first timestamp already exists in the sorted sets, else nil
+TIMESTAMPS_EXIST = """
+for i = 1, #ARGV do
+    if redis.call("ZCOUNT", KEYS[1], ARGV[i], ARGV[i]) > 0 then
+        return ARGV[i]
+    end
+end
+return false
+"""
+
+# remove the oldest `count` items from the sorted sets and the
+# hashes together, HDEL in batches to keep unpack() below the lua stack limit.
+_HASH_TRIM = """
+local function hash_trim(zset_key, hash_key, count)
+    if count <= 0 then
+        return
+    end
+    local ids = redis.call("ZRANGE", zset_key, 0, count - 1)
+    redis.call("ZREMRANGEBYRANK", zset_key, 0, count - 1)
+    for i = 1, #ids, 1000 do
+        redis.call("HDEL", hash_key, unpack(ids, i, math.min(i + 999, #ids)))
+    end
+end
+"""
+
+# KEYS[1]: sorted sets key, KEYS[2]: hash key
+# ARGV[1]: trim the oldest length of data
+HASH_TRIM = _HASH_TRIM + """
+hash_trim(KEYS[1], KEYS[2], tonumber(ARGV[1]))
+"""
+
+# KEYS[1]: sorted sets key, KEYS[2]: hash key, KEYS[3]: auto increase id key
+# ARGV[1]: timestamp, ARGV[2]: serialized data, ARGV[3]: max length,
+# ARGV[4]: conflict policy, "replace" overwrites the data of an exist timestamp
+# return: -1 when the timestamp already exists and not replaced, else 1
+HASH_ADD = _HASH_TRIM + """
+local timestamp = ARGV[1]
+local ids = redis.call("ZRANGEBYSCORE", KEYS[1], timestamp, timestamp)
+if #ids > 0 then
+    if ARGV[4] ~= "replace" then
+        return -1
+    end
+    redis.call("HSET", KEYS[2], ids[1], ARGV[2])
+    return 1
+end
+local key_id = redis.call("INCR", KEYS[3])
+hash_trim(KEYS[1], KEYS[2], redis.call("ZCARD", KEYS[1]) - tonumber(ARGV[3]) + 1)
+redis.call("ZADD", KEYS[1], timestamp, key_id)
+redis.call("HSET", KEYS[2], key_id, ARGV[2])
+return 1
+"""
+
+# KEYS[1]: sorted sets key, KEYS[2]: hash key, KEYS[3]: auto increase id key
+# ARGV[1]: conflict policy, "skip" or "replace", ARGV[2]: max length,
+# ARGV[3...]: timestamp, serialized data, timestamp, serialized data...
+# trim the oldest items with max length after insert.
+# return: the number of the new timestamps added
+HASH_ADD_MANY = _HASH_TRIM + """
+local added = 0
+for i = 3, #ARGV, 2 do
+    local timestamp = ARGV[i]
+    local ids = redis.call("ZRANGEBYSCORE", KEYS[1], timestamp, timestamp)
+    if #ids > 0 then
+        if ARGV[1] == "replace" then
+            redis.call("HSET", KEYS[2], ids[1], ARGV[i + 1])
+        end
+    else
+        local key_id = redis.call("INCR", KEYS[3])
+        redis.call("ZADD", KEYS[1], timestamp, key_id)
+        redis.call("HSET", KEYS[2], key_id, ARGV[i + 1])
+        added = added + 1
+    end
+end
+hash_trim(KEYS[1], KEYS[2], redis.call("ZCARD", KEYS[1]) - tonumber(ARGV[2]))
+return added
+"""
+
+# KEYS[1]: sorted sets key, KEYS[2]: hash key
+# ARGV[1]: start timestamp, ARGV[2]: end timestamp, ARGV[3]: "1" sorted as the timestamp asc,
+# ARGV[4]: limit, -1 without limit
+# HMGET in batches to keep unpack() below the lua stack limit, the ids without data are skipped.
+# return: [serialized data, timestamp, serialized data, timestamp...] as the reply of ZRANGEBYSCORE
+HASH_GET_SLICE = """
+local items
+if ARGV[3] == "1" then
+    items = redis.call("ZRANGEBYSCORE", KEYS[1], ARGV[1], ARGV[2], "WITHSCORES", "LIMIT", 0, ARGV[4])
+else
+    items = redis.call("ZREVRANGEBYSCORE", KEYS[1], ARGV[2], ARGV[1], "WITHSCORES", "LIMIT", 0, ARGV[4])
+end
+local result = {}
+local count = 0
+for i = 1, #items, 2000 do
+    local ids = {}
+    for j = i, math.min(i + 1999, #items), 2 do
+        ids[#ids + 1] = items[j]
+    end
+    local values = redis.call("HMGET", KEYS[2], unpack(ids))
+    for k = 1, #ids do
+        if values[k] then
+            result[count + 1] = values[k]
+            result[count + 2] = items[i + 2 * k - 1]
+            count = count + 2
+        end
+    end
+end
+return result
+"""
+
+# the points count of the compressed block, the little-endian uint32 header
+_BLOCK_COUNT = """
+local function block_count(block)
+    local b1, b2, b3, b4 = string.byte(block, 1, 4)
+    return b1 + b2 * 256 + b3 * 65536 + b4 * 16777216
+end
+"""
+
+# KEYS[1]: compressed blocks sorted sets key, KEYS[2]: head sorted sets key,
+# KEYS[3]: the points count of the blocks
+# return: the number of the points of the blocks and the head
+CHUNKED_LENGTH = """
+return tonumber(redis.call("GET", KEYS[3]) or "0") + redis.call("ZCARD", KEYS[2])
+"""
+
+# remove the oldest whole blocks while the remaining points are not fewer than max length,
+# only the oldest blocks are read one by one, the total is kept by the count key.
+# the oldest head points are removed only if there is no block left.
+# the head points never repeat the timestamps of the blocks, so the counts are added up.
+_CHUNKED_TRIM = _BLOCK_COUNT + """
+local function chunked_trim(blocks_key, head_key, count_key, max_length)
+    local total = tonumber(redis.call("GET", count_key) or "0") + redis.call("ZCARD", head_key)
+    local removed = 0
+    local removed_points = 0
+    local exhausted = false
+    while total > max_length do
+        local block = redis.call("ZRANGE", blocks_key, removed, removed)[1]
+        if not block then
+            exhausted = true
+            break
+        end
+        local count = block_count(block)
+        if total - count < max_length then
+            break
+        end
+        removed = removed + 1
+        removed_points = removed_points + count
+        total = total - count
+    end
+    if removed > 0 then
+        redis.call("ZREMRANGEBYRANK", blocks_key, 0, removed - 1)
+        if redis.call("DECRBY", count_key, removed_points) <= 0 then
+            redis.call("DEL", count_key)
+        end
+    end
+    if exhausted and total > max_length then
+        redis.call("ZREMRANGEBYRANK", head_key, 0, total - max_length - 1)
+        total = max_length
+    end
+    return total
+end
+"""
+
+# KEYS[1]: compressed blocks sorted sets key, KEYS[2]: head sorted sets key,
+# KEYS[3]: the points count of the blocks
+# ARGV[1]: max length, ARGV[2]: the points count change of the blocks written before
+# return: the number of the remaining points
+CHUNKED_TRIM = _CHUNKED_TRIM + """
+if tonumber(ARGV[2]) ~= 0 and redis.call("INCRBY", KEYS[3], ARGV[2]) <= 0 then
+    redis.call("DEL", KEYS[3])
+end
+return chunked_trim(KEYS[1], KEYS[2], KEYS[3], tonumber(ARGV[1]))
+"""
+
+# KEYS[1]: compressed blocks sorted sets key, KEYS[2]: head sorted sets key,
+# KEYS[3]: the points count of the blocks
+# ARGV[1]: timestamp, ARGV[2]: head member, ARGV[3]: max length,
+# ARGV[4]: conflict policy, "replace" overwrites the data of an exist timestamp,
+# ARGV[5]: the start of the time window of the timestamp
+# return: -2 when the time window is sealed in a block, the block must be decoded to add the point,
+# -1 when the timestamp already exists in the head and not replaced, else 1
+CHUNKED_ADD = _CHUNKED_TRIM + """
+if redis.call("ZCOUNT", KEYS[1], ARGV[5], ARGV[5]) > 0 then
+    return -2
+end
+local timestamp = ARGV[1]
+if redis.call("ZCOUNT", KEYS[2], timestamp, timestamp) > 0 then
+    if ARGV[4] ~= "replace" then
+        return -1
+    end
+    redis.call("ZREMRANGEBYSCORE", KEYS[2], timestamp, timestamp)
+    redis.call("ZADD", KEYS[2], timestamp, ARGV[2])
+    return 1
+end
+redis.call("ZADD", KEYS[2], timestamp, ARGV[2])
+chunked_trim(KEYS[1], KEYS[2], KEYS[3], tonumber(ARGV[3]))
+return 1
+"""
@@ -1,9 +1,11 @@
 # encoding:utf-8
 import itertools
+import threading
 
 import numpy as np
+import redis.crc
 
-from .exceptions import RepeatedValueError
+from .exceptions import RepeatedValueError, RedisTimeSeriesError
 
 
 def check_array_repeated(array):
@@ -12,13 +14,51 @@ def check_array_repeated(array):
     :param array: [(key,value),....]
     :raise RepeatedValueError
     """
-    keys, _ = itertools.zip_longest(*array)
-    keys_dict = {}
-    for key in keys:
-        if key in keys_dict:
-            raise RepeatedValueError("repeated value:", key)
-        else:
-            keys_dict.setdefault(key)
+    timestamps = np.fromiter((item[0] for item in array), np.float64, count=len(array))
+    check_timestamps_repeated(np.sort(timestamps))
+
+
+def check_timestamps_repeated(timestamps):
+    """
+    check sorted timestamps repeated, if exist repeated timestamps will raise RepeatedValueError
+    :param timestamps: sorted numpy.ndarray
+    :raise RepeatedValueError
+    """
+    repeated = timestamps[1:][timestamps[1:] == timestamps[:-1]]
+    if repeated.size > 0:
+        raise RepeatedValueError("repeated value:", repeated[0])
+
+
+def sort_timestamp_pairs(array, assume_sorted=False):
+    """
+    sort the timestamp pairs with the timestamps as the asc
+
+    >>> sort_timestamp_pairs([(2.0, "b"), (1.0, "a")])
+    ... ([(1.0, "a"), (2.0, "b")], array([1., 2.]))
+    :param array: [(timestamp,value),....]
+    :param assume_sorted: bool, the array already sorted, skip to sort it
+    :return: tuple, (sorted array, numpy.ndarray float64 timestamps)
+    """
+    timestamps = np.fromiter((item[0] for item in array), np.float64, count=len(array))
+
+    if not assume_sorted and np.any(timestamps[1:] < timestamps[:-1]):
+        order = np.argsort(timestamps, kind="mergesort")
+        array = [array[index] for index in order]
+        timestamps = timestamps[order]
+
+    return array, timestamps
+
+
+def sizeof_payload(data):
+    """
+    the bytes size of the serialized data to send to redis,
+    non bytes values count as the size of a number
+    :param data: serialized data
+    :return: int
+    """
+    if isinstance(data, (bytes, bytearray, str)):
+        return len(data)
+    return 8
 
 
 def chunks_np_or_pd_array(array, chunk_size: int = 2000):
@@ -53,3 +93,60 @@ def chunks(iterable, chunk_size: int = 1000):
         if not chunk:
             return
         yield chunk
+
+
+def has_hash_tag(key):
+    """
+    the redis cluster key has a hash tag, only the non empty
+    substring between the first "{" and the following "}" is hashed.
+
+    >>> has_hash_tag("{APPL}:SECOND")
+    ... True
+    :param key: str, redis key
+    :return: bool
+    """
+    start = key.find("{")
+    if start == -1:
+        return False
+    end = key.find("}", start + 1)
+    return end > start + 1
+
+
+def key_slot(key):
+    """
+    the redis cluster hash slot of the key
+    :param key: str or bytes, redis key
+    :return: int
+    """
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    return redis.crc.key_slot(key)
+
+
+class StripedLock(object):
+    """
+    a fixed number of re-entrant locks, the keys are mapped to the locks by hash,
+    the writers of different keys rarely wait for each other.
+
+    >>> locks = StripedLock(64)
+    >>> with locks.get("APPL:SECOND"):
+    ...     pass
+    """
+
+    def __init__(self, stripes=64):
+        """
+        :param stripes: int, the number of the locks
+        """
+        if stripes < 1:
+            raise RedisTimeSeriesError("stripes must be greater than 0")
+        self._locks = tuple(threading.RLock() for _ in range(stripes))
+
+    def __len__(self):
+        return len(self._locks)
+
+    def get(self, key):
+        """
+        :param key: str, redis key
+        :return: threading.RLock
+        """
+        return self._locks[hash(key) % len(self._locks)]